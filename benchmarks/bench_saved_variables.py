@@ -0,0 +1,102 @@
+"""
+Compare SavedVariables parsers on synthetic OAAData files, in the row layout and the compact layout of the addon.
+
+Every parser runs in a fresh process so the peak RSS is not shared between runs. The parsers build the
+AuctionBatch the scan task uploads, so both layouts are compared end to end.
+
+Usage:
+    uv run python benchmarks/bench_saved_variables.py --sizes 100000 1000000 --formats rows compact
+"""
+
+import argparse
+import multiprocessing
+import resource
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from synthetic import write_saved_variables
+
+
+def _parse_streaming(path: Path) -> int:
+    from lotkeeper_agent.common.saved_variables import iter_saved_variables_items  # noqa: PLC0415
+    from lotkeeper_agent.models.auction_batch import AuctionBatch  # noqa: PLC0415
+
+    return len(AuctionBatch.from_lua_items(iter_saved_variables_items(path, "OAAData")))
+
+
+def _parse_lupa(path: Path) -> int:
+    from lotkeeper_agent.common.xdo_game import XDOGame  # noqa: PLC0415
+    from lotkeeper_agent.models.auction_batch import AuctionBatch  # noqa: PLC0415
+
+    table = XDOGame.Paths.parse_saved_variables_lua(path, "OAAData")
+    if isinstance(table, dict):
+        return len(AuctionBatch.from_lua_compact(table))
+    return len(AuctionBatch.from_lua_entries(table))
+
+
+def _parse_lupa_bulk(path: Path) -> int:
+    from lotkeeper_agent.common.saved_variables import (  # noqa: PLC0415
+        read_saved_variables_arrays,
+        read_saved_variables_columns,
+    )
+    from lotkeeper_agent.models.auction import AUCTION_LUA_COMPACT_KEYS, AUCTION_LUA_FIELDS  # noqa: PLC0415
+    from lotkeeper_agent.models.auction_batch import AuctionBatch  # noqa: PLC0415
+
+    compact = read_saved_variables_arrays(path, "OAAData", AUCTION_LUA_COMPACT_KEYS)
+    if compact is not None:
+        return len(AuctionBatch.from_lua_compact(compact))
+    return len(AuctionBatch.from_lua_columns(read_saved_variables_columns(path, "OAAData", AUCTION_LUA_FIELDS)))
+
+
+PARSERS: dict[str, Callable[[Path], int]] = {
+    "streaming": _parse_streaming,
+    "lupa": _parse_lupa,
+    "lupa_bulk": _parse_lupa_bulk,
+}
+
+
+def _run(name: str, path: Path, queue: "multiprocessing.Queue[tuple[Any, ...]]") -> None:
+    parser = PARSERS[name]
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    count = parser(path)
+    duration = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((count, duration, peak_kb - baseline_kb))
+
+
+def bench(name: str, path: Path) -> tuple[int, float, float]:
+    ctx = multiprocessing.get_context("spawn")
+    queue: multiprocessing.Queue[tuple[Any, ...]] = ctx.Queue()
+    process = ctx.Process(target=_run, args=(name, path, queue))
+    process.start()
+    count, duration, peak_kb = queue.get()
+    process.join()
+    return count, duration, peak_kb / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--parsers", nargs="+", default=list(PARSERS), choices=list(PARSERS))
+    parser.add_argument("--formats", nargs="+", default=["rows", "compact"], choices=["rows", "compact"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            for layout in args.formats:
+                path = Path(tmp) / f"OpenAuctionScanner_{layout}_{size}.lua"
+                write_saved_variables(path, size, compact=layout == "compact")
+                size_mb = path.stat().st_size / 1024 / 1024
+                print(f"--- {size:,} auctions, {layout} ({size_mb:.1f} MB) ---")
+                for name in args.parsers:
+                    count, duration, peak_mb = bench(name, path)
+                    print(f"{name:>12}: {duration:8.2f} s  peak +{peak_mb:8.1f} MB  ({count:,} auctions)")
+                path.unlink()
+
+
+if __name__ == "__main__":
+    main()
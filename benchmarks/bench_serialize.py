@@ -0,0 +1,122 @@
+"""
+Compare serialization paths of an auction payload to JSON bytes.
+
+The model paths start from an AuctionData with Auction models, the batch paths from an AuctionBatch. Building the
+input is not measured, only turning it into JSON bytes. Every path runs in a fresh process, the peak memory is the
+peak of the allocations made while serializing (tracemalloc, in a second run so it does not skew the time).
+With --check every path must produce the same JSON as model_dump + json.dumps.
+
+Usage:
+    uv run python benchmarks/bench_serialize.py --sizes 50000 200000 1000000
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+import pydantic_core
+from synthetic import synthetic_row
+
+from lotkeeper_agent.models.auction import Auction, AuctionData
+from lotkeeper_agent.models.auction_batch import AuctionBatch
+
+ENVELOPE = {"server": "Bench", "realm": "Benchmark Realm"}
+
+
+def _models(rows: list[dict[str, Any]]) -> AuctionData:
+    return AuctionData(**ENVELOPE, auctions=[Auction.from_lua_table(r) for r in rows])
+
+
+def _batch(rows: list[dict[str, Any]]) -> AuctionBatch:
+    return AuctionBatch.from_lua_entries(rows)
+
+
+def _model_dump(data: AuctionData) -> bytes:
+    """The original path: a dict per auction and item, encoded by the stdlib json module (what httpx json= does)"""
+    return json.dumps(data.model_dump(), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _model_dump_json(data: AuctionData) -> bytes:
+    return data.model_dump_json().encode()
+
+
+def _pydantic_to_json(data: AuctionData) -> bytes:
+    return pydantic_core.to_json(data)
+
+
+def _batch_to_json_bytes(batch: AuctionBatch) -> bytes:
+    return batch.to_json_bytes(AuctionData(**ENVELOPE, auctions=[]))
+
+
+def _batch_iter_json(batch: AuctionBatch) -> int:
+    """Streamed, as the uploader sends it: only one chunk of the body exists at a time"""
+    return sum(len(chunk) for chunk in batch.iter_json(AuctionData(**ENVELOPE, auctions=[])))
+
+
+# Path -> (input builder, serializer)
+PATHS: dict[str, tuple[Callable[[list[dict[str, Any]]], Any], Callable[[Any], Any]]] = {
+    "model_dump": (_models, _model_dump),
+    "model_dump_json": (_models, _model_dump_json),
+    "pydantic_to_json": (_models, _pydantic_to_json),
+    "batch_bytes": (_batch, _batch_to_json_bytes),
+    "batch_stream": (_batch, _batch_iter_json),
+}
+
+
+def _rows(size: int) -> list[dict[str, Any]]:
+    rng = random.Random(42)
+    return [synthetic_row(rng) for _ in range(size)]
+
+
+def _run(name: str, size: int, check: bool, queue: "multiprocessing.Queue[tuple[float, float, int]]") -> None:
+    build, serialize = PATHS[name]
+    rows = _rows(size)
+    payload_input = build(rows)
+    if not check:
+        del rows
+
+    start = time.perf_counter()
+    output = serialize(payload_input)
+    duration = time.perf_counter() - start
+    size_bytes = output if isinstance(output, int) else len(output)
+    del output
+
+    tracemalloc.start()
+    output = serialize(payload_input)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if check and isinstance(output, bytes) and name != "model_dump":
+        expected = _model_dump(_models(rows))
+        if json.loads(output) != json.loads(expected):
+            raise AssertionError(f"{name} does not match model_dump")
+
+    queue.put((duration, peak_bytes / 1e6, size_bytes))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50_000, 200_000, 1_000_000])
+    parser.add_argument("--paths", nargs="+", default=list(PATHS), choices=list(PATHS))
+    parser.add_argument("--check", action="store_true", help="verify the output of every path")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    for size in args.sizes:
+        print(f"--- {size:,} auctions ---")
+        for name in args.paths:
+            queue: multiprocessing.Queue[tuple[float, float, int]] = ctx.Queue()
+            process = ctx.Process(target=_run, args=(name, size, args.check, queue))
+            process.start()
+            duration, peak_mb, size_bytes = queue.get()
+            process.join()
+            print(f"{name:>16}: {duration:8.2f} s  peak {peak_mb:8.1f} MB  ({size_bytes / 1e6:.1f} MB JSON)")
+
+
+if __name__ == "__main__":
+    main()
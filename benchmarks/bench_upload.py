@@ -0,0 +1,132 @@
+"""
+Compare upload paths against a local stand-in for the Lotkeeper API.
+
+The stand-in server decodes chunked bodies, decompresses gzip/zstd and parses the JSON, like the real API would.
+Every upload path runs in a fresh process so the peak RSS is not shared between runs.
+
+Usage:
+    uv run --extra zstd python benchmarks/bench_upload.py --sizes 100000 300000
+"""
+
+import argparse
+import gzip
+import json
+import multiprocessing
+import random
+import resource
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from synthetic import synthetic_row
+
+from lotkeeper_agent.common.auction_uploader import AuctionUploader
+from lotkeeper_agent.config import PayloadVersion, UploadCompression
+from lotkeeper_agent.models.auction import Auction, AuctionData
+from lotkeeper_agent.models.auction_batch import AuctionBatch
+
+
+class StandInApiHandler(BaseHTTPRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(parts)
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_POST(self) -> None:
+        body = self._read_body()
+        match self.headers.get("Content-Encoding"):
+            case "gzip":
+                body = gzip.decompress(body)
+            case "zstd":
+                import zstandard  # noqa: PLC0415
+
+                body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+        auctions = len(json.loads(body)["auctions"])
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(str(auctions).encode())
+
+
+def _rows(size: int) -> list[dict[str, Any]]:
+    rng = random.Random(42)
+    return [synthetic_row(rng) for _ in range(size)]
+
+
+def _upload_model_dump(host: str, rows: list[dict[str, Any]]) -> None:
+    """The original path: per-row models, model_dump() and httpx json="""
+    import httpx  # noqa: PLC0415
+
+    auction_data = AuctionData(
+        server="Bench", realm="Benchmark Realm", auctions=[Auction.from_lua_table(r) for r in rows]
+    )
+    response = httpx.post(f"{host}{AuctionUploader.ENDPOINT}", json=auction_data.model_dump(), timeout=600)
+    response.raise_for_status()
+
+
+def _upload_streaming(compression: UploadCompression) -> Callable[[str, list[dict[str, Any]]], None]:
+    def upload(host: str, rows: list[dict[str, Any]]) -> None:
+        batch = AuctionBatch.from_lua_entries(rows)
+        envelope = AuctionData(server="Bench", realm="Benchmark Realm", auctions=[])
+        uploader = AuctionUploader(host=host, token="", compression=compression, timeout=600)
+        uploader.upload(batch.iter_json(envelope), PayloadVersion.V1)
+
+    return upload
+
+
+PATHS: dict[str, Callable[[str, list[dict[str, Any]]], None]] = {
+    "model_dump": _upload_model_dump,
+    "stream": _upload_streaming(UploadCompression.NONE),
+    "stream_gzip": _upload_streaming(UploadCompression.GZIP),
+    "stream_zstd": _upload_streaming(UploadCompression.ZSTD),
+}
+
+
+def _run(name: str, host: str, size: int, queue: "multiprocessing.Queue[tuple[float, float]]") -> None:
+    rows = _rows(size)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    PATHS[name](host, rows)
+    duration = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((duration, (peak_kb - baseline_kb) / 1024))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 300_000])
+    parser.add_argument("--paths", nargs="+", default=list(PATHS), choices=list(PATHS))
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInApiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"http://127.0.0.1:{server.server_address[1]}"
+
+    ctx = multiprocessing.get_context("spawn")
+    for size in args.sizes:
+        print(f"--- {size:,} auctions ---")
+        for name in args.paths:
+            queue: multiprocessing.Queue[tuple[float, float]] = ctx.Queue()
+            process = ctx.Process(target=_run, args=(name, host, size, queue))
+            process.start()
+            duration, peak_mb = queue.get()
+            process.join()
+            print(f"{name:>12}: {duration:8.2f} s  peak +{peak_mb:8.1f} MB")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
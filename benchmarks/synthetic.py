@@ -0,0 +1,106 @@
+"""Synthetic OpenAuctionScanner SavedVariables files for benchmarks."""
+
+import random
+from collections.abc import Iterable
+from pathlib import Path
+
+CLASS_NAMES = ["Weapon", "Armor", "Container", "Consumable", "Glyph", "Trade Goods", "Recipe", "Gem", "Miscellaneous"]
+
+
+def _lua_string(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def synthetic_row(rng: random.Random, realm: str = "Benchmark Realm", unique_items: int = 8000) -> dict[str, object]:
+    """A single OAAData row, shaped like the rows the addon writes"""
+    item_id = rng.randint(1, unique_items)
+    class_index = item_id % len(CLASS_NAMES) + 1
+    name = f"Item {item_id}"
+    count = rng.choice([1, 1, 1, 5, 10, 20])
+    min_bid = rng.randint(1, 500_000)
+    return {
+        "realm": realm,
+        "owner": f"Seller{rng.randint(1, 2000)}",
+        "itemId": item_id,
+        "name": name,
+        "texture": f"Interface\\Icons\\INV_Misc_{item_id % 500}",
+        "count": count,
+        "quality": item_id % 5,
+        "level": item_id % 80 + 1,
+        "minBid": min_bid,
+        "minIncrement": 0,
+        "buyoutPrice": min_bid + rng.randint(0, 100_000),
+        "bidAmount": 0,
+        "link": f"|cff1eff00|Hitem:{item_id}:0:0:0:0:0:0:0:80|h[{name}]|h|r",
+        "classIndex": class_index,
+        "className": CLASS_NAMES[class_index - 1],
+        "maxStackSize": 20,
+        "vendorPrice": item_id % 1000,
+    }
+
+
+def _compact_tables(rows: Iterable[dict[str, object]]) -> dict[str, object]:
+    """The compact OAAData layout of the addon (format 2) for the given rows"""
+    items: dict[object, str] = {}
+    variants: dict[object, int] = {}
+    variant_info: list[str] = []
+    variant_names: list[object] = []
+    variant_links: list[object] = []
+    auctions: list[str] = []
+    for row in rows:
+        item_id = row["itemId"]
+        if item_id not in items:
+            items[item_id] = f"{item_id},{row['maxStackSize']},{row['vendorPrice']}"
+        key = row["link"]
+        if key not in variants:
+            fields = (item_id, row["quality"], row["level"], row["classIndex"], row["texture"])
+            variant_info.append(",".join(map(str, fields)))
+            variant_names.append(row["name"])
+            variant_links.append(row["link"])
+            variants[key] = len(variant_info)
+        fields = (variants[key], row["count"], row["minBid"], row["buyoutPrice"], row["owner"])
+        auctions.append(",".join(map(str, fields)))
+    return {
+        "format": 2,
+        "realm": "Benchmark Realm",
+        "scannedAt": 1700000000,
+        "classes": CLASS_NAMES,
+        "items": list(items.values()),
+        "variants": variant_info,
+        "variantNames": variant_names,
+        "variantLinks": variant_links,
+        "auctions": auctions,
+    }
+
+
+def _render(value: object) -> str:
+    return _lua_string(value) if isinstance(value, str) else str(value)
+
+
+def write_saved_variables(path: Path, auctions: int, seed: int = 42, compact: bool = False) -> Path:
+    """Write a SavedVariables file with the given number of auctions, in the layout WoW uses"""
+    rng = random.Random(seed)
+    if compact:
+        tables = _compact_tables(synthetic_row(rng) for _ in range(auctions))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\nOAAData = {\n")
+            for key, value in tables.items():
+                if isinstance(value, list):
+                    f.write(f'\t["{key}"] = {{\n')
+                    for index, entry in enumerate(value, start=1):
+                        f.write(f"\t\t{_render(entry)}, -- [{index}]\n")
+                    f.write("\t},\n")
+                else:
+                    f.write(f'\t["{key}"] = {_render(value)},\n')
+            f.write("}\n")
+        return path
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\nOAAData = {\n")
+        for index in range(1, auctions + 1):
+            f.write("\t{\n")
+            for key, value in synthetic_row(rng).items():
+                f.write(f'\t\t["{key}"] = {_render(value)},\n')
+            f.write(f"\t}}, -- [{index}]\n")
+        f.write("}\n")
+    return path
@@ -4,20 +4,36 @@ local OAS = OpenAuctionScanner
 -- ============================================================================
 -- CONSTANTS AND CONFIGURATION
 -- ============================================================================
-local VERSION = "1.0.1"
+local VERSION = "1.6.1"
 
 OAAData = OAAData or {}
 
--- Temporary storage during scanning
+-- Progress of an incremental scan, survives the /reload that writes each class to disk
+OAAScanState = OAAScanState or {}
+
+-- Addon settings, storageFormat is "compact" (default) or "rows", frameBudgetMs the row processing time per frame
+OAASettings = OAASettings or {}
+
+-- Item info that outlives a scan, saved per character so it stays out of the file the agent parses
+OAAItemCache = OAAItemCache or {}
+
+-- Temporary storage during scanning, replaced by NewScanData() when a scan starts
 local TEMP_OAAData = {}
 
 -- Create a persistent frame for OnUpdate checks to avoid frame creation overhead
 local checkFrame = CreateFrame("Frame")
 
--- Cache for GetItemInfo calls to avoid repeated slow API calls
-local itemInfoCache = {}
+-- Cache for GetItemInfo calls to avoid repeated slow API calls, loaded from and saved to OAAItemCache
+local itemMaxStack = {}
+local itemVendorPrice = {}
+local itemType = {}
+local itemLastSeen = {}
+
+-- Day number of the current scan, used to evict items that were not seen for a while
+local today = 0
 
 -- Localize frequently called functions for performance
+local debugprofilestop = debugprofilestop
 local GetAuctionItemClasses = GetAuctionItemClasses
 local GetAuctionItemInfo = GetAuctionItemInfo
 local GetAuctionItemLink = GetAuctionItemLink
@@ -32,7 +48,13 @@ local table_insert = table.insert
 local string_lower = string.lower
 local string_find = string.find
 local string_match = string.match
+local string_gmatch = string.gmatch
+local string_format = string.format
 local math_ceil = math.ceil
+local math_floor = math.floor
+local math_min = math.min
+local table_sort = table.sort
+local time = time
 local tonumber = tonumber
 local ipairs = ipairs
 local pairs = pairs
@@ -66,8 +88,33 @@ local TARGET_CLASS_NAMES = {
     "quest",
 }
 
+-- Index of every target class name, and all target classes in scan order
+local TARGET_CLASS_INDEX = {}
+local ALL_TARGET_CLASSES = {}
+for index, name in ipairs(TARGET_CLASS_NAMES) do
+    TARGET_CLASS_INDEX[name] = index
+    ALL_TARGET_CLASSES[index] = index
+end
+
 local MAX_ITEMS_PER_PAGE = 50
 
+-- Persistent item cache: bump the version when the entry format changes, entries are evicted least recently
+-- seen first above the size limit, and after the maximum age
+local ITEM_CACHE_VERSION = 2
+local ITEM_CACHE_MAX_ENTRIES = 50000
+local ITEM_CACHE_MAX_AGE_DAYS = 30
+
+-- Milliseconds of row processing per frame (unless set with /oas budget), so the client keeps drawing
+local DEFAULT_FRAME_BUDGET_MS = 10
+
+-- Mass query (getAll): seconds to wait for the result before paging instead, and seconds to wait before retrying
+-- rows whose item info was not loaded
+local MASS_QUERY_TIMEOUT = 120
+local MASS_QUERY_RETRY_DELAY = 3
+
+-- Version of the compact storage format
+local COMPACT_FORMAT = 2
+
 -- ============================================================================
 -- GLOBAL STATE
 -- ============================================================================
@@ -81,6 +128,9 @@ local state = {
     isProcessing = false,
     isDone = false,
     isDataCommitted = false,
+    isClassCommitted = false,
+    isIncremental = false,
+    isMassQuery = false,
 }
 
 local function ResetState()
@@ -94,33 +144,207 @@ local function ResetState()
         isProcessing = false,
         isDone = false,
         isDataCommitted = false,
+        isClassCommitted = false,
+        isIncremental = false,
+        isMassQuery = false,
     }
 end
 
--- Get cached item info to avoid repeated GetItemInfo calls
+-- Realm of the current scan, the same for every row
+local scanRealm = nil
+
+-- Target classes of the current scan in scan order, the position of the class being scanned, and the auction
+-- house class index of every target class (resolved when the scan starts)
+local scanClasses = ALL_TARGET_CLASSES
+local scanPosition = 1
+local queryClassIndex = {}
+
+-- Timings of the last scan this session, see /oas stats
+local stats = {}
+
+local function ResetStats()
+    stats = {
+        startedAt = debugprofilestop(),
+        finishedAt = nil,
+        rows = 0,
+        batches = 0,
+        frames = 0,
+        busyMs = 0,
+        maxFrameMs = 0,
+        itemInfoHits = 0,
+        itemInfoCalls = 0,
+    }
+end
+
+local function Today()
+    return math_floor(time() / 86400)
+end
+
+-- Get cached item info to avoid repeated GetItemInfo calls, nil if the game has not loaded the item info yet (the
+-- agent fills it in from another listing of the item)
 local function GetCachedItemInfo(itemId)
     if not itemId then return nil, nil end
-    
-    if itemInfoCache[itemId] then
-        return itemInfoCache[itemId].maxStack, itemInfoCache[itemId].vendorPrice
+
+    local maxStack = itemMaxStack[itemId]
+    if maxStack then
+        itemLastSeen[itemId] = today
+        stats.itemInfoHits = (stats.itemInfoHits or 0) + 1
+        return maxStack, itemVendorPrice[itemId]
     end
-    
-    local _, _, _, _, _, _, _, maxStackSize, _, _, vendorPriceValue = GetItemInfo(itemId)
-    local maxStack = maxStackSize or 1
-    local vendorPrice = vendorPriceValue or 0
-    
+
+    stats.itemInfoCalls = (stats.itemInfoCalls or 0) + 1
+    local _, _, _, _, _, itemTypeValue, _, maxStackSize, _, _, vendorPriceValue = GetItemInfo(itemId)
+    if not maxStackSize then
+        -- Not in the client item cache (yet), not cached so the next listing of the item asks again
+        return nil, nil
+    end
+
     -- Cache the results
-    itemInfoCache[itemId] = {
-        maxStack = maxStack,
-        vendorPrice = vendorPrice
+    itemMaxStack[itemId] = maxStackSize
+    itemVendorPrice[itemId] = vendorPriceValue or 0
+    itemType[itemId] = string_lower(itemTypeValue or "")
+    itemLastSeen[itemId] = today
+
+    return maxStackSize, vendorPriceValue or 0
+end
+
+-- Index into TARGET_CLASS_NAMES of an item looked up with GetCachedItemInfo, 0 if its class is not scanned, nil if
+-- the item info is not loaded
+local function GetItemClassIndex(itemId)
+    if not itemId then return nil end
+
+    local itemTypeLower = itemType[itemId]
+    if not itemTypeLower then return nil end
+    return TARGET_CLASS_INDEX[itemTypeLower] or 0
+end
+
+-- Load the persistent item cache, dropping it when its version does not match
+local function LoadItemCache()
+    itemMaxStack, itemVendorPrice, itemType, itemLastSeen = {}, {}, {}, {}
+    today = Today()
+
+    if OAAItemCache.version ~= ITEM_CACHE_VERSION or type(OAAItemCache.entries) ~= "table" then
+        OAAItemCache = { version = ITEM_CACHE_VERSION, entries = {} }
+        return 0
+    end
+
+    -- Entries are packed as "maxStackSize,vendorPrice,lastSeenDay,itemType"
+    local count = 0
+    for itemId, entry in pairs(OAAItemCache.entries) do
+        local maxStack, vendorPrice, lastSeen, itemTypeLower = string_match(entry, "^(%d+),(%d+),(%d+),(.*)$")
+        if maxStack and today - tonumber(lastSeen) <= ITEM_CACHE_MAX_AGE_DAYS then
+            itemMaxStack[itemId] = tonumber(maxStack)
+            itemVendorPrice[itemId] = tonumber(vendorPrice)
+            itemType[itemId] = itemTypeLower
+            itemLastSeen[itemId] = tonumber(lastSeen)
+            count = count + 1
+        end
+    end
+    return count
+end
+
+-- Write the item cache back to OAAItemCache, keeping the most recently seen items
+local function SaveItemCache()
+    local itemIds = {}
+    for itemId in pairs(itemLastSeen) do
+        table_insert(itemIds, itemId)
+    end
+    if #itemIds > ITEM_CACHE_MAX_ENTRIES then
+        table_sort(itemIds, function(a, b) return itemLastSeen[a] > itemLastSeen[b] end)
+    end
+
+    local entries = {}
+    for i = 1, math_min(#itemIds, ITEM_CACHE_MAX_ENTRIES) do
+        local itemId = itemIds[i]
+        entries[itemId] = itemMaxStack[itemId] .. "," .. itemVendorPrice[itemId] .. "," .. itemLastSeen[itemId] .. ","
+            .. itemType[itemId]
+    end
+    OAAItemCache = { version = ITEM_CACHE_VERSION, entries = entries }
+end
+
+
+
+-- ============================================================================
+-- STORAGE
+-- ============================================================================
+-- "rows" stores every auction as a table with named fields. "compact" stores the scan metadata once, the item
+-- info once per itemId and every auction as a packed string with only the fields the agent uploads:
+--   items         "itemId,maxStackSize,vendorPrice"
+--   variants      "itemId,quality,level,classIndex,texture" of every distinct listed item (by link), items with
+--                 a random suffix share their itemId
+--   variantNames  the name of every variant
+--   variantLinks  the link of every variant
+--   auctions      "variant,count,minBid,buyoutPrice,owner"
+-- Empty fields (and itemId 0) are nil
+
+-- Lookups of the compact scan data, these are not saved: the position of every item in items (and whether its info
+-- was missing when it was added) and the position of every variant
+local compactItems = {}
+local compactItemsUnresolved = {}
+local compactVariants = {}
+
+-- New (empty) scan data in the configured storage format
+local function NewScanData()
+    compactItems = {}
+    compactItemsUnresolved = {}
+    compactVariants = {}
+    if OAASettings.storageFormat == "rows" then
+        return {}
+    end
+    return {
+        format = COMPACT_FORMAT,
+        realm = GetRealmName(),
+        scannedAt = time(),
+        classes = TARGET_CLASS_NAMES,
+        items = {},
+        variants = {},
+        variantNames = {},
+        variantLinks = {},
+        auctions = {},
     }
-    
-    return maxStack, vendorPrice
 end
 
--- Clear the item info cache
-local function ClearItemInfoCache()
-    itemInfoCache = {}
+local function AuctionCount(data)
+    if data.format then
+        return #data.auctions
+    end
+    return #data
+end
+
+local function Blank(value)
+    if value == nil then
+        return ""
+    end
+    return value
+end
+
+-- Add an auction to compact scan data
+local function AddCompactAuction(data, itemId, name, link, texture, quality, level, maxStack, vendorPrice, classIndex, count, minBid, buyoutPrice, owner)
+    -- An item added before its info was loaded is written again by the first of its listings that has the info
+    if itemId and (not compactItems[itemId] or (compactItemsUnresolved[itemId] and maxStack)) then
+        local item = itemId .. "," .. Blank(maxStack) .. "," .. Blank(vendorPrice)
+        if compactItems[itemId] then
+            data.items[compactItems[itemId]] = item
+        else
+            table_insert(data.items, item)
+            compactItems[itemId] = #data.items
+        end
+        compactItemsUnresolved[itemId] = not maxStack or nil
+    end
+
+    local variantKey = link or name
+    local variant = compactVariants[variantKey]
+    if not variant then
+        table_insert(data.variants, (itemId or 0) .. "," .. Blank(quality) .. "," .. Blank(level) .. "," .. classIndex
+            .. "," .. Blank(texture))
+        table_insert(data.variantNames, name)
+        table_insert(data.variantLinks, link or "")
+        variant = #data.variantNames
+        compactVariants[variantKey] = variant
+    end
+
+    table_insert(data.auctions, variant .. "," .. Blank(count) .. "," .. Blank(minBid) .. "," .. Blank(buyoutPrice) .. ","
+        .. Blank(owner))
 end
 
 
@@ -191,7 +415,10 @@ function OAS:UpdateStatus()
     if state.isDataCommitted then
         self.statusText:SetText("OAS COMPLETED")
         self.statusText:SetTextColor(0, 1, 0) -- Green
-    elseif state.isProcessing then
+    elseif state.isClassCommitted then
+        self.statusText:SetText("OAS CLASS DONE")
+        self.statusText:SetTextColor(0, 1, 1) -- Cyan
+    elseif state.isProcessing or state.isMassQuery then
         self.statusText:SetText("OAS SCANNING")
         self.statusText:SetTextColor(1, 1, 0) -- Yellow
     else
@@ -205,7 +432,14 @@ end
 
 
 
+-- Auction house class index by lowercased class name, the classes do not change so it is built once per session
+local classNameToIndexMap = nil
+
 local function BuildClassNameToIndexMap()
+    if classNameToIndexMap then
+        return classNameToIndexMap
+    end
+
     local classes = { GetAuctionItemClasses() }
     local map = {}
     for index, name in ipairs(classes) do
@@ -213,6 +447,7 @@ local function BuildClassNameToIndexMap()
             map[string_lower(name)] = index
         end
     end
+    classNameToIndexMap = map
     return map
 end
 
@@ -235,18 +470,193 @@ end
 
 
 
+-- Resolve the auction house class index of every target class in classes, false if one does not exist
+local function ResolveTargetClasses(classes)
+    for _, classIndex in ipairs(classes) do
+        local className = TARGET_CLASS_NAMES[classIndex]
+        local resolved = ResolveClassIndexByName(className)
+        if not resolved then
+            oas_print("Invalid class name: " .. className)
+            return false
+        end
+        queryClassIndex[classIndex] = resolved
+    end
+    return true
+end
+
+
+-- Target class indexes of a comma separated list of class names, nil if one is not a target class
+local function ParseClassList(list)
+    local classes = {}
+    local seen = {}
+    for entry in string_gmatch(list, "[^,]+") do
+        local name = string_match(entry, "^%s*(.-)%s*$")
+        local classIndex = TARGET_CLASS_INDEX[name]
+        if not classIndex then
+            oas_print("Unknown class: " .. name .. " (see /oas info)")
+            return nil
+        end
+        if not seen[classIndex] then
+            seen[classIndex] = true
+            table_insert(classes, classIndex)
+        end
+    end
+    if #classes == 0 then
+        return nil
+    end
+    return classes
+end
+
+
 -- CORE QUERY FUNCTION
-local function QueryAuctions(className, page)
-    local classIndex = ResolveClassIndexByName(className)
+local function QueryAuctions(classIndex, page)
+    QueryAuctionItems("", nil, nil, nil, queryClassIndex[classIndex], nil, page, nil, nil, false)
+end
+
+
+
+-- COMMIT ALL COLLECTED DATA TO SAVED VARIABLES
+local function CommitScan()
+    local itemCount = AuctionCount(TEMP_OAAData)
+    if TEMP_OAAData.format then
+        OAAData = TEMP_OAAData
+    else
+        for _, item in ipairs(TEMP_OAAData) do
+            table_insert(OAAData, item)
+        end
+    end
+    oas_print_info("Committed " .. itemCount .. " items to saved data")
+    stats.finishedAt = debugprofilestop()
+    TEMP_OAAData = NewScanData() -- CLEAR TEMP TABLE
+    state.isDataCommitted = true
+    OAS:UpdateStatus()
+end
+
+
+-- READ AUCTION i OF THE LIST INTO THE SCAN DATA
+-- Without a class index the class is resolved from the item info, returns false if that is not loaded (yet)
+local function ReadAuction(i, classIndex, className)
+    local name, texture, count, quality, canUse, level, minBid, minIncrement, buyoutPrice, bidAmount, highestBidder, owner = GetAuctionItemInfo("list", i)
+
+    -- Store the auction info data in a table
+    if not name then
+        return true
+    end
+
+    local link = GetAuctionItemLink("list", i)
+    local itemId = nil
+    local maxStack = nil
+    local vendorPrice = nil
+
+    if link then
+        local idStr = string_match(link, "item:(%d+)")
+        if idStr then
+            itemId = tonumber(idStr)
+            maxStack, vendorPrice = GetCachedItemInfo(itemId)
+        end
+    end
+
     if not classIndex then
-        oas_print("Invalid class name: " .. className)
-        return
+        classIndex = GetItemClassIndex(itemId)
+        if not classIndex then
+            return false
+        end
+        if classIndex == 0 then
+            return true -- not one of the scanned classes
+        end
+        className = TARGET_CLASS_NAMES[classIndex]
     end
 
-    QueryAuctionItems("", nil, nil, nil, classIndex, nil, page, nil, nil, false)
+    if TEMP_OAAData.format then
+        AddCompactAuction(TEMP_OAAData, itemId, name, link, texture, quality, level, maxStack, vendorPrice,
+            classIndex, count, minBid, buyoutPrice, owner)
+    else
+        -- We dont store canUse, highestBidder
+        table_insert(TEMP_OAAData, {
+            realm = scanRealm,
+            owner = owner,
+            itemId = itemId,
+            name = name,
+            texture = texture,
+            count = count,
+            quality = quality,
+            level = level,
+            minBid = minBid,
+            minIncrement = minIncrement,
+            buyoutPrice = buyoutPrice,
+            bidAmount = bidAmount,
+            link = link,
+            classIndex = classIndex,
+            className = className,
+            maxStackSize = maxStack,
+            vendorPrice = vendorPrice,
+        })
+    end
+    return true
+end
+
+
+-- READ ROWS 1..count (OR THE ROWS IN indexes) OF THE LIST, AS MANY PER FRAME AS FIT THE FRAME BUDGET
+-- onDone gets the rows that could not be read yet, see ReadAuction
+local function ProcessRows(count, indexes, classIndex, className, onDone)
+    local deferred = {}
+    local position = 1
+    local budget = OAASettings.frameBudgetMs or DEFAULT_FRAME_BUDGET_MS
+    stats.batches = stats.batches + 1
+
+    checkFrame:SetScript("OnUpdate", function(self)
+        local started = debugprofilestop()
+        local deadline = started + budget
+        local first = position
+
+        -- At least one row per frame, so a small budget still makes progress
+        while position <= count do
+            local i = indexes and indexes[position] or position
+            if not ReadAuction(i, classIndex, className) then
+                table_insert(deferred, i)
+            end
+            position = position + 1
+            if debugprofilestop() >= deadline then
+                break
+            end
+        end
+
+        local frameMs = debugprofilestop() - started
+        stats.rows = stats.rows + position - first
+        stats.frames = stats.frames + 1
+        stats.busyMs = stats.busyMs + frameMs
+        if frameMs > stats.maxFrameMs then
+            stats.maxFrameMs = frameMs
+        end
+
+        if position > count then
+            self:SetScript("OnUpdate", nil)
+            onDone(deferred)
+        end
+    end)
 end
 
 
+-- Print the timings of the last scan
+local function PrintStats()
+    if not stats.startedAt then
+        oas_print("No scan this session.")
+        return
+    end
+
+    local finishedAt = stats.finishedAt or debugprofilestop()
+    local running = stats.finishedAt and "" or " (running)"
+    local averageMs = stats.frames > 0 and stats.busyMs / stats.frames or 0
+    local rowsPerSecond = stats.busyMs > 0 and stats.rows / stats.busyMs * 1000 or 0
+    oas_print(string_format("Scan: %.1f s%s, %d rows in %d batches", (finishedAt - stats.startedAt) / 1000, running,
+        stats.rows, stats.batches))
+    oas_print(string_format("Reading rows: %.1f s over %d frames, %.0f rows/s", stats.busyMs / 1000, stats.frames,
+        rowsPerSecond))
+    oas_print(string_format("Per frame: %.2f ms average, %.2f ms max (budget %d ms)", averageMs, stats.maxFrameMs,
+        OAASettings.frameBudgetMs or DEFAULT_FRAME_BUDGET_MS))
+    oas_print(string_format("Item info: %d cached, %d looked up", stats.itemInfoHits, stats.itemInfoCalls))
+end
+
 
 -- PROCESSED HANDLER
 local function OnProcessed(processedItems, numBatch, total)
@@ -279,31 +689,44 @@ local function OnProcessed(processedItems, numBatch, total)
     end
 
     if not state.isDone then
-        QueryAuctions(state.currentClassName, state.currentPage)
+        QueryAuctions(state.currentClassNameIndex, state.currentPage)
         return -- STOP, we are not done yet keep querying
     end
 
     oas_print_info("(Backward Scan) State has changed to done")
     -- MOVE ON TO THE NEXT CLASS AND RESET THE STATE.
     local maxClassNameIndex = #TARGET_CLASS_NAMES
-    if state.currentClassNameIndex >= maxClassNameIndex then
-        oas_print_info("(Backward Scan) Scanning complete, commiting data.")
-        
-        -- COMMIT ALL COLLECTED DATA TO SAVED VARIABLES
-        local itemCount = 0
-        for _, item in ipairs(TEMP_OAAData) do
-            table_insert(OAAData, item)
-            itemCount = itemCount + 1
+
+    -- INCREMENTAL: COMMIT ONLY THIS CLASS AND PAUSE, THE AGENT RELOADS TO WRITE IT AND RESUMES WITH THE NEXT ONE
+    if state.isIncremental then
+        OAAData = TEMP_OAAData
+        TEMP_OAAData = NewScanData()
+        OAAScanState.classIndex = state.currentClassNameIndex
+        OAAScanState.className = state.currentClassName
+        OAAScanState.nextClassIndex = state.currentClassNameIndex + 1
+        OAAScanState.isComplete = state.currentClassNameIndex >= maxClassNameIndex
+        oas_print_info("(Backward Scan) Committed " .. AuctionCount(OAAData) .. " items of class: " .. (state.currentClassName or "unknown"))
+
+        oasFrame:UnregisterEvent("AUCTION_ITEM_LIST_UPDATE")
+        stats.finishedAt = debugprofilestop()
+        if OAAScanState.isComplete then
+            state.isDataCommitted = true
+        else
+            state.isClassCommitted = true
         end
-        oas_print_info("(Backward Scan) Committed " .. itemCount .. " items to saved data")
-        TEMP_OAAData = {} -- CLEAR TEMP TABLE
-        state.isDataCommitted = true
         OAS:UpdateStatus()
         return
     end
 
-    -- MOVE ON TO THE NEXT CLASS (via incrementing the current class index)
-    local nextClassNameIndex = state.currentClassNameIndex + 1
+    if scanPosition >= #scanClasses then
+        oas_print_info("(Backward Scan) Scanning complete, commiting data.")
+        CommitScan()
+        return
+    end
+
+    -- MOVE ON TO THE NEXT CLASS OF THE SCAN
+    scanPosition = scanPosition + 1
+    local nextClassNameIndex = scanClasses[scanPosition]
     ResetState()
 
     -- SET THE NEW STATE VALUES, SO NEXT CLASS NAME AND THEN TRIGGER THE NEXT QUERY
@@ -311,9 +734,7 @@ local function OnProcessed(processedItems, numBatch, total)
     state.currentClassName = TARGET_CLASS_NAMES[nextClassNameIndex]
     oas_print_info("(Backward Scan) Scanning next class: " .. (state.currentClassName or "unknown"))
     
-    -- CLEAR CACHE WHEN MOVING TO NEW CATEGORY SINCE ITEMS WILL BE COMPLETELY DIFFERENT
-    ClearItemInfoCache()
-    QueryAuctions(state.currentClassName, state.currentPage)
+    QueryAuctions(state.currentClassNameIndex, state.currentPage)
 end
 
 
@@ -327,81 +748,161 @@ local function OnAuctionItemListUpdate()
     local numBatch, total = GetNumAuctionItems("list")
 
 
-    -- Process the event
-    local processedItems = 0
+    -- Process the event, the rows are read over as many frames as the frame budget needs
+    local processedItems = numBatch or 0
     state.isProcessing = true
     OAS:UpdateStatus()
-    
-    -- Cache current class info to avoid repeated state lookups
-    local currentClassIndex = state.currentClassNameIndex
-    local currentClassName = state.currentClassName
-    
-    for i = 1, (numBatch or 0) do
-        local name, texture, count, quality, canUse, level, minBid, minIncrement, buyoutPrice, bidAmount, highestBidder, owner = GetAuctionItemInfo("list", i)
-
-        -- Store the auction info data in a table
-        if name then
-            local link = GetAuctionItemLink("list", i)
-            local itemId = nil
-            local maxStack = nil
-            local vendorPrice = nil
-            
-            if link then
-                local idStr = string_match(link, "item:(%d+)")
-                if idStr then 
-                    itemId = tonumber(idStr)
-                    maxStack, vendorPrice = GetCachedItemInfo(itemId)
-                end
+
+    ProcessRows(processedItems, nil, state.currentClassNameIndex, state.currentClassName, function()
+        -- Listen for Update event to check whether we can query and are considered processed
+        checkFrame:SetScript("OnUpdate", function(self, elapsed)
+            local canQuery, canMassQuery = CanSendAuctionQuery("list")
+            if canQuery then
+                self:SetScript("OnUpdate", nil)
+                OnProcessed(processedItems, numBatch, total)
             end
-            
-            local realm = GetRealmName()
-
-            -- We dont store canUse, highestBidder
-            table_insert(TEMP_OAAData, {
-                realm = realm,
-                owner = owner,
-                itemId = itemId,
-                name = name,
-                texture = texture,
-                count = count,
-                quality = quality,
-                level = level,
-                minBid = minBid,
-                minIncrement = minIncrement,
-                buyoutPrice = buyoutPrice,
-                bidAmount = bidAmount,
-                link = link,
-                classIndex = currentClassIndex,
-                className = currentClassName,
-                maxStackSize = maxStack,
-                vendorPrice = vendorPrice,
-            })
+        end)
+    end)
+end
+
+
+-- START SCANNING THE TARGET CLASSES IN classes, FROM classes[position]
+local function StartScan(classes, position, incremental)
+    if not ResolveTargetClasses(classes) then
+        ResetState()
+        OAS:UpdateStatus()
+        return
+    end
+    scanClasses = classes
+    scanPosition = position
+
+    -- Register event
+    oasFrame:RegisterEvent("AUCTION_ITEM_LIST_UPDATE")
+    -- Setup event handler
+    oasFrame:SetScript("OnEvent", function(_, event)
+        if event ~= "AUCTION_ITEM_LIST_UPDATE" then return end
+        OnAuctionItemListUpdate()
+    end)
+
+    state.isIncremental = incremental
+    state.currentClassNameIndex = classes[position]
+    state.currentClassName = TARGET_CLASS_NAMES[state.currentClassNameIndex]
+    OAS:UpdateStatus()
+    QueryAuctions(state.currentClassNameIndex, state.currentPage)
+end
+
+
+-- ============================================================================
+-- MASS QUERY (getAll)
+-- ============================================================================
+-- The whole auction house in a single query, realms allow one every 15 minutes. A getAll row has no category, its
+-- class is resolved from the item info; rows of items the client has not loaded yet are read once more after a delay.
+
+-- Scan page by page instead, once the client accepts a query again
+local function FallBackToPaging(reason)
+    oas_print("(Mass Query) " .. reason .. ", scanning page by page instead")
+    oasFrame:UnregisterEvent("AUCTION_ITEM_LIST_UPDATE")
+    oasFrame:SetScript("OnEvent", nil)
+    state.isMassQuery = false
+    TEMP_OAAData = NewScanData()
+
+    checkFrame:SetScript("OnUpdate", function(self)
+        if CanSendAuctionQuery("list") then
+            self:SetScript("OnUpdate", nil)
+            StartScan(ALL_TARGET_CLASSES, 1, false)
         end
+    end)
+end
+
 
-        processedItems = processedItems + 1
+-- Retry the deferred rows after a delay, then commit
+local function FinishMassQuery(deferred)
+    local function Commit(skipped)
+        if #skipped > 0 then
+            oas_print("(Mass Query) Skipped " .. #skipped .. " auctions, their item info did not load")
+        end
+        state.isMassQuery = false
+        CommitScan()
     end
 
+    if #deferred == 0 then
+        Commit(deferred)
+        return
+    end
 
-    -- Listen for Update event to check whether we can query and are considered processed
+    oas_print_info("(Mass Query) Waiting for the item info of " .. #deferred .. " auctions")
+    local waited = 0
     checkFrame:SetScript("OnUpdate", function(self, elapsed)
-        local canQuery, canMassQuery = CanSendAuctionQuery("list")
-        if canQuery then
-            self:SetScript("OnUpdate", nil)
-            OnProcessed(processedItems, numBatch, total)
+        waited = waited + elapsed
+        if waited >= MASS_QUERY_RETRY_DELAY then
+            ProcessRows(#deferred, deferred, nil, nil, Commit)
         end
     end)
+end
+
+
+-- The getAll result has arrived
+local function OnMassQueryResult()
+    local numBatch, total = GetNumAuctionItems("list")
+    if not numBatch or numBatch == 0 then
+        FallBackToPaging("The mass query returned no auctions")
+        return
+    end
+    if numBatch < total then
+        FallBackToPaging("The mass query returned " .. numBatch .. " of " .. total .. " auctions")
+        return
+    end
 
+    -- The event fires again while item info loads, the list itself does not change anymore
+    oasFrame:UnregisterEvent("AUCTION_ITEM_LIST_UPDATE")
+    oasFrame:SetScript("OnEvent", nil)
 
+    oas_print_info("(Mass Query) Reading " .. numBatch .. " auctions")
+    state.totalItems = total
+    state.processedItems = numBatch
+    ProcessRows(numBatch, nil, nil, nil, FinishMassQuery)
+end
+
+
+-- Query the whole auction house at once, falls back to paging if the realm does not allow it (now)
+local function StartMassQuery()
+    local _, canMassQuery = CanSendAuctionQuery("list")
+    if not canMassQuery then
+        FallBackToPaging("A mass query is not allowed")
+        return
+    end
+
+    oasFrame:RegisterEvent("AUCTION_ITEM_LIST_UPDATE")
+    oasFrame:SetScript("OnEvent", function(_, event)
+        if event ~= "AUCTION_ITEM_LIST_UPDATE" then return end
+        OnMassQueryResult()
+    end)
+
+    local waited = 0
+    checkFrame:SetScript("OnUpdate", function(self, elapsed)
+        waited = waited + elapsed
+        if waited >= MASS_QUERY_TIMEOUT then
+            FallBackToPaging("The mass query timed out")
+        end
+    end)
+
+    state.isMassQuery = true
+    OAS:UpdateStatus()
+    oas_print_info("(Mass Query) Querying all auctions")
+    QueryAuctionItems("", nil, nil, nil, nil, nil, 0, nil, nil, true)
 end
 
 
 -- SCANNER
-local function Scan()
+-- mode is "full", "incremental" (commit every class, see Resume) or "mass" (getAll), a full scan can be limited
+-- to some of the target classes
+local function Scan(mode, classes)
     ResetState()
     OAS:UpdateStatus()
 
-    local realm = GetRealmName()
-    oas_print("Starting scan for realm: " .. realm)
+    scanRealm = GetRealmName()
+    oas_print("Starting scan for realm: " .. scanRealm)
+    today = Today()
 
     if not AuctionFrame or not AuctionFrame:IsShown() then
         oas_print("You must be at the Auction House to scan.")
@@ -410,32 +911,59 @@ local function Scan()
 
     -- Always clear data when scanning again
     OAAData = {}
-    TEMP_OAAData = {}
-    ClearItemInfoCache()
+    TEMP_OAAData = NewScanData()
+    ResetStats()
+
+    OAAScanState = {}
+    if mode == "incremental" then
+        OAAScanState.startedAt = time()
+        OAAScanState.totalClasses = #TARGET_CLASS_NAMES
+        OAAScanState.nextClassIndex = 1
+        OAAScanState.isComplete = false
+    end
 
-    -- Register event
-    oasFrame:RegisterEvent("AUCTION_ITEM_LIST_UPDATE")
-    -- Setup event handler
-    oasFrame:SetScript("OnEvent", function(_, event)
-        if event ~= "AUCTION_ITEM_LIST_UPDATE" then return end
-        OnAuctionItemListUpdate()
-    end)
+    if mode == "mass" then
+        StartMassQuery()
+    else
+        StartScan(classes or ALL_TARGET_CLASSES, 1, mode == "incremental")
+    end
+end
 
-    state.currentClassNameIndex = 1
-    state.currentClassName = TARGET_CLASS_NAMES[state.currentClassNameIndex]
+
+-- RESUME AN INCREMENTAL SCAN WITH THE NEXT CLASS
+local function Resume()
+    ResetState()
     OAS:UpdateStatus()
-    QueryAuctions(state.currentClassName, state.currentPage)
+
+    if not OAAScanState.nextClassIndex or OAAScanState.isComplete then
+        oas_print("There is no incremental scan to resume.")
+        return
+    end
+
+    if not AuctionFrame or not AuctionFrame:IsShown() then
+        oas_print("You must be at the Auction House to scan.")
+        return
+    end
+
+    -- The previous class was written to disk by the reload, only keep the next one
+    OAAData = {}
+    TEMP_OAAData = NewScanData()
+    ResetStats()
+
+    scanRealm = GetRealmName()
+    today = Today()
+    oas_print("Resuming scan at class " .. OAAScanState.nextClassIndex .. " / " .. OAAScanState.totalClasses)
+    StartScan(ALL_TARGET_CLASSES, OAAScanState.nextClassIndex, true)
 end
 
 
 -- STOP
 local function Stop()
-    TEMP_OAAData = {}
+    TEMP_OAAData = NewScanData()
     oasFrame:UnregisterEvent("AUCTION_ITEM_LIST_UPDATE")
     oasFrame:SetScript("OnEvent", nil)
     oasFrame:SetScript("OnUpdate", nil)
     checkFrame:SetScript("OnUpdate", nil)
-    ClearItemInfoCache()
 
     oas_print("Scan stopped")
     ResetState()
@@ -454,12 +982,48 @@ local function HandleSlashCommand(msg)
     end
 
     if command == "scan" then
-        Scan()
+        Scan("full")
+    end
+
+    if command == "scan incremental" then
+        Scan("incremental")
+    end
+
+    if command == "scan mass" then
+        Scan("mass")
+    end
+
+    -- Targeted scan of some classes, e.g. /oas scan trade goods,gem
+    local classList = string_match(command, "^scan (.+)$")
+    if classList and classList ~= "incremental" and classList ~= "mass" then
+        local classes = ParseClassList(classList)
+        if classes then
+            Scan("full", classes)
+        end
+    end
+
+    if command == "resume" then
+        Resume()
     end
 
     if command == "stop" then
         Stop()
     end
+
+    if command == "stats" then
+        PrintStats()
+    end
+
+    local budget = tonumber(string_match(command, "^budget (%d+)$"))
+    if budget and budget > 0 then
+        OAASettings.frameBudgetMs = budget
+        oas_print("Frame budget set to: " .. budget .. " ms")
+    end
+
+    if command == "format compact" or command == "format rows" then
+        OAASettings.storageFormat = string.sub(command, 8)
+        oas_print("Storage format set to: " .. OAASettings.storageFormat)
+    end
 end
 
 
@@ -469,7 +1033,21 @@ end
 SLASH_OPENAUCTIONSCANNER1 = "/oas"
 SlashCmdList["OPENAUCTIONSCANNER"] = HandleSlashCommand
 
-oas_print("OpenAuctionScanner v" .. VERSION .. " loaded. Use /oas scan to scan all categories; /oas stop to cancel.")
+oas_print("OpenAuctionScanner v" .. VERSION .. " loaded. Use /oas scan to scan all categories; /oas scan incremental to commit every category as it completes; /oas scan mass to query all auctions at once; /oas scan <class,...> to scan some categories; /oas resume to continue an incremental scan; /oas stop to cancel; /oas stats to show the timings of the last scan; /oas budget <ms> to set the row processing time per frame; /oas format compact|rows to choose the storage format.")
 
 -- Initialize the addon
-OAS:Initialize()
\ No newline at end of file
+OAS:Initialize()
+
+-- Warm the item cache once the saved variables are loaded, and save it before they are written
+local cacheFrame = CreateFrame("Frame")
+cacheFrame:RegisterEvent("ADDON_LOADED")
+cacheFrame:RegisterEvent("PLAYER_LOGOUT")
+cacheFrame:SetScript("OnEvent", function(self, event, addonName)
+    if event == "ADDON_LOADED" and addonName == "OpenAuctionScanner" then
+        local count = LoadItemCache()
+        oas_print_info("Item cache: " .. count .. " items")
+        self:UnregisterEvent("ADDON_LOADED")
+    elseif event == "PLAYER_LOGOUT" then
+        SaveItemCache()
+    end
+end)
\ No newline at end of file
@@ -29,8 +29,8 @@ if ! command -v uv &> /dev/null; then
 fi
 
 cd /app
-echo "Syncing Python dependencies (base + ocr extra)…"
-~/.local/bin/uv sync --extra ocr
+echo "Syncing Python dependencies (base + ocr, zstd and http2 extras)…"
+~/.local/bin/uv sync --extra ocr --extra zstd --extra http2
 
 echo "Starting lotkeeper-agent..."
 ~/.local/bin/uv run python -m lotkeeper_agent.main
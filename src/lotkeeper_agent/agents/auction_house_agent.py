@@ -1,4 +1,6 @@
 from lotkeeper_agent.agents.wow_agent import WoWAgent
+from lotkeeper_agent.common.scan_cadence import get_scan_cadence
+from lotkeeper_agent.config import ENV
 from lotkeeper_agent.models.wow_config import WoWAccount, WowFaction
 from lotkeeper_agent.tasks.login_task import LoginTask
 from lotkeeper_agent.tasks.scan_auctions_task import ScanAuctionsTask
@@ -13,10 +15,17 @@ class AuctioneerNames:
 class AuctionHouseAgent(WoWAgent):
     """
     Agent for the Auction House, includes logging in and targeting the auctioneer.
+
+    With classes the agent only scans those item classes, see ScanAuctionsTask. With SCAN_CADENCE_ADAPTIVE the full
+    scans of the realm are scheduled by its churn, see ScanCadence.
     """
 
-    def __init__(self, account: WoWAccount) -> None:
-        super().__init__(f"{account.get_realm_name_with_faction()} • Auction House Agent", account)
+    def __init__(self, account: WoWAccount, classes: list[str] | None = None) -> None:
+        name = f"{account.get_realm_name_with_faction()} • Auction House Agent"
+        if classes:
+            name = f"{name} ({', '.join(classes)})"
+        super().__init__(name, account)
+        self.classes = classes
 
         # Default to the auctioneer in Darnassus
         auctioneer = AuctioneerNames.AUCTIONEER_GOLOTHAS
@@ -29,6 +38,11 @@ class AuctionHouseAgent(WoWAgent):
             [
                 LoginTask(account),
                 TargetInteractCreatureTask(auctioneer),
-                ScanAuctionsTask(account),
+                ScanAuctionsTask(account, auctioneer, classes),
             ]
         )
+
+    def next_run_delay(self) -> float | None:
+        if not ENV.SCAN_CADENCE_ADAPTIVE or self.classes:
+            return None
+        return get_scan_cadence().next_interval(self.account.get_realm_name_with_faction())
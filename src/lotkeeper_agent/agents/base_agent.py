@@ -8,6 +8,7 @@ from loguru import logger
 
 from lotkeeper_agent.common.discord_logger import discord_logger
 from lotkeeper_agent.common.sleep_util import SleepUtil
+from lotkeeper_agent.config import ENV
 from lotkeeper_agent.tasks.agent_task import AgentTask, TaskError
 
 
@@ -21,6 +22,7 @@ class CronExpression(Enum):
     EVERY_12_HOURS = "0 */12 * * *"  # every 12th hour at minute 0 (00:00, 12:00)
     EVERY_6_HOURS = "0 */6 * * *"  # every 6th hour at minute 0 (00:00, 06:00, 12:00, 18:00)
     EVERY_3_HOURS = "0 */3 * * *"  # every 3rd hour at minute 0 (00:00, 03:00, 06:00, …)
+    BETWEEN_HOURLY = "15,30,45 * * * *"  # every hour at minute 15, 30 and 45, in between the hourly runs
 
 
 class AgentError(Exception):
@@ -50,6 +52,11 @@ class BaseAgent(ABC):
         self.display = os.environ.get("DISPLAY", ":99")
         self._tasks: list[AgentTask] = []
         self.window_process: subprocess.Popen[bytes] | None = None
+        # Whether the last run failed, whether it resumed a failed run and whether a failure is retried, available to
+        # setup and teardown
+        self.failed = False
+        self.resumed = False
+        self.will_retry = False
 
         # Schedule and retry settings
         self.cron_expression = CronExpression.HOURLY
@@ -129,6 +136,18 @@ class BaseAgent(ABC):
     def get_task_names(self) -> list[str]:
         return [task.name for task in self._tasks]
 
+    def preferred_display(self) -> str | None:
+        """The display the agent would rather run on, e.g. where its game is still running"""
+        return None
+
+    def schedule_group(self) -> str | None:
+        """Agents of the same group never run at the same time and are planned apart (SCHEDULE_PACKING)"""
+        return None
+
+    def next_run_delay(self) -> float | None:
+        """Seconds until the next run after a successful run, None to follow the cron expression"""
+        return None
+
     @abstractmethod
     def setup(self) -> None:
         """Setup the agent"""
@@ -137,20 +156,51 @@ class BaseAgent(ABC):
     def teardown(self) -> None:
         """Teardown the agent"""
 
-    def start(self) -> None:
-        """Start the agent"""
+    def start(self, resume: bool = False, will_retry: bool = False) -> None:
+        """
+        Start the agent
+
+        Args:
+            resume: Whether this is a retry of a failed run, with TASK_CHECKPOINTS it continues at the first task
+                that is not done yet
+            will_retry: Whether the scheduler retries the run if it fails
+        """
+        self.failed = False
+        self.resumed = resume and ENV.TASK_CHECKPOINTS
+        self.will_retry = will_retry
+        if not self.resumed:
+            for task in self._tasks:
+                task.discard_artifact()
         try:
             self.setup()
-            self._run()
+            self._run(self._resume_index() if self.resumed else 0)
         except TaskError as e:
+            self.failed = True
             raise e
         except Exception as e:
+            self.failed = True
             raise e
         finally:
             self.teardown()
 
-    def _run(self) -> None:
-        for task in self._tasks:
+    def _resume_index(self) -> int:
+        """The first task a resumed run has to execute"""
+        # A task that kept its result from the failed run finishes from it, the tasks before it are not needed
+        for index in reversed(range(len(self._tasks))):
+            if self._tasks[index].has_artifact():
+                logger.info(f"Resuming at task {self._tasks[index].name} from the result of the failed run")
+                return index
+
+        # Skip the tasks the game is still past, up to the first one it is not
+        for index, task in enumerate(self._tasks):
+            if not task.probe():
+                logger.info(f"Resuming at task {task.name}")
+                return index
+            logger.info(f"Skipping task {task.name}, the game is still past it")
+        return len(self._tasks)
+
+    def _run(self, first: int = 0) -> None:
+        for task in self._tasks[first:]:
             logger.info(f"Executing task: {task.name} in {self.time_between_tasks} seconds")
 
             # Wait between tasks to give the agent a chance to settle
@@ -1,7 +1,15 @@
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+
 from loguru import logger
 
 from lotkeeper_agent.agents.base_agent import AgentError, BaseAgent
+from lotkeeper_agent.common.display_session import current_display
+from lotkeeper_agent.common.xdo import XDO
 from lotkeeper_agent.common.xdo_game import XDOGame
+from lotkeeper_agent.config import ENV
 from lotkeeper_agent.models.wow_config import WoWAccount
 from lotkeeper_agent.tasks.select_window_task import SelectWindowTask
 
@@ -16,11 +24,44 @@ WOW_WINDOW_PATTERNS = [
     ".*Warcraft.*",
 ]
 
+# Agents set the realm in the shared Config.wtf before starting the game, one agent at a time
+_launch_lock = threading.Lock()
+
+
+@dataclass
+class GameSession:
+    """A running game and the account it was started for, kept between runs with GAME_SESSION_PERSISTENT"""
+
+    process: subprocess.Popen[bytes]
+    username: str
+    realm: str
+    started_at: float
+
+    def is_running(self) -> bool:
+        return self.process.poll() is None
+
+    def belongs_to(self, account: WoWAccount) -> bool:
+        return self.username == account.username and self.realm == account.realm
+
+    @property
+    def uptime(self) -> str:
+        minutes = int(time.time() - self.started_at) // 60
+        return f"{minutes // 60}h {minutes % 60:02d}m"
+
+
+# The game running on every display, one per display so the input goes to the right window
+_game_sessions: dict[str, GameSession] = {}
+_game_sessions_lock = threading.Lock()
+
 
 class WoWAgent(BaseAgent):
     """
     WoW Agent, includes starting and stopping the WoW process as its setup and teardown processes
 
+    With GAME_SESSION_PERSISTENT the game is left running after a successful run and reused by the next run of an
+    agent for the same account, until it crashes or reaches GAME_SESSION_MAX_UPTIME. With TASK_CHECKPOINTS the game
+    of a failed run is only left running when the scheduler retries it, a retry that fails as well stops it.
+
     Agents that rely on the WoW process should use this as their base agent.
     """
 
@@ -29,16 +70,86 @@ class WoWAgent(BaseAgent):
         self.account = account
         self.add_task(SelectWindowTask(WOW_WINDOW_PATTERNS))
 
+    def preferred_display(self) -> str | None:
+        with _game_sessions_lock:
+            return next((d for d, s in _game_sessions.items() if s.belongs_to(self.account)), None)
+
+    def schedule_group(self) -> str | None:
+        # An account can only be logged in once
+        return self.account.username
+
     def setup(self) -> None:
+        display = current_display()
+        with _game_sessions_lock:
+            session = _game_sessions.pop(display, None)
+
+        if session and self._can_reuse(session):
+            logger.info(f"Reusing the WoW process of {self.account.username[:5]} (up {session.uptime})")
+            self.window_process = session.process
+            with _game_sessions_lock:
+                _game_sessions[display] = session
+            return
+
+        # A crashed or expired game, or the game of another account on this display
+        if session:
+            logger.info("Stopping the WoW process left on this display")
+            XDOGame.Process.cleanup(session.process)
+
         logger.info(f"Setting up WoW process for {self.account.username[:5]}")
-        XDOGame.Paths.set_wtf_variable(XDOGame.Paths.WTFVariables.REALM_NAME, self.account.realm)
+        with _launch_lock:
+            XDOGame.Paths.set_wtf_variable(XDOGame.Paths.WTFVariables.REALM_NAME, self.account.realm)
+
+            logger.info("Starting the WoW process")
+            started_at = time.time()
+            self.window_process = XDOGame.Process.start()
+            if not self.window_process:
+                raise AgentError(self.name, "Failed to start WoW, exiting")
 
-        logger.info("Starting the WoW process")
-        self.window_process = XDOGame.Process.start()
-        if not self.window_process:
-            raise AgentError(self.name, "Failed to start WoW, exiting")
+            with _game_sessions_lock:
+                _game_sessions[display] = GameSession(
+                    self.window_process, self.account.username, self.account.realm, time.time()
+                )
+
+            # Wait for the window inside the lock, concurrent agents share Config.wtf and the next launch may only
+            # change the realm once this game has read it
+            ok, _info = XDO.Window.wait(WOW_WINDOW_PATTERNS, interval=0.5)
+            if not ok:
+                raise AgentError(self.name, "The WoW window did not open")
+
+        # Startup overhead of every launch, in logfmt so it can be graphed from the logs
+        seconds = time.time() - started_at
+        wineserver = "persistent" if ENV.WINE_PERSISTENT_SERVER else "on_demand"
+        logger.info(f"Metric: wow_time_to_first_window_seconds={seconds:.1f} display={display} wineserver={wineserver}")
 
     def teardown(self) -> None:
+        running = self.window_process is not None and self.window_process.poll() is None
+        if ENV.GAME_SESSION_PERSISTENT and running and not self.failed:
+            logger.info("Keeping the WoW process running for the next run")
+            self.window_process = None
+            return
+
+        # The retry resumes in the game of the failed run, unless resuming failed too and the game is in an
+        # unknown state, then the next run starts from scratch. Without a retry the game is stopped as usual.
+        if ENV.TASK_CHECKPOINTS and running and self.failed and self.will_retry and not self.resumed:
+            logger.info("Keeping the WoW process running for the retry")
+            self.window_process = None
+            return
+
         logger.info("Stopping the WoW process")
         XDOGame.Process.cleanup(self.window_process)
+        with _game_sessions_lock:
+            session = _game_sessions.get(current_display())
+            if session and session.process is self.window_process:
+                del _game_sessions[current_display()]
         self.window_process = None
+
+    def _can_reuse(self, session: GameSession) -> bool:
+        if not (ENV.GAME_SESSION_PERSISTENT or self.resumed) or not session.belongs_to(self.account):
+            return False
+        if not session.is_running():
+            logger.warning("The WoW process of the previous run has exited, restarting it")
+            return False
+        if time.time() - session.started_at > ENV.GAME_SESSION_MAX_UPTIME:
+            logger.info(f"The WoW process reached its maximum uptime ({session.uptime}), restarting it")
+            return False
+        return True
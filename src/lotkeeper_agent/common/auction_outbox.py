@@ -0,0 +1,192 @@
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from functools import cache
+from pathlib import Path
+
+from loguru import logger
+
+from lotkeeper_agent.common.discord_logger import discord_logger
+from lotkeeper_agent.common.scan_sender import ScanPart, send_scan
+from lotkeeper_agent.common.xdo_game import XDOGame
+from lotkeeper_agent.config import ENV
+from lotkeeper_agent.models.auction_batch import AuctionBatch
+
+# Upper bound of the retry backoff of a single scan
+MAX_RETRY_DELAY = 3600
+
+# Sent scans are remembered for a week, so a re-spooled scan is not uploaded twice
+SENT_RETENTION = 7 * 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id TEXT PRIMARY KEY,
+    realm TEXT NOT NULL,
+    auctions INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    part TEXT
+)
+"""
+
+# Columns added after the first release, added to existing outboxes on open
+_MIGRATIONS = {"part": "ALTER TABLE scans ADD COLUMN part TEXT"}
+
+_ENTRY_COLUMNS = "scan_id, realm, auctions, created_at, attempts, part"
+
+
+@dataclass(frozen=True)
+class OutboxEntry:
+    scan_id: str
+    realm: str
+    auctions: int
+    created_at: float
+    attempts: int
+    part: ScanPart | None = None
+
+    @classmethod
+    def from_row(cls, row: tuple[str, str, int, float, int, str | None]) -> "OutboxEntry":
+        scan_id, realm, auctions, created_at, attempts, part = row
+        return cls(scan_id, realm, auctions, created_at, attempts, ScanPart(**json.loads(part)) if part else None)
+
+
+class AuctionOutbox:
+    """
+    Durable spool between parsing and upload: parsed scans are written to disk and uploaded by drain().
+
+    The scans are stored as compressed .npz batches next to a SQLite index with their upload state. A scan is
+    only removed once it was uploaded, so failed uploads and restarts do not cost a rescan. Scans are identified
+    by their scan ID, spooling the same scan twice (or again after it was sent) is a no-op.
+    """
+
+    def __init__(self, directory: Path | None = None) -> None:
+        self.directory = directory or XDOGame.Paths.get_data_dir() / "outbox"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._drain_lock = threading.Lock()
+        with self._connect() as db:
+            db.execute(_SCHEMA)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(scans)")}
+            for column, migration in _MIGRATIONS.items():
+                if column not in columns:
+                    db.execute(migration)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.directory / "outbox.sqlite", timeout=30)
+        try:
+            with db:  # commits, or rolls back on error
+                yield db
+        finally:
+            db.close()
+
+    def _batch_path(self, scan_id: str) -> Path:
+        return self.directory / f"{scan_id}.npz"
+
+    def put(self, scan_id: str, realm: str, batch: AuctionBatch, part: ScanPart | None = None) -> bool:
+        """Spool a scan (or a part of an incremental scan) for upload, returns False if it was already spooled or sent"""
+        with self._connect() as db:
+            if db.execute("SELECT 1 FROM scans WHERE scan_id = ?", (scan_id,)).fetchone():
+                logger.info(f"Scan {scan_id} is already in the outbox")
+                return False
+
+        # The batch is written before it is indexed, so every indexed scan can be loaded
+        batch.save(self._batch_path(scan_id))
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR IGNORE INTO scans (scan_id, realm, auctions, created_at, next_attempt_at, part) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (scan_id, realm, len(batch), now, now, json.dumps(asdict(part)) if part else None),
+            )
+        logger.info(f"Spooled scan {scan_id} ({len(batch)} auctions) to the outbox")
+        return True
+
+    def pending(self) -> list[OutboxEntry]:
+        """The scans waiting for upload, oldest first"""
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT {_ENTRY_COLUMNS} FROM scans WHERE status = 'pending' ORDER BY created_at"
+            ).fetchall()
+        return [OutboxEntry.from_row(row) for row in rows]
+
+    def drain(self) -> int:
+        """
+        Upload the pending scans that are due, oldest first
+
+        Failed uploads are retried on a later drain with exponential backoff, scans older than
+        UPLOAD_OUTBOX_MAX_AGE are dropped.
+
+        Returns:
+            The number of scans that were uploaded
+        """
+        if not self._drain_lock.acquire(blocking=False):
+            return 0  # already draining
+
+        try:
+            self._prune()
+            sent = 0
+            with self._connect() as db:
+                due = db.execute(
+                    f"SELECT {_ENTRY_COLUMNS} FROM scans "
+                    "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY created_at",
+                    (time.time(),),
+                ).fetchall()
+
+            for row in due:
+                if self._send(OutboxEntry.from_row(row)):
+                    sent += 1
+            return sent
+        finally:
+            self._drain_lock.release()
+
+    def _send(self, entry: OutboxEntry) -> bool:
+        logger.info(f"Uploading scan {entry.scan_id} of {entry.realm} (attempt {entry.attempts + 1})")
+        try:
+            send_scan(AuctionBatch.load(self._batch_path(entry.scan_id)), entry.realm, entry.scan_id, entry.part)
+        except Exception as e:
+            delay = min(ENV.UPLOAD_OUTBOX_RETRY_DELAY * 2**entry.attempts, MAX_RETRY_DELAY)
+            logger.warning(f"Failed to upload scan {entry.scan_id}, retrying in {delay}s: {e}")
+            with self._connect() as db:
+                db.execute(
+                    "UPDATE scans SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE scan_id = ?",
+                    (time.time() + delay, str(e), entry.scan_id),
+                )
+            return False
+
+        with self._connect() as db:
+            db.execute("UPDATE scans SET status = 'sent', last_error = NULL WHERE scan_id = ?", (entry.scan_id,))
+        self._batch_path(entry.scan_id).unlink(missing_ok=True)
+        logger.info(f"Uploaded scan {entry.scan_id} from the outbox")
+        return True
+
+    def _prune(self) -> None:
+        """Drop expired pending scans and forget sent scans after the retention period"""
+        now = time.time()
+        with self._connect() as db:
+            expired = db.execute(
+                "SELECT scan_id, realm FROM scans WHERE status = 'pending' AND created_at < ?",
+                (now - ENV.UPLOAD_OUTBOX_MAX_AGE,),
+            ).fetchall()
+            db.execute(
+                "UPDATE scans SET status = 'expired' WHERE status = 'pending' AND created_at < ?",
+                (now - ENV.UPLOAD_OUTBOX_MAX_AGE,),
+            )
+            db.execute("DELETE FROM scans WHERE status != 'pending' AND created_at < ?", (now - SENT_RETENTION,))
+
+        for scan_id, realm in expired:
+            self._batch_path(scan_id).unlink(missing_ok=True)
+            logger.warning(f"Dropped scan {scan_id} of {realm}, it could not be uploaded in time")
+            discord_logger.error(f"Dropped scan {scan_id} of {realm} from the outbox", "Outbox: Scan Expired")
+
+
+@cache
+def get_outbox() -> AuctionOutbox:
+    """The outbox under the data directory, shared by the scan task and the drainer"""
+    return AuctionOutbox()
@@ -0,0 +1,204 @@
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy
+from loguru import logger
+
+from lotkeeper_agent.common.xdo_game import XDOGame
+from lotkeeper_agent.models.auction import AuctionDeltaData, ListingKey
+from lotkeeper_agent.models.auction_batch import MISSING, AuctionBatch
+
+# Snapshot file format, bump when the key derivation or the stored columns change
+SNAPSHOT_FORMAT = 1
+
+
+def _string_hashes(values: list[str]) -> numpy.ndarray:
+    """Stable 64-bit hash per string (string table indices are not stable across scans), with 0 for nil last"""
+    hashes = [int.from_bytes(hashlib.blake2b(v.encode(), digest_size=8).digest(), "little") for v in values]
+    return numpy.array([*hashes, 0], dtype=numpy.uint64)
+
+
+def _mix(h: numpy.ndarray, values: numpy.ndarray) -> numpy.ndarray:
+    """Combine a column into the running hash (boost hash_combine followed by the splitmix64 finalizer)"""
+    h = h ^ (
+        values.astype(numpy.uint64) + numpy.uint64(0x9E3779B97F4A7C15) + (h << numpy.uint64(6)) + (h >> numpy.uint64(2))
+    )
+    h = (h ^ (h >> numpy.uint64(30))) * numpy.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> numpy.uint64(27))) * numpy.uint64(0x94D049BB133111EB)
+    mixed: numpy.ndarray = h ^ (h >> numpy.uint64(31))
+    return mixed
+
+
+def listing_keys(
+    item_id: numpy.ndarray,
+    owner_hash: numpy.ndarray,
+    quantity: numpy.ndarray,
+    unit_buyout_price: numpy.ndarray,
+    unit_starting_bid_price: numpy.ndarray,
+) -> numpy.ndarray:
+    """
+    Stable 64-bit key per listing, from its item, owner, quantity and prices.
+
+    Identical listings (e.g. a seller posting several equal stacks) are numbered, so the keys of a scan are unique
+    and the difference between two scans keeps the number of identical listings that were added or removed.
+    """
+    with numpy.errstate(over="ignore"):
+        h = numpy.zeros(len(item_id), dtype=numpy.uint64)
+        for column in (item_id, owner_hash, quantity, unit_buyout_price, unit_starting_bid_price):
+            h = _mix(h, column)
+
+        # Occurrence of each key among its duplicates: position in the sorted keys minus the start of its run
+        order = numpy.argsort(h, kind="stable")
+        sorted_keys = h[order]
+        positions = numpy.arange(len(h))
+        run_starts = numpy.ones(len(h), dtype=bool)
+        run_starts[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        occurrence = numpy.empty(len(h), dtype=numpy.int64)
+        occurrence[order] = positions - numpy.maximum.accumulate(numpy.where(run_starts, positions, 0))
+
+        return _mix(h, occurrence)
+
+
+@dataclass
+class AuctionSnapshot:
+    """
+    Compact record of the last uploaded scan of a realm: one key per listing plus the key fields.
+
+    The key fields are kept so removed listings can be reported to the API, about 40 bytes per listing.
+    """
+
+    realm: str
+    created_at: float
+    keys: numpy.ndarray
+    item_id: numpy.ndarray
+    owner: numpy.ndarray
+    quantity: numpy.ndarray
+    unit_buyout_price: numpy.ndarray
+    unit_starting_bid_price: numpy.ndarray
+    owners: list[str]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def snapshot_id(self) -> str:
+        """Identifier of the listings in the snapshot, independent of their order"""
+        return hashlib.blake2b(numpy.sort(self.keys).tobytes(), digest_size=16).hexdigest()
+
+    @classmethod
+    def from_batch(cls, batch: AuctionBatch, realm: str) -> "AuctionSnapshot":
+        owner_hash = _string_hashes(batch.owners.values)[batch.owner]
+        keys = listing_keys(
+            batch.item_id, owner_hash, batch.quantity, batch.unit_buyout_price, batch.unit_starting_bid_price
+        )
+        return cls(
+            realm=realm,
+            created_at=time.time(),
+            keys=keys,
+            item_id=batch.item_id,
+            owner=batch.owner,
+            quantity=batch.quantity,
+            unit_buyout_price=batch.unit_buyout_price,
+            unit_starting_bid_price=batch.unit_starting_bid_price,
+            owners=batch.owners.values,
+        )
+
+    @staticmethod
+    def get_path(realm: str) -> Path:
+        file_name = re.sub(r"[^\w.-]+", "_", realm)
+        return XDOGame.Paths.get_data_dir() / "snapshots" / f"{file_name}.npz"
+
+    @classmethod
+    def load(cls, realm: str) -> "AuctionSnapshot | None":
+        """Load the snapshot of a realm, None if there is none or it can not be used"""
+        path = cls.get_path(realm)
+        if not path.exists():
+            return None
+        try:
+            with numpy.load(path) as data:
+                if int(data["format"]) != SNAPSHOT_FORMAT or str(data["realm"]) != realm:
+                    logger.info(f"Ignoring snapshot {path}, it was written for another format or realm")
+                    return None
+                return cls(
+                    realm=realm,
+                    created_at=float(data["created_at"]),
+                    keys=data["keys"],
+                    item_id=data["item_id"],
+                    owner=data["owner"],
+                    quantity=data["quantity"],
+                    unit_buyout_price=data["unit_buyout_price"],
+                    unit_starting_bid_price=data["unit_starting_bid_price"],
+                    owners=data["owners"].tolist(),
+                )
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+            return None
+
+    def save(self) -> None:
+        """Write the snapshot atomically, replacing the previous snapshot of the realm"""
+        path = self.get_path(self.realm)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp.npz")
+        numpy.savez_compressed(
+            tmp_path,
+            format=SNAPSHOT_FORMAT,
+            realm=self.realm,
+            created_at=self.created_at,
+            keys=self.keys,
+            item_id=self.item_id,
+            owner=self.owner,
+            quantity=self.quantity,
+            unit_buyout_price=self.unit_buyout_price,
+            unit_starting_bid_price=self.unit_starting_bid_price,
+            owners=numpy.array(self.owners, dtype=str),
+        )
+        tmp_path.replace(path)
+
+    def listing_key(self, row: int) -> ListingKey:
+        owner = int(self.owner[row])
+        return ListingKey(
+            item_id=int(self.item_id[row]),
+            owner=self.owners[owner] if owner != MISSING else None,
+            unit_buyout_price=int(self.unit_buyout_price[row]),
+            unit_starting_bid_price=int(self.unit_starting_bid_price[row]),
+            quantity=int(self.quantity[row]),
+        )
+
+
+@dataclass
+class AuctionDelta:
+    """The listings added (rows of the new scan) and removed (rows of the base snapshot) between two scans"""
+
+    base: AuctionSnapshot
+    snapshot: AuctionSnapshot
+    added: numpy.ndarray
+    removed: numpy.ndarray
+
+    @classmethod
+    def between(cls, base: AuctionSnapshot, snapshot: AuctionSnapshot) -> "AuctionDelta":
+        return cls(
+            base=base,
+            snapshot=snapshot,
+            added=numpy.flatnonzero(~numpy.isin(snapshot.keys, base.keys)),
+            removed=numpy.flatnonzero(~numpy.isin(base.keys, snapshot.keys)),
+        )
+
+    @property
+    def churn(self) -> float:
+        """Changed listings relative to the size of the new scan"""
+        return (len(self.added) + len(self.removed)) / max(1, len(self.snapshot))
+
+    def envelope(self, server: str) -> AuctionDeltaData:
+        """The delta payload model, the added listings are encoded from the batch (see iter_normalized_json)"""
+        return AuctionDeltaData(
+            server=server,
+            realm=self.snapshot.realm,
+            base_snapshot_id=self.base.snapshot_id,
+            snapshot_id=self.snapshot.snapshot_id,
+            removed=[self.base.listing_key(row) for row in self.removed.tolist()],
+            items={},
+            auctions=[],
+        )
@@ -0,0 +1,360 @@
+import hashlib
+import importlib.util
+import math
+import random
+import threading
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from typing import ClassVar
+
+import httpx
+import pydantic_core
+from loguru import logger
+from pydantic import BaseModel, Field
+
+from lotkeeper_agent.common.xdo_game import XDOGame
+from lotkeeper_agent.config import ENV, PayloadVersion, UploadCompression
+from lotkeeper_agent.models.auction import AuctionData, NormalizedAuctionData
+from lotkeeper_agent.models.auction_batch import AuctionBatch
+
+# Try and use zstandard if available (faster and smaller than gzip)
+try:
+    import zstandard  # type: ignore
+
+    _HAS_ZSTD = True
+except Exception:
+    _HAS_ZSTD = False
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+@dataclass
+class UploadStats:
+    raw_bytes: int = 0
+    sent_bytes: int = 0
+    duration: float = 0.0
+
+    @property
+    def ratio(self) -> float:
+        """Compression ratio (raw / sent)"""
+        return self.raw_bytes / self.sent_bytes if self.sent_bytes else 0.0
+
+
+def resolve_compression(compression: UploadCompression) -> UploadCompression:
+    """Fall back to gzip when zstd is requested but zstandard is not installed"""
+    if compression == UploadCompression.ZSTD and not _HAS_ZSTD:
+        logger.warning("zstandard is not installed, falling back to gzip compression")
+        return UploadCompression.GZIP
+    return compression
+
+
+def compress_chunks(chunks: Iterable[bytes], compression: UploadCompression) -> Iterator[bytes]:
+    """Compress a stream of chunks incrementally, only one chunk is held in memory at a time"""
+    match compression:
+        case UploadCompression.NONE:
+            yield from chunks
+            return
+        case UploadCompression.GZIP:
+            gzip = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+            for chunk in chunks:
+                compressed = gzip.compress(chunk)
+                if compressed:
+                    yield compressed
+            yield gzip.flush()
+        case UploadCompression.ZSTD:
+            zstd = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            for chunk in chunks:
+                compressed = zstd.compress(chunk)
+                if compressed:
+                    yield compressed
+            yield zstd.flush()
+
+
+class AuctionUploader:
+    """
+    Uploads auction payloads to the Lotkeeper API as a streamed request body.
+
+    The body is encoded and compressed chunk by chunk while it is sent (chunked transfer encoding), so memory use
+    during the upload does not grow with the scan size.
+    """
+
+    ENDPOINT = "/api/v1/agent/auctions"
+    CONTENT_ENCODINGS: ClassVar[dict[UploadCompression, str]] = {
+        UploadCompression.GZIP: "gzip",
+        UploadCompression.ZSTD: "zstd",
+    }
+
+    def __init__(
+        self,
+        host: str | None = None,
+        token: str | None = None,
+        compression: UploadCompression | None = None,
+        timeout: float = 60.0,
+    ) -> None:
+        self.endpoint = f"{host if host is not None else ENV.LOT_HOST}{self.ENDPOINT}"
+        self.token = token if token is not None else ENV.LOT_AGENT_TOKEN
+        self.compression = resolve_compression(compression or ENV.UPLOAD_COMPRESSION)
+        self.timeout = timeout
+
+    def headers(self, payload_version: PayloadVersion | None) -> dict[str, str]:
+        headers = {
+            "X-Agent-Access-Token": f"{self.token}",
+            "Content-Type": "application/json",
+        }
+        if payload_version is not None:
+            headers["X-Payload-Version"] = payload_version.value
+        if self.compression in self.CONTENT_ENCODINGS:
+            headers["Content-Encoding"] = self.CONTENT_ENCODINGS[self.compression]
+        return headers
+
+    def upload_model(
+        self, model: BaseModel, payload_version: PayloadVersion | None, headers: dict[str, str] | None = None
+    ) -> UploadStats:
+        """
+        Upload a payload model, serialized straight to JSON bytes by pydantic-core (no intermediate dicts or str)
+
+        Use upload() with an AuctionBatch encoder for scans, this is meant for small payloads such as summaries.
+        """
+        return self.upload([pydantic_core.to_json(model)], payload_version, headers)
+
+    def upload(
+        self, chunks: Iterable[bytes], payload_version: PayloadVersion | None, headers: dict[str, str] | None = None
+    ) -> UploadStats:
+        """
+        Stream the encoded payload chunks to the API
+
+        Args:
+            chunks: The JSON payload as chunks of bytes (e.g. AuctionBatch.iter_json())
+            payload_version: The payload version, sent as X-Payload-Version header (None for other payloads)
+            headers: Additional request headers (e.g. X-Snapshot-Id)
+
+        Returns:
+            Statistics of the upload
+
+        Raises:
+            httpx.HTTPError: If the request fails or the API returns an error status
+        """
+        stats = UploadStats()
+
+        def count_raw(source: Iterable[bytes]) -> Iterator[bytes]:
+            for chunk in source:
+                stats.raw_bytes += len(chunk)
+                yield chunk
+
+        def count_sent(source: Iterable[bytes]) -> Iterator[bytes]:
+            for chunk in source:
+                stats.sent_bytes += len(chunk)
+                yield chunk
+
+        body = count_sent(compress_chunks(count_raw(chunks), self.compression))
+
+        start = time.time()
+        request_headers = self.headers(payload_version) | (headers or {})
+        response = httpx.post(self.endpoint, content=body, headers=request_headers, timeout=self.timeout)
+        response.raise_for_status()
+        stats.duration = round(time.time() - start, 2)
+
+        logger.info(
+            f"Uploaded {stats.raw_bytes / 1e6:.1f} MB as {stats.sent_bytes / 1e6:.1f} MB "
+            f"({self.compression.value}, {stats.ratio:.1f}x) in {stats.duration}s"
+        )
+        return stats
+
+
+class DeltaAuctionUploader(AuctionUploader):
+    """
+    Uploads the listings added and removed since the previous scan (AuctionDeltaData), as a streamed request body.
+
+    The API answers 409 Conflict when it does not hold the base snapshot of the delta, the caller then falls back
+    to a full upload (see is_resync_required).
+    """
+
+    ENDPOINT = "/api/v1/agent/auctions/delta"
+
+    @staticmethod
+    def is_resync_required(error: Exception) -> bool:
+        return isinstance(error, httpx.HTTPStatusError) and error.response.status_code == httpx.codes.CONFLICT
+
+
+class SummaryAuctionUploader(AuctionUploader):
+    """Uploads per-item price statistics (AuctionSummaryData), which carry their own schema version"""
+
+    ENDPOINT = "/api/v1/agent/auctions/summary"
+
+
+@cache
+def get_http_client() -> httpx.Client:
+    """Shared HTTP client with keep-alive connections, using HTTP/2 when the h2 package is available"""
+    http2 = importlib.util.find_spec("h2") is not None
+    limits = httpx.Limits(max_connections=max(1, ENV.UPLOAD_CONCURRENCY), max_keepalive_connections=None)
+    return httpx.Client(http2=http2, limits=limits, timeout=60.0)
+
+
+def make_scan_id(saved_variables_path: Path, realm: str) -> str:
+    """Scan ID derived from the SavedVariables file, so a retried upload of the same scan reuses the same ID"""
+    stat = saved_variables_path.stat()
+    key = f"{realm}|{saved_variables_path}|{stat.st_mtime_ns}|{stat.st_size}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+class UploadProgress(BaseModel):
+    """Acknowledged chunks of a chunked upload, persisted so an interrupted upload can resume"""
+
+    scan_id: str
+    chunk_count: int
+    chunk_size: int
+    acknowledged: set[int] = Field(default_factory=set)
+
+    @staticmethod
+    def get_path(scan_id: str) -> Path:
+        return XDOGame.Paths.get_data_dir() / "uploads" / f"{scan_id}.json"
+
+    @classmethod
+    def load(cls, scan_id: str, chunk_count: int, chunk_size: int) -> "UploadProgress":
+        """Load the progress of a previous attempt, or start fresh if there is none or the chunking differs"""
+        path = cls.get_path(scan_id)
+        try:
+            progress = cls.model_validate_json(path.read_text(encoding="utf-8"))
+            if progress.chunk_count == chunk_count and progress.chunk_size == chunk_size:
+                return progress
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable upload progress {path}: {e}")
+        return cls(scan_id=scan_id, chunk_count=chunk_count, chunk_size=chunk_size)
+
+    def save(self) -> None:
+        path = self.get_path(self.scan_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(self.model_dump_json(), encoding="utf-8")
+        tmp_path.replace(path)
+
+    def delete(self) -> None:
+        self.get_path(self.scan_id).unlink(missing_ok=True)
+
+
+class ChunkedAuctionUploader(AuctionUploader):
+    """
+    Uploads a scan as idempotent chunks, identified by scan ID and sequence number.
+
+    Chunks are sent in parallel (bounded) over the shared keep-alive client and retried with exponential backoff.
+    Acknowledged chunks are persisted, so a failed upload resumes from where it stopped instead of starting over.
+    """
+
+    ENDPOINT = "/api/v1/agent/auctions/chunks"
+    RETRY_STATUS_CODES: ClassVar[set[int]] = {408, 425, 429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        host: str | None = None,
+        token: str | None = None,
+        compression: UploadCompression | None = None,
+        timeout: float = 60.0,
+        *,
+        chunk_size: int | None = None,
+        concurrency: int | None = None,
+        retries: int | None = None,
+        backoff: float = 1.0,
+    ) -> None:
+        super().__init__(host, token, compression, timeout)
+        self.chunk_size = max(1, chunk_size or ENV.UPLOAD_CHUNK_SIZE)
+        self.concurrency = max(1, concurrency or ENV.UPLOAD_CONCURRENCY)
+        self.retries = ENV.UPLOAD_CHUNK_RETRIES if retries is None else retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+
+    def upload_batch(
+        self,
+        batch: AuctionBatch,
+        envelope: AuctionData | NormalizedAuctionData,
+        payload_version: PayloadVersion,
+        scan_id: str,
+        headers: dict[str, str] | None = None,
+    ) -> UploadStats:
+        """
+        Upload a batch in chunks, skipping the chunks that were acknowledged by a previous attempt
+
+        Args:
+            batch: The auctions to upload
+            envelope: The payload model, every chunk is a complete payload of this type
+            payload_version: The payload version, sent as X-Payload-Version header
+            scan_id: Stable identifier of the scan, the API deduplicates chunks by scan ID and sequence number
+            headers: Additional request headers, sent with every chunk
+
+        Returns:
+            Statistics of the upload (of the chunks sent by this attempt)
+
+        Raises:
+            httpx.HTTPError: If a chunk still fails after all retries
+        """
+        chunk_count = max(1, math.ceil(len(batch) / self.chunk_size))
+        progress = UploadProgress.load(scan_id, chunk_count, self.chunk_size)
+        pending = [seq for seq in range(chunk_count) if seq not in progress.acknowledged]
+        if len(pending) < chunk_count:
+            logger.info(f"Resuming upload {scan_id}: {chunk_count - len(pending)}/{chunk_count} chunks acknowledged")
+
+        stats = UploadStats()
+        start = time.time()
+
+        def send(seq: int) -> None:
+            chunk = batch.take(slice(seq * self.chunk_size, (seq + 1) * self.chunk_size))
+            if isinstance(envelope, NormalizedAuctionData):
+                raw = b"".join(chunk.iter_normalized_json(envelope))
+            else:
+                raw = b"".join(chunk.iter_json(envelope))
+            body = b"".join(compress_chunks([raw], self.compression))
+
+            chunk_headers = self.headers(payload_version) | (headers or {})
+            chunk_headers.update({"X-Scan-Id": scan_id, "X-Chunk-Seq": str(seq), "X-Chunk-Count": str(chunk_count)})
+            self._send_with_retries(body, chunk_headers, seq)
+
+            with self._lock:
+                stats.raw_bytes += len(raw)
+                stats.sent_bytes += len(body)
+                progress.acknowledged.add(seq)
+                progress.save()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="upload") as executor:
+            futures = [executor.submit(send, seq) for seq in pending]
+            for future in as_completed(futures):
+                future.result()
+
+        progress.delete()
+        stats.duration = round(time.time() - start, 2)
+        logger.info(
+            f"Uploaded {len(pending)} chunks of scan {scan_id}: {stats.raw_bytes / 1e6:.1f} MB as "
+            f"{stats.sent_bytes / 1e6:.1f} MB ({self.compression.value}) in {stats.duration}s"
+        )
+        return stats
+
+    def _send_with_retries(self, body: bytes, headers: dict[str, str], seq: int) -> None:
+        client = get_http_client()
+        for attempt in range(self.retries + 1):
+            try:
+                response = client.post(self.endpoint, content=body, headers=headers, timeout=self.timeout)
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return
+                error: Exception = httpx.HTTPStatusError(
+                    f"Chunk {seq} failed with status {response.status_code}",
+                    request=response.request,
+                    response=response,
+                )
+            except httpx.TransportError as e:
+                error = e
+
+            if attempt == self.retries:
+                raise error
+
+            delay = self.backoff * 2**attempt + random.uniform(0, self.backoff)
+            logger.warning(
+                f"Chunk {seq} failed (attempt {attempt + 1}/{self.retries + 1}): {error}, retry in {delay:.1f}s"
+            )
+            time.sleep(delay)
@@ -0,0 +1,158 @@
+import os
+import subprocess
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from pathlib import Path
+from types import TracebackType
+
+from loguru import logger
+
+# The display started by startup.sh (with VNC), extra sessions use the displays after it
+DEFAULT_DISPLAY_NUMBER = 99
+
+# Same screen as the display started by startup.sh, the text detector captures 1024x768
+XVFB_ARGS = [
+    "-screen",
+    "0",
+    "1024x768x24",
+    "-ac",
+    "+extension",
+    "GLX",
+    "+render",
+    "-noreset",
+    "-nolisten",
+    "tcp",
+    "-dpi",
+    "96",
+    "+extension",
+    "DAMAGE",
+    "-fbdir",
+    "/dev/shm",
+    "-maxclients",
+    "256",
+]
+
+# Seconds to wait for a started Xvfb to accept connections
+XVFB_START_TIMEOUT = 10
+
+# The display of the agent running on the current thread, None outside of a session
+_current_display: ContextVar[str | None] = ContextVar("current_display", default=None)
+
+
+def current_display() -> str:
+    """The X display of the session on the current thread, the DISPLAY of the process outside of a session"""
+    return _current_display.get() or os.environ.get("DISPLAY", f":{DEFAULT_DISPLAY_NUMBER}")
+
+
+def display_env(**extra: str) -> dict[str, str]:
+    """The process environment with DISPLAY set to the current display, for xdotool and wine"""
+    return {**os.environ, **extra, "DISPLAY": current_display()}
+
+
+class DisplaySession:
+    """
+    A virtual X display (Xvfb with its own window manager) that one agent uses at a time.
+
+    Entering the session makes it the current display of the thread: xdotool, the X selection, the text detector
+    and the game process started on that thread all use it, so agents on other displays do not interfere.
+    """
+
+    def __init__(self, number: int) -> None:
+        self.number = number
+        self.display = f":{number}"
+        self._processes: list[subprocess.Popen[bytes]] = []
+        self._tokens: list[Token[str | None]] = []
+
+    def __enter__(self) -> "DisplaySession":
+        self._tokens.append(_current_display.set(self.display))
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        _current_display.reset(self._tokens.pop())
+
+    @property
+    def socket_path(self) -> Path:
+        return Path("/tmp/.X11-unix") / f"X{self.number}"
+
+    def is_running(self) -> bool:
+        return self.socket_path.exists()
+
+    def start(self) -> None:
+        """Start Xvfb and a window manager for the display, unless the display is already running"""
+        if self.is_running():
+            return
+
+        logger.info(f"Starting virtual display {self.display}")
+        env = {**os.environ, "DISPLAY": self.display}
+        self._processes.append(
+            subprocess.Popen(["Xvfb", self.display, *XVFB_ARGS], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        )
+
+        start = time.time()
+        while not self.is_running():
+            if time.time() - start > XVFB_START_TIMEOUT:
+                self.stop()
+                raise RuntimeError(f"Virtual display {self.display} did not start within {XVFB_START_TIMEOUT}s")
+            time.sleep(0.2)
+
+        # The game window needs a window manager to be focused
+        self._processes.append(
+            subprocess.Popen(
+                ["fluxbox", "-rc", "/dev/null"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        )
+
+    def stop(self) -> None:
+        """Stop the processes this session started, displays started elsewhere are left running"""
+        for process in reversed(self._processes):
+            if process.poll() is None:
+                process.terminate()
+                process.wait()
+        self._processes.clear()
+
+
+class DisplayPool:
+    """
+    A fixed set of display sessions, each used by one agent at a time.
+
+    The first session is the display started by startup.sh, the others are started on first use.
+    """
+
+    def __init__(self, size: int, first: int = DEFAULT_DISPLAY_NUMBER) -> None:
+        self.sessions = [DisplaySession(first + i) for i in range(max(1, size))]
+        self._idle = list(self.sessions)
+        self._available = threading.Condition()
+
+    @contextmanager
+    def session(self, preferred: str | None = None) -> Iterator[DisplaySession]:
+        """
+        Take an idle display session (waits for one) and make it the current display of the thread
+
+        Args:
+            preferred: The display to take if it is idle, e.g. where the game of the agent is still running
+        """
+        with self._available:
+            self._available.wait_for(lambda: bool(self._idle))
+            session = next((s for s in self._idle if s.display == preferred), self._idle[0])
+            self._idle.remove(session)
+        try:
+            session.start()
+            with session:
+                yield session
+        finally:
+            with self._available:
+                self._idle.append(session)
+                self._available.notify()
+
+    def stop(self) -> None:
+        """Stop the displays started by the pool"""
+        for session in self.sessions:
+            session.stop()
@@ -0,0 +1,69 @@
+import sqlite3
+import statistics
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from functools import cache
+from pathlib import Path
+
+from lotkeeper_agent.common.xdo_game import XDOGame
+
+# Recent successful runs of an agent that make up its expected duration
+RECENT_RUNS = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    agent TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    duration REAL NOT NULL
+)
+"""
+
+_INDEX = "CREATE INDEX IF NOT EXISTS runs_agent ON runs (agent, finished_at)"
+
+
+class RunHistory:
+    """Durations of the recent successful runs of every agent (by job ID), kept in SQLite under the data directory"""
+
+    def __init__(self, directory: Path | None = None) -> None:
+        self.directory = directory or XDOGame.Paths.get_data_dir() / "scheduler"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute(_SCHEMA)
+            db.execute(_INDEX)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.directory / "runs.sqlite", timeout=30)
+        try:
+            with db:  # commits, or rolls back on error
+                yield db
+        finally:
+            db.close()
+
+    def record(self, agent: str, duration: float) -> None:
+        """Record a successful run, only the recent runs of the agent are kept"""
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO runs (agent, finished_at, duration) VALUES (?, ?, ?)", (agent, time.time(), duration)
+            )
+            db.execute(
+                "DELETE FROM runs WHERE agent = ? AND finished_at < "
+                "(SELECT MIN(finished_at) FROM (SELECT finished_at FROM runs WHERE agent = ? "
+                "ORDER BY finished_at DESC LIMIT ?))",
+                (agent, agent, RECENT_RUNS),
+            )
+
+    def expected_duration(self, agent: str) -> float | None:
+        """Median duration of the recent runs of the agent in seconds, None if it did not run yet"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT duration FROM runs WHERE agent = ? ORDER BY finished_at DESC LIMIT ?", (agent, RECENT_RUNS)
+            ).fetchall()
+        return statistics.median(row[0] for row in rows) if rows else None
+
+
+@cache
+def get_run_history() -> RunHistory:
+    """The run history under the data directory, shared by the scheduler threads"""
+    return RunHistory()
@@ -0,0 +1,369 @@
+import re
+import threading
+from collections.abc import Iterator, Sequence
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+import lupa
+
+
+class SavedVariablesError(Exception):
+    """Exception raised when a SavedVariables file does not follow the format WoW writes"""
+
+    def __init__(self, path: Path, line_number: int, message: str) -> None:
+        self.path = path
+        self.line_number = line_number
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"{self.path}:{self.line_number}: {self.message}"
+
+
+# WoW writes SavedVariables with one key/value (or table delimiter) per line, e.g.
+#
+# OAAData = {
+# {
+# ["name"] = "Linen Cloth",
+# ["count"] = 20,
+# }, -- [1]
+# }
+#
+# So a single line regex is enough to tokenize the file, which keeps the reader streaming and fast.
+_LINE_RE = re.compile(
+    r"""
+    ^[ \t]*
+    (?:
+        \[ (?: "(?P<skey>(?:[^"\\]|\\.)*)" | (?P<ikey>-?\d+) ) \] [ \t]* = [ \t]*
+        | (?P<name>[A-Za-z_]\w*) [ \t]* = [ \t]*
+    )?
+    (?:
+        (?P<open>\{) [ \t]* (?P<inline_close>\})?
+        | (?P<close>\})
+        | "(?P<str>(?:[^"\\]|\\.)*)"
+        | (?P<num>[-+]?(?:0[xX][0-9a-fA-F]+|\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?))
+        | (?P<kw>true|false|nil)
+    )?
+    [ \t]* [,;]? [ \t]* (?:--.*)? \r?$
+    """,
+    re.VERBOSE,
+)
+
+_INT_RE = re.compile(r"[-+]?\d+")
+_ESCAPE_RE = re.compile(r"\\(\d{1,3}|.|\n)", re.DOTALL)
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "a": "\a", "b": "\b", "f": "\f", "v": "\v", "\n": "\n"}
+_KEYWORDS: dict[str, Any] = {"true": True, "false": False, "nil": None}
+
+
+def _unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+
+    def replace(match: re.Match[str]) -> str:
+        escape = match.group(1)
+        if escape.isdigit():
+            return chr(int(escape))
+        return _ESCAPES.get(escape, escape)
+
+    return _ESCAPE_RE.sub(replace, value)
+
+
+def _to_number(value: str) -> int | float:
+    if _INT_RE.fullmatch(value):
+        return int(value)
+    if value.lstrip("+-")[:2].lower() == "0x":
+        return int(value, 16)
+    return float(value)
+
+
+def _finalize(table: dict[Any, Any]) -> Any:
+    """Mirror lupa conversion: tables with only numeric keys become lists (ordered by key), others dicts"""
+    if all(type(key) is int for key in table):
+        return [table[key] for key in sorted(table)]
+    return table
+
+
+def iter_saved_variables_table(path: Path, variable_name: str, encoding: str = "utf-8") -> Iterator[Any]:
+    """
+    Stream the values of a top-level SavedVariables table one at a time.
+
+    Only a single value of the requested table is held in memory at once, the file itself is read line by line.
+    Values are converted the same way as the lupa path, so nested tables become lists or dicts.
+
+    Args:
+        path: Path to the SavedVariables .lua file
+        variable_name: The global variable to read (e.g. "OAAData")
+        encoding: The file encoding
+
+    Yields:
+        The values of the table in order
+    """
+    for _, value in iter_saved_variables_items(path, variable_name, encoding):
+        yield value
+
+
+def iter_saved_variables_items(path: Path, variable_name: str, encoding: str = "utf-8") -> Iterator[tuple[Any, Any]]:
+    """Like iter_saved_variables_table(), but yields the (key, value) pairs of the table"""
+
+    # Stack of [table, next positional index, key in parent], the first frame is the root table of a statement
+    stack: list[list[Any]] = []
+    in_target = False
+
+    with open(path, encoding=encoding) as f:
+        for line_number, line in enumerate(f, start=1):
+            # Fast path for the bulk of the file: `["key"] = value,` with a plain string or integer value
+            if in_target and len(stack) > 1:
+                stripped = line.strip()
+                if stripped[:2] == '["' and stripped[-1:] == ",":
+                    end = stripped.find('"] = ')
+                    if end > 0:
+                        raw = stripped[end + 5 : -1]
+                        if len(raw) > 1 and raw[0] == '"' and raw[-1] == '"':
+                            stack[-1][0][stripped[2:end]] = _unescape(raw[1:-1])
+                            continue
+                        if raw.isdecimal():
+                            stack[-1][0][stripped[2:end]] = int(raw)
+                            continue
+                # Array entries of packed strings: `"value", -- [1]`
+                elif stripped[:1] == '"' and stripped[-1:] == "]":
+                    end = stripped.rfind('", -- [')
+                    if end > 0:
+                        frame = stack[-1]
+                        frame[0][frame[1]] = _unescape(stripped[1:end])
+                        frame[1] += 1
+                        continue
+
+            match = _LINE_RE.match(line)
+            if not match:
+                raise SavedVariablesError(path, line_number, f"Unsupported syntax: {line.strip()[:80]}")
+
+            skey, ikey, name, opened, inline_close, closed, string, number, keyword = match.group(
+                "skey", "ikey", "name", "open", "inline_close", "close", "str", "num", "kw"
+            )
+
+            # Root statement, e.g. `OAAData = {`
+            if not stack:
+                if name is None:
+                    if opened or closed or string is not None or number or keyword:
+                        raise SavedVariablesError(path, line_number, "Expected a global assignment")
+                    continue  # blank line or comment
+
+                in_target = name == variable_name
+                if opened and not inline_close:
+                    stack.append([{}, 1, None])
+                elif in_target:
+                    return  # target is nil, a scalar or an empty table
+                continue
+
+            if name is not None:
+                key: Any = name
+            elif skey is not None:
+                key = _unescape(skey)
+            elif ikey is not None:
+                key = int(ikey)
+            else:
+                key = None
+
+            if opened and not inline_close:
+                stack.append([{}, 1, key])
+                continue
+
+            if closed:
+                table, _, key = stack.pop()
+                if not stack:
+                    if in_target:
+                        return
+                    continue
+                value: Any = _finalize(table) if in_target else None
+            elif opened:
+                value = []
+            elif string is not None:
+                value = _unescape(string)
+            elif number:
+                value = _to_number(number)
+            elif keyword:
+                value = _KEYWORDS[keyword]
+            else:
+                if key is not None:
+                    raise SavedVariablesError(path, line_number, "Missing value")
+                continue  # blank line or comment
+
+            if not in_target:
+                continue
+
+            frame = stack[-1]
+            if key is None:
+                key = frame[1]
+                frame[1] += 1
+
+            # Values of the root table are handed out instead of being collected
+            if len(stack) == 1:
+                if value is not None:
+                    yield key, value
+                continue
+
+            if value is not None:
+                frame[0][key] = value
+
+    if stack:
+        raise SavedVariablesError(path, line_number, "Unexpected end of file, table was not closed")
+
+
+# Flattens a SavedVariables array of rows into one packed string per field, so each column crosses the
+# Lua/Python boundary in a single call. The file is loaded into a private environment to keep the runtime clean.
+_FLATTEN_LUA = """
+local FIELD_SEP, NIL = "\\31", "\\30"
+return function(path, name, fields)
+    local env = {}
+    local chunk, err = loadfile(path, "t", env)
+    if not chunk then error(err) end
+    chunk()
+
+    local rows = env[name]
+    if type(rows) ~= "table" then return 0 end
+
+    local n = #rows
+    local columns, buffer = {}, {}
+    for f = 1, #fields do
+        local field, numeric = fields[f], true
+        for i = 1, n do
+            local value = rows[i][field]
+            if value == nil then
+                buffer[i] = NIL
+            else
+                if type(value) ~= "number" then numeric = false end
+                buffer[i] = tostring(value)
+            end
+        end
+        columns[f] = (numeric and "n" or "s") .. table.concat(buffer, FIELD_SEP, 1, n)
+    end
+    env, rows, buffer = nil, nil, nil
+    return n, table.unpack(columns)
+end
+"""
+
+_FIELD_SEP = "\x1f"
+_NIL = "\x1e"
+
+_runtime_lock = threading.Lock()
+
+
+@cache
+def _get_lua_flattener() -> tuple[Any, Any]:
+    """The Lua runtime and its flatten function, created once and reused across parses"""
+    runtime = lupa.LuaRuntime(unpack_returned_tuples=True)
+    return runtime, runtime.execute(_FLATTEN_LUA)
+
+
+def _decode_column(packed: str, count: int) -> list[Any]:
+    kind, body = packed[0], packed[1:]
+    values: list[Any] = body.split(_FIELD_SEP) if count else []
+    if len(values) != count:
+        raise ValueError(f"Column has {len(values)} values, expected {count} (separator inside a value?)")
+
+    if kind == "n":
+        try:
+            return list(map(int, values))
+        except ValueError:
+            return [None if v == _NIL else _to_number(v) for v in values]
+
+    if _NIL in body:
+        return [None if v == _NIL else v for v in values]
+    return values
+
+
+def read_saved_variables_columns(path: Path, variable_name: str, fields: Sequence[str]) -> dict[str, list[Any]]:
+    """
+    Read an array of rows from a SavedVariables file as columns, using a reused Lua runtime.
+
+    The rows are flattened inside Lua into one packed string per field, so only a handful of values cross the
+    Lua/Python boundary regardless of the number of rows. Missing (nil) fields become None, fields are expected
+    to hold strings or numbers.
+
+    Args:
+        path: Path to the SavedVariables .lua file
+        variable_name: The global variable to read (e.g. "OAAData")
+        fields: The row fields to read
+
+    Returns:
+        A dict of field name to a list of values, all lists have the same length
+    """
+    with _runtime_lock:
+        runtime, flatten = _get_lua_flattener()
+        result = flatten(str(path), variable_name, runtime.table(*fields))
+        runtime.execute("collectgarbage()")
+
+    count, *packed = result if isinstance(result, tuple) else (result,)
+    if not count:
+        return {field: [] for field in fields}
+
+    return {field: _decode_column(column, count) for field, column in zip(fields, packed, strict=True)}
+
+
+# Packs the arrays of a keyed SavedVariables table (e.g. the compact OAAData) into one string per array
+_PACK_ARRAYS_LUA = """
+local FIELD_SEP = "\\31"
+return function(path, name, keys)
+    local env = {}
+    local chunk, err = loadfile(path, "t", env)
+    if not chunk then error(err) end
+    chunk()
+
+    local data = env[name]
+    if type(data) ~= "table" or #data > 0 or next(data) == nil then return nil end
+
+    local result = {}
+    for k = 1, #keys do
+        local values = data[keys[k]]
+        if type(values) == "table" then
+            result[2 * k - 1], result[2 * k] = #values, table.concat(values, FIELD_SEP)
+        else
+            result[2 * k - 1], result[2 * k] = -1, values
+        end
+    end
+    env, data = nil, nil
+    return table.unpack(result, 1, 2 * #keys)
+end
+"""
+
+
+@cache
+def _get_lua_array_packer() -> tuple[Any, Any]:
+    """The Lua runtime and its pack function, created once and reused across parses"""
+    runtime = lupa.LuaRuntime(unpack_returned_tuples=True)
+    return runtime, runtime.execute(_PACK_ARRAYS_LUA)
+
+
+def read_saved_variables_arrays(path: Path, variable_name: str, keys: Sequence[str]) -> dict[str, Any] | None:
+    """
+    Read the given keys of a keyed SavedVariables table, using a reused Lua runtime.
+
+    Arrays are packed into a single string inside Lua and come back as lists of strings (numbers are converted
+    to their string form), other values are returned as they are. Arrays may not contain nil or nested tables.
+
+    Args:
+        path: Path to the SavedVariables .lua file
+        variable_name: The global variable to read (e.g. "OAAData")
+        keys: The keys of the table to read
+
+    Returns:
+        A dict of key to value, or None if the variable is not a keyed table (e.g. an array of rows)
+    """
+    with _runtime_lock:
+        runtime, pack = _get_lua_array_packer()
+        result = pack(str(path), variable_name, runtime.table(*keys))
+        runtime.execute("collectgarbage()")
+
+    if result is None:
+        return None
+
+    values: dict[str, Any] = {}
+    for i, key in enumerate(keys):
+        count, value = result[2 * i], result[2 * i + 1]
+        if count < 0:
+            values[key] = value
+        else:
+            values[key] = value.split(_FIELD_SEP) if count else []
+            if len(values[key]) != count:
+                raise ValueError(f"{key} has {len(values[key])} values, expected {count} (separator inside a value?)")
+    return values
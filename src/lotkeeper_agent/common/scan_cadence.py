@@ -0,0 +1,180 @@
+import re
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+
+import numpy
+from loguru import logger
+
+from lotkeeper_agent.common.auction_snapshot import AuctionSnapshot
+from lotkeeper_agent.common.xdo_game import XDOGame
+from lotkeeper_agent.config import ENV
+from lotkeeper_agent.models.auction_batch import AuctionBatch
+
+# Recent scans of a realm that make up its churn rate, newer scans weigh more
+RECENT_SCANS = 6
+# Weight of a scan relative to the next newer one
+RECENT_SCAN_DECAY = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    realm TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    auctions INTEGER NOT NULL,
+    added INTEGER,
+    removed INTEGER,
+    elapsed REAL
+)
+"""
+
+_INDEX = "CREATE INDEX IF NOT EXISTS scans_realm ON scans (realm, finished_at)"
+
+
+@dataclass(frozen=True)
+class ScanRecord:
+    """Size of a scan and the listings added and removed since the previous scan of the realm"""
+
+    realm: str
+    finished_at: float
+    auctions: int
+    added: int | None = None
+    removed: int | None = None
+    elapsed: float | None = None  # seconds since the previous scan
+
+    @property
+    def churn(self) -> float | None:
+        """Changed listings relative to the size of the scan, None for the first scan"""
+        if self.added is None or self.removed is None:
+            return None
+        return (self.added + self.removed) / max(1, self.auctions)
+
+    @property
+    def churn_per_hour(self) -> float | None:
+        if self.churn is None or not self.elapsed:
+            return None
+        return self.churn / (self.elapsed / 3600)
+
+
+class ScanCadence:
+    """
+    Adaptive scan cadence: every full scan of a realm (with faction) is recorded with its size and churn, the next
+    scan of the realm is due once the expected churn reaches SCAN_CADENCE_TARGET_CHURN.
+
+    A busy realm is scanned as often as SCAN_CADENCE_MIN_INTERVAL, a quiet realm as rarely as
+    SCAN_CADENCE_MAX_INTERVAL. The listing keys of the last scan of every realm are kept next to the SQLite history,
+    8 bytes per listing.
+    """
+
+    def __init__(self, directory: Path | None = None) -> None:
+        self.directory = directory or XDOGame.Paths.get_data_dir() / "cadence"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute(_SCHEMA)
+            db.execute(_INDEX)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.directory / "history.sqlite", timeout=30)
+        try:
+            with db:  # commits, or rolls back on error
+                yield db
+        finally:
+            db.close()
+
+    def _keys_path(self, realm: str) -> Path:
+        file_name = re.sub(r"[^\w.-]+", "_", realm)
+        return self.directory / f"{file_name}.npy"
+
+    @staticmethod
+    def listing_keys(batch: AuctionBatch) -> numpy.ndarray:
+        """The listing keys of a scan (or of an item class of an incremental scan) to record"""
+        return AuctionSnapshot.from_batch(batch, "").keys
+
+    def record(self, realm: str, keys: numpy.ndarray) -> ScanRecord:
+        """Record a full scan of the realm by its listing keys, compared with the previous scan of the realm"""
+        now = time.time()
+
+        previous = self.history(realm, limit=1)
+        path = self._keys_path(realm)
+        record = ScanRecord(realm, now, len(keys))
+        # Scans too far apart say little about the current churn, the listings have turned over anyway
+        if previous and path.exists() and now - previous[0].finished_at <= 2 * ENV.SCAN_CADENCE_MAX_INTERVAL:
+            try:
+                base = numpy.load(path)
+                record = ScanRecord(
+                    realm,
+                    now,
+                    len(keys),
+                    added=int(numpy.count_nonzero(~numpy.isin(keys, base))),
+                    removed=int(numpy.count_nonzero(~numpy.isin(base, keys))),
+                    elapsed=now - previous[0].finished_at,
+                )
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable listing keys {path}: {e}")
+
+        tmp_path = path.with_suffix(".tmp.npy")
+        numpy.save(tmp_path, keys)
+        tmp_path.replace(path)
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO scans (realm, finished_at, auctions, added, removed, elapsed) VALUES (?, ?, ?, ?, ?, ?)",
+                (realm, record.finished_at, record.auctions, record.added, record.removed, record.elapsed),
+            )
+            # Only the recent scans are used, older ones are dropped
+            db.execute(
+                "DELETE FROM scans WHERE realm = ? AND finished_at < "
+                "(SELECT MIN(finished_at) FROM (SELECT finished_at FROM scans WHERE realm = ? "
+                "ORDER BY finished_at DESC LIMIT ?))",
+                (realm, realm, RECENT_SCANS),
+            )
+
+        if record.churn is not None:
+            logger.info(
+                f"Scan of {realm}: {record.auctions} auctions, {record.added} added, {record.removed} removed "
+                f"({record.churn:.1%} churn in {record.elapsed or 0:.0f}s)"
+            )
+        return record
+
+    def history(self, realm: str, limit: int = RECENT_SCANS) -> list[ScanRecord]:
+        """The recent scans of the realm, newest first"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT realm, finished_at, auctions, added, removed, elapsed FROM scans "
+                "WHERE realm = ? ORDER BY finished_at DESC LIMIT ?",
+                (realm, limit),
+            ).fetchall()
+        return [ScanRecord(*row) for row in rows]
+
+    def churn_per_hour(self, realm: str) -> float | None:
+        """Weighted churn per hour of the recent scans of the realm, None if there is none to go by"""
+        rates = [rate for record in self.history(realm) if (rate := record.churn_per_hour) is not None]
+        if not rates:
+            return None
+        weights = [RECENT_SCAN_DECAY**i for i in range(len(rates))]
+        return sum(w * r for w, r in zip(weights, rates, strict=True)) / sum(weights)
+
+    def next_interval(self, realm: str) -> float:
+        """Seconds until the next scan of the realm is due, within the configured bounds"""
+        low, high = ENV.SCAN_CADENCE_MIN_INTERVAL, ENV.SCAN_CADENCE_MAX_INTERVAL
+        rate = self.churn_per_hour(realm)
+        if rate is None:
+            interval = float(low)  # no churn known yet, scan again soon to measure it
+        elif rate <= 0:
+            interval = float(high)
+        else:
+            interval = ENV.SCAN_CADENCE_TARGET_CHURN / rate * 3600
+        interval = min(max(interval, low), high)
+
+        rate_text = f"{rate:.1%}/h churn" if rate is not None else "unknown churn"
+        logger.info(f"Cadence of {realm}: {rate_text}, next scan in {interval / 60:.0f}m")
+        return interval
+
+
+@cache
+def get_scan_cadence() -> ScanCadence:
+    """The scan history under the data directory, shared by the scan task and the agents"""
+    return ScanCadence()
@@ -0,0 +1,146 @@
+import time
+from dataclasses import dataclass
+
+from loguru import logger
+
+from lotkeeper_agent.common.auction_snapshot import AuctionDelta, AuctionSnapshot
+from lotkeeper_agent.common.auction_uploader import (
+    AuctionUploader,
+    ChunkedAuctionUploader,
+    DeltaAuctionUploader,
+    SummaryAuctionUploader,
+)
+from lotkeeper_agent.common.discord_logger import discord_logger
+from lotkeeper_agent.config import ENV, PayloadVersion, UploadMode, UploadSummary
+from lotkeeper_agent.models.auction import AuctionData, NormalizedAuctionData
+from lotkeeper_agent.models.auction_batch import AuctionBatch
+from lotkeeper_agent.models.auction_summary import summarize_batch
+
+
+@dataclass(frozen=True)
+class ScanPart:
+    """
+    One item class of an incremental scan (or the item classes of a targeted scan), the API combines the parts that
+    share a group
+    """
+
+    group: str
+    index: int
+    total: int
+    class_name: str
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {
+            "X-Scan-Group": self.group,
+            "X-Scan-Part": f"{self.index}/{self.total}",
+            "X-Scan-Part-Class": self.class_name,
+        }
+
+    def __str__(self) -> str:
+        return f"{self.class_name} ({self.index}/{self.total})"
+
+
+def build_envelope(realm: str) -> AuctionData | NormalizedAuctionData:
+    """The payload model of the configured payload version, the auctions are encoded straight from the batch"""
+    match ENV.UPLOAD_PAYLOAD_VERSION:
+        case PayloadVersion.V1:
+            return AuctionData(server=ENV.WOW_SERVER, realm=realm, auctions=[])
+        case PayloadVersion.V2:
+            return NormalizedAuctionData(server=ENV.WOW_SERVER, realm=realm, items={}, auctions=[])
+
+
+def send_scan(batch: AuctionBatch, realm: str, scan_id: str, part: ScanPart | None = None) -> None:
+    """
+    Send a scan to the Lotkeeper API, as a delta against the previous scan or as a full upload, and/or as
+    per-item price statistics (UPLOAD_SUMMARY)
+
+    Args:
+        batch: The auctions of the scan
+        realm: The realm (with faction) of the scan
+        scan_id: Stable identifier of the scan, used to resume chunked uploads
+        part: The item class of an incremental scan, parts are always sent in full as a snapshot only
+            covers a whole scan
+
+    Raises:
+        httpx.HTTPError: If the upload fails
+    """
+    if ENV.UPLOAD_SUMMARY != UploadSummary.ONLY:
+        snapshot = AuctionSnapshot.from_batch(batch, realm) if ENV.UPLOAD_DELTA and part is None else None
+        if not (snapshot and _send_delta(batch, snapshot)):
+            _send_full(batch, build_envelope(realm), scan_id, snapshot, part)
+        if snapshot:
+            snapshot.save()
+
+    if ENV.UPLOAD_SUMMARY != UploadSummary.OFF:
+        _send_summary(batch, realm, part)
+
+
+def _send_delta(batch: AuctionBatch, snapshot: AuctionSnapshot) -> bool:
+    """Send the changes since the previous snapshot, returns False if a full upload is needed instead"""
+    base = AuctionSnapshot.load(snapshot.realm)
+    if base is None:
+        logger.info("No snapshot of a previous scan, sending a full upload")
+        return False
+    if time.time() - base.created_at > ENV.UPLOAD_DELTA_MAX_AGE:
+        logger.info("Snapshot of the previous scan is too old, sending a full upload")
+        return False
+
+    delta = AuctionDelta.between(base, snapshot)
+    logger.info(f"Delta: {len(delta.added)} added, {len(delta.removed)} removed ({delta.churn:.1%} churn)")
+    if delta.churn > ENV.UPLOAD_DELTA_MAX_CHURN:
+        logger.info("Too many changes since the previous scan, sending a full upload")
+        return False
+
+    envelope = delta.envelope(ENV.WOW_SERVER)
+    try:
+        chunks = batch.take(delta.added).iter_normalized_json(envelope)
+        DeltaAuctionUploader().upload(chunks, PayloadVersion.V2)
+    except Exception as e:
+        if DeltaAuctionUploader.is_resync_required(e):
+            logger.warning("Lotkeeper API does not hold the previous snapshot, sending a full upload")
+            return False
+        raise
+
+    discord_logger.info(
+        f"Sent {len(delta.added)} new and {len(delta.removed)} removed auctions to the Lotkeeper API",
+        "Scan Auction House Update",
+    )
+    return True
+
+
+def _send_full(
+    batch: AuctionBatch,
+    envelope: AuctionData | NormalizedAuctionData,
+    scan_id: str,
+    snapshot: AuctionSnapshot | None,
+    part: ScanPart | None = None,
+) -> None:
+    """Send the whole scan, either streamed as one request or as resumable parallel chunks"""
+    # The snapshot ID lets the API tell which scan it holds, the base of the next delta
+    headers = {"X-Snapshot-Id": snapshot.snapshot_id} if snapshot else {}
+    if part:
+        headers.update(part.headers)
+    match ENV.UPLOAD_MODE:
+        case UploadMode.STREAM:
+            if isinstance(envelope, NormalizedAuctionData):
+                chunks = batch.iter_normalized_json(envelope)
+            else:
+                chunks = batch.iter_json(envelope)
+            AuctionUploader().upload(chunks, ENV.UPLOAD_PAYLOAD_VERSION, headers or None)
+        case UploadMode.CHUNKED:
+            ChunkedAuctionUploader().upload_batch(batch, envelope, ENV.UPLOAD_PAYLOAD_VERSION, scan_id, headers or None)
+    of_part = f" of {part}" if part else ""
+    discord_logger.info(f"Sent {len(batch)} auctions{of_part} to the Lotkeeper API", "Scan Auction House Update")
+
+
+def _send_summary(batch: AuctionBatch, realm: str, part: ScanPart | None = None) -> None:
+    """Send the per-item price statistics of the scan"""
+    start = time.time()
+    summary = summarize_batch(batch, ENV.WOW_SERVER, realm, by_owner=ENV.UPLOAD_SUMMARY_BY_OWNER)
+    logger.info(f"Summarized {len(batch)} auctions into {len(summary.summaries)} items in {time.time() - start:.2f}s")
+
+    SummaryAuctionUploader().upload_model(summary, None, part.headers if part else None)
+    discord_logger.info(
+        f"Sent price statistics of {len(summary.summaries)} items to the Lotkeeper API", "Scan Auction House Update"
+    )
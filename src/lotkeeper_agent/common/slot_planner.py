@@ -0,0 +1,150 @@
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+# Minutes in the cycle that is planned, every packed agent repeats within the hour
+CYCLE_MINUTES = 60
+# Rounds of moving single agents to a better offset after the first placement
+IMPROVE_ROUNDS = 10
+
+
+def hourly_minutes(cron_expr: str) -> list[int] | None:
+    """The minutes of the hour a cron expression runs at, None if it does not run every hour (e.g. daily)"""
+    minute_field, *other_fields = cron_expr.split()
+    if other_fields != ["*", "*", "*", "*"]:
+        return None
+    try:
+        minutes = sorted({int(minute) for minute in minute_field.split(",")})
+    except ValueError:
+        return None
+    return minutes if all(0 <= minute < CYCLE_MINUTES for minute in minutes) else None
+
+
+@dataclass(frozen=True)
+class SlotRequest:
+    """An agent to place: its job, the minutes of its cron expression and its expected duration"""
+
+    key: str
+    name: str
+    minutes: list[int]
+    duration: float  # seconds
+    group: str | None = None  # agents of the same group (account) never run at the same time
+
+    @property
+    def length(self) -> int:
+        """Minutes the agent occupies per run, a run of an hour or longer occupies the whole cycle"""
+        return min(max(1, math.ceil(self.duration / 60)), CYCLE_MINUTES)
+
+
+@dataclass(frozen=True)
+class Slot:
+    """The start minutes assigned to an agent, its cron minutes shifted by the offset"""
+
+    request: SlotRequest
+    offset: int
+
+    @property
+    def starts(self) -> list[int]:
+        return sorted((minute + self.offset) % CYCLE_MINUTES for minute in self.request.minutes)
+
+    def covered(self, start: int | None = None) -> list[int]:
+        """The minutes of the cycle the agent runs in, from all its starts or from a single start"""
+        starts = self.starts if start is None else [start]
+        return [(s + i) % CYCLE_MINUTES for s in starts for i in range(self.request.length)]
+
+    @property
+    def cron_minutes(self) -> str:
+        return ",".join(map(str, self.starts))
+
+
+class SlotPlan:
+    """
+    Start minutes of the agents within the hour, so that at most capacity agents run at a time.
+
+    Agents are placed longest first at the offset from their cron minutes that overloads the least, then at the
+    smallest offset, and moved again while that lowers their overload. Agents of the same account are kept apart,
+    as an account can only be logged in once.
+    """
+
+    def __init__(self, capacity: int, requests: list[SlotRequest]) -> None:
+        self.capacity = max(1, capacity)
+        self.slots: dict[str, Slot] = {}
+        for request in sorted(requests, key=lambda r: (-r.length * len(r.minutes), r.key)):
+            self.slots[request.key] = self._best_slot(request)
+
+        # Placing longest first can box in a later agent, move every agent to its best offset given the others
+        for _round in range(IMPROVE_ROUNDS):
+            moved = False
+            for key, slot in list(self.slots.items()):
+                best = self._best_slot(slot.request)
+                if self._cost(best) < self._cost(slot):
+                    self.slots[key] = best
+                    moved = True
+            if not moved:
+                break
+
+    def _best_slot(self, request: SlotRequest) -> Slot:
+        candidates = (Slot(request, offset) for offset in range(CYCLE_MINUTES))
+        return min(candidates, key=lambda slot: (*self._cost(slot), slot.offset))
+
+    def _cost(self, slot: Slot, minutes: list[int] | None = None) -> tuple[int, int]:
+        """Minutes run next to the same account and minutes over capacity when the slot is added"""
+        load = self.load(exclude=slot.request.key)
+        busy = self._group_minutes(slot.request)
+        covered = slot.covered() if minutes is None else minutes
+        conflicts = sum(1 for minute in covered if minute in busy)
+        overload = sum(max(0, load[minute] + 1 - self.capacity) for minute in covered)
+        return conflicts, overload
+
+    def _group_minutes(self, request: SlotRequest) -> set[int]:
+        if request.group is None:
+            return set()
+        return {
+            minute
+            for slot in self.slots.values()
+            if slot.request.group == request.group and slot.request.key != request.key
+            for minute in slot.covered()
+        }
+
+    def load(self, exclude: str | None = None) -> list[int]:
+        """Agents running in every minute of the cycle"""
+        load = [0] * CYCLE_MINUTES
+        for key, slot in self.slots.items():
+            if key != exclude:
+                for minute in slot.covered():
+                    load[minute] += 1
+        return load
+
+    @property
+    def peak(self) -> int:
+        return max(self.load(), default=0)
+
+    def duration_of(self, key: str) -> float | None:
+        slot = self.slots.get(key)
+        return slot.request.duration if slot else None
+
+    def next_free_start(self, key: str, after: datetime) -> datetime:
+        """
+        The first start at or after the given time where the agent fits next to the planned slots, for agents that
+        move their own runs. The given time if there is no room within the hour.
+        """
+        slot = self.slots.get(key)
+        if slot is None:
+            return after
+        start = after.replace(second=0, microsecond=0)
+        if start < after:
+            start += timedelta(minutes=1)
+        for delay in range(CYCLE_MINUTES):
+            candidate = start + timedelta(minutes=delay)
+            if self._cost(slot, slot.covered(candidate.minute)) == (0, 0):
+                return candidate
+        return after
+
+    def timeline(self) -> str:
+        """The planned hour: the load of every minute and the runs of every agent"""
+        load = "".join(str(min(n, 9)) for n in self.load())
+        lines = [f"Planned schedule for {self.capacity} concurrent agent(s), peak {self.peak}", f"  load |{load}|"]
+        for slot in sorted(self.slots.values(), key=lambda s: (s.starts, s.request.name)):
+            runs = ", ".join(f":{s:02d}-:{(s + slot.request.length) % CYCLE_MINUTES:02d}" for s in slot.starts)
+            lines.append(f"  {runs} {slot.request.name} (~{slot.request.duration / 60:.0f}m)")
+        return "\n".join(lines)
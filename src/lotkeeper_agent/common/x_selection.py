@@ -0,0 +1,140 @@
+import select
+import threading
+from types import TracebackType
+
+from loguru import logger
+from Xlib import X, Xatom, display
+from Xlib.protocol import event as xevent
+
+from lotkeeper_agent.common.display_session import current_display
+
+
+class XSelectionOwner:
+    """Owns the X CLIPBOARD/PRIMARY selections and serves a single text value to requestors.
+
+    Wine bridges the X selections to the Windows clipboard, so once we own the selection a `ctrl+v` in the
+    focused WoW edit box makes Wine request the text from us. Every data request that we serve is counted,
+    which lets the caller verify that the paste was actually picked up by the game. Wine may also fetch the
+    text on its own as the selection owner changes, so only the requests after `arm()` verify a paste.
+
+    Usage:
+        with XSelectionOwner("some text") as owner:
+            owner.arm()
+            XDO.Interact.press_key("ctrl+v")
+            owner.wait_for_transfer(timeout=2.0)
+    """
+
+    SELECTIONS = ("CLIPBOARD", "PRIMARY")
+
+    def __init__(self, text: str, display_name: str | None = None) -> None:
+        self.text = text
+        self._data = text.encode("utf-8")
+        self._display = display.Display(display_name or current_display())
+        self._window = self._display.screen().root.create_window(0, 0, 1, 1, 0, X.CopyFromParent)
+
+        # Atoms we offer
+        self._targets = self._display.intern_atom("TARGETS")
+        self._utf8_string = self._display.intern_atom("UTF8_STRING")
+        self._text_atom = self._display.intern_atom("TEXT")
+        self._selections = [self._display.intern_atom(name) for name in self.SELECTIONS]
+
+        self._transfers = 0
+        self._armed = False
+        self._transferred = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "XSelectionOwner":
+        self.acquire()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.release()
+
+    @property
+    def transfers(self) -> int:
+        """Number of data (non-TARGETS) requests that were served"""
+        return self._transfers
+
+    def acquire(self) -> None:
+        """Become the owner of the selections and start serving requests"""
+        for selection in self._selections:
+            self._window.set_selection_owner(selection, X.CurrentTime)
+        self._display.flush()
+
+        for selection in self._selections:
+            if self._display.get_selection_owner(selection) != self._window:
+                raise RuntimeError("Failed to acquire X selection ownership")
+
+        self._thread = threading.Thread(target=self._serve, name="x-selection-owner", daemon=True)
+        self._thread.start()
+
+    def arm(self) -> None:
+        """Only wait for the requests from now on, call right before sending the paste keystroke"""
+        self._transferred.clear()
+        self._armed = True
+
+    def wait_for_transfer(self, timeout: float = 2.0) -> bool:
+        """Wait until a requestor fetched the text after `arm()`, returns False on timeout"""
+        return self._transferred.wait(timeout)
+
+    def release(self) -> None:
+        """Stop serving, give up the selections and close the display connection"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+        try:
+            # Destroying the owner window clears the selections, so credentials do not linger on the clipboard
+            self._window.destroy()
+            self._display.close()
+        except Exception as e:
+            logger.debug(f"Failed to release X selection cleanly: {e}")
+
+    def _serve(self) -> None:
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._display], [], [], 0.1)
+            if not readable and not self._display.pending_events():
+                continue
+
+            while self._display.pending_events():
+                ev = self._display.next_event()
+                if ev.type == X.SelectionRequest:
+                    self._handle_request(ev)
+                elif ev.type == X.SelectionClear:
+                    logger.debug("Lost X selection ownership")
+
+    def _handle_request(self, ev: xevent.SelectionRequest) -> None:
+        # Obsolete clients may send None as property, in which case the target is used
+        prop = ev.property if ev.property != X.NONE else ev.target
+
+        if ev.target == self._targets:
+            targets = [self._targets, self._utf8_string, Xatom.STRING, self._text_atom]
+            ev.requestor.change_property(prop, Xatom.ATOM, 32, targets)
+        elif ev.target in (self._utf8_string, Xatom.STRING, self._text_atom):
+            ev.requestor.change_property(prop, ev.target, 8, self._data)
+            self._transfers += 1
+        else:
+            prop = X.NONE
+
+        notify = xevent.SelectionNotify(
+            time=ev.time,
+            requestor=ev.requestor,
+            selection=ev.selection,
+            target=ev.target,
+            property=prop,
+        )
+        ev.requestor.send_event(notify, event_mask=0)
+        self._display.flush()
+
+        if prop != X.NONE and ev.target != self._targets:
+            if self._armed:
+                self._transferred.set()
+            else:
+                logger.debug("Served the X selection before the paste, not counted as pasted")
@@ -4,7 +4,10 @@ from dataclasses import dataclass
 
 from loguru import logger
 
+from lotkeeper_agent.common.display_session import display_env
 from lotkeeper_agent.common.sleep_util import SleepUtil
+from lotkeeper_agent.common.x_selection import XSelectionOwner
+from lotkeeper_agent.config import ENV, TextEntryMode
 
 
 @dataclass
@@ -26,7 +29,7 @@ class XDO:
     def run_xdotool(*args: str) -> bool:
         try:
             cmd = ["xdotool", *list(args)]
-            result = subprocess.run(cmd, check=False, capture_output=True, text=True, timeout=10)
+            result = subprocess.run(cmd, check=False, capture_output=True, text=True, timeout=10, env=display_env())
             if result.returncode != 0:
                 logger.warning(f"xdotool command failed: {' '.join(cmd)}, stderr: {result.stderr}")
                 return False
@@ -40,7 +43,7 @@ class XDO:
 
     class Window:
         @staticmethod
-        def wait(window_patterns: list[str], timeout: int = 60) -> tuple[bool, WindowInfo]:
+        def wait(window_patterns: list[str], timeout: int = 60, interval: float = 2) -> tuple[bool, WindowInfo]:
             start_time = time.time()
             while time.time() - start_time < timeout:
                 for pattern in window_patterns:
@@ -51,6 +54,7 @@ class XDO:
                             capture_output=True,
                             text=True,
                             timeout=5,
+                            env=display_env(),
                         )
                         if result.returncode == 0 and result.stdout.strip():
                             window_id = result.stdout.strip().split("\n")[0]
@@ -60,6 +64,7 @@ class XDO:
                                 capture_output=True,
                                 text=True,
                                 timeout=5,
+                                env=display_env(),
                             )
                             actual_title = title_result.stdout.strip() if title_result.returncode == 0 else pattern
                             logger.info(f"Found WoW window: '{actual_title}' (ID: {window_id})")
@@ -69,7 +74,7 @@ class XDO:
                     except Exception:
                         continue
 
-                time.sleep(2)
+                time.sleep(interval)
 
             logger.error(f"No WoW window found within {timeout} seconds")
             return False, WindowInfo(title="", id="")
@@ -79,7 +84,12 @@ class XDO:
             for pattern in window_patterns:
                 try:
                     result = subprocess.run(
-                        ["xdotool", "search", "--name", pattern], check=False, capture_output=True, text=True, timeout=5
+                        ["xdotool", "search", "--name", pattern],
+                        check=False,
+                        capture_output=True,
+                        text=True,
+                        timeout=5,
+                        env=display_env(),
                     )
                     if result.returncode == 0 and result.stdout.strip():
                         window_id = result.stdout.strip().split("\n")[0]
@@ -89,6 +99,7 @@ class XDO:
                             capture_output=True,
                             text=True,
                             timeout=5,
+                            env=display_env(),
                         )
                         if activate_result.returncode == 0:
                             return True
@@ -104,6 +115,47 @@ class XDO:
             return False
 
     class Interact:
+        @staticmethod
+        def enter_text(text: str, mode: TextEntryMode | None = None) -> None:
+            """Enter text into the focused input, either typed or pasted depending on the configured mode"""
+            mode = mode or ENV.TEXT_ENTRY_MODE
+            if mode == TextEntryMode.PASTE and XDO.Interact.paste_text(text):
+                return
+
+            XDO.Interact.type_text(text)
+
+        @staticmethod
+        def paste_text(text: str, timeout: float | None = None) -> bool:
+            """
+            Paste text into the focused input via the X CLIPBOARD/PRIMARY selections
+
+            Args:
+                text: The text to paste
+                timeout: Seconds to wait for the game to fetch the selection
+
+            Returns:
+                True if the game fetched the text, False if the paste was not accepted and nothing was entered
+            """
+            timeout = ENV.TEXT_ENTRY_PASTE_TIMEOUT if timeout is None else timeout
+            try:
+                with XSelectionOwner(text) as owner:
+                    SleepUtil.sleep_keypress_duration()
+                    # Wine may fetch the selection as its owner changes, only a fetch after the keystroke is a paste
+                    owner.arm()
+                    if not XDO.run_xdotool("key", "--clearmodifiers", "ctrl+v"):
+                        return False
+
+                    if owner.wait_for_transfer(timeout):
+                        return True
+            except Exception as e:
+                logger.warning(f"Failed to paste text through the X selection: {e}")
+                return False
+
+            # The paste may still land late, select the input so typing replaces it instead of appending
+            logger.warning("Paste was not accepted by the game window, falling back to typing")
+            XDO.Interact.press_key("ctrl+a")
+            return False
+
         @staticmethod
         def type_text(text: str, retries: int = 3) -> None:
             for _ in range(retries):
@@ -1,12 +1,21 @@
-import os
 import re
+import shutil
 import subprocess
+import time
+from collections.abc import Iterator, Sequence
 from pathlib import Path
 from typing import Any
 
 import lupa
 from loguru import logger
 
+from lotkeeper_agent.common.display_session import display_env
+from lotkeeper_agent.common.saved_variables import (
+    iter_saved_variables_items,
+    iter_saved_variables_table,
+    read_saved_variables_arrays,
+    read_saved_variables_columns,
+)
 from lotkeeper_agent.common.xdo import XDO
 from lotkeeper_agent.config import ENV
 
@@ -26,7 +35,7 @@ class XDOGame:
 
             XDO.Interact.press_key("Return")
             XDO.Interact.press_key("ctrl+a")
-            XDO.Interact.type_text(command)
+            XDO.Interact.enter_text(command)
             XDO.Interact.press_key("Return")
 
         @staticmethod
@@ -118,6 +127,30 @@ class XDOGame:
 
             return lua_to_python(lua_table)
 
+        @staticmethod
+        def iter_saved_variables_lua(saved_variables_path: Path, variable_name: str) -> Iterator[Any]:
+            """Stream the entries of a table in a WoW SavedVariables.lua file one at a time, with bounded memory."""
+            return iter_saved_variables_table(saved_variables_path, variable_name)
+
+        @staticmethod
+        def iter_saved_variables_lua_items(saved_variables_path: Path, variable_name: str) -> Iterator[tuple[Any, Any]]:
+            """Stream the (key, value) pairs of a table in a WoW SavedVariables.lua file one at a time"""
+            return iter_saved_variables_items(saved_variables_path, variable_name)
+
+        @staticmethod
+        def parse_saved_variables_lua_columns(
+            saved_variables_path: Path, variable_name: str, fields: Sequence[str]
+        ) -> dict[str, list[Any]]:
+            """Parse an array of rows in a WoW SavedVariables.lua file into per-field columns, flattened in Lua."""
+            return read_saved_variables_columns(saved_variables_path, variable_name, fields)
+
+        @staticmethod
+        def parse_saved_variables_lua_arrays(
+            saved_variables_path: Path, variable_name: str, keys: Sequence[str]
+        ) -> dict[str, Any] | None:
+            """Parse the keys of a keyed table in a WoW SavedVariables.lua file, arrays packed in Lua"""
+            return read_saved_variables_arrays(saved_variables_path, variable_name, keys)
+
         @staticmethod
         def get_wtf_config_path() -> Path | None:
             """Get the path to the WTF config"""
@@ -167,6 +200,81 @@ class XDOGame:
                 logger.exception(f"Failed to write WTF config: {e}")
                 raise
 
+    class Wine:
+        """Wine related operations"""
+
+        PREFIX = "/home/wineuser/.wine"
+
+        @staticmethod
+        def env() -> dict[str, str]:
+            """The environment of wine commands, on the display of the current session"""
+            return display_env(WINEDEBUG="-all", WINEPREFIX=XDOGame.Wine.PREFIX)
+
+        @staticmethod
+        def start_server() -> None:
+            """Start a persistent wineserver for the prefix, so launching the game does not start (and stop) one"""
+            try:
+                # Daemonizes, exits right away if a wineserver is already running for the prefix
+                subprocess.run(
+                    ["wineserver", "--persistent"],
+                    env=XDOGame.Wine.env(),
+                    check=False,
+                    timeout=30,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                logger.info("Started a persistent wineserver")
+            except Exception as e:
+                logger.warning(f"Failed to start a persistent wineserver: {e}")
+
+        @staticmethod
+        def prewarm(preload_dlls: list[str]) -> None:
+            """
+            Start the persistent wineserver and boot the prefix once, so the first launch of the game is not a cold one
+
+            Args:
+                preload_dlls: DLL names to read into the page cache, e.g. ["d3d9.dll", "opengl32.dll"]
+            """
+            start = time.time()
+            XDOGame.Wine.start_server()
+            try:
+                # Runs wineboot and starts the prefix services, which stay up with the persistent wineserver
+                subprocess.run(
+                    ["wine", "cmd", "/c", "exit"],
+                    env=XDOGame.Wine.env(),
+                    check=False,
+                    timeout=120,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            except Exception as e:
+                logger.warning(f"Failed to boot the Wine prefix: {e}")
+
+            preloaded = XDOGame.Wine.preload(preload_dlls) if preload_dlls else 0
+            logger.info(f"Warmed up the Wine prefix in {time.time() - start:.1f}s ({preloaded} DLLs preloaded)")
+
+        @staticmethod
+        def preload(dll_names: list[str]) -> int:
+            """Read DLLs of the prefix and the Wine installation into the page cache, returns the number of files read"""
+            wanted = {name.lower() for name in dll_names}
+            roots = [Path(XDOGame.Wine.PREFIX) / "drive_c" / "windows"]
+            if wine := shutil.which("wine"):
+                roots.extend(Path(wine).resolve().parent.parent.glob("lib*/wine"))
+
+            read = 0
+            for root in roots:
+                for path in root.rglob("*.dll"):
+                    if path.name.lower() not in wanted:
+                        continue
+                    try:
+                        with open(path, "rb") as f:
+                            while f.read(1 << 20):
+                                pass
+                        read += 1
+                    except OSError as e:
+                        logger.debug(f"Failed to preload {path}: {e}")
+            return read
+
     class Process:
         """Process related operations"""
 
@@ -181,9 +289,8 @@ class XDOGame:
 
             logger.info(f"Found {wow_path}, starting game...")
 
-            # Set up Wine environment
-            wine_env = os.environ.copy()
-            wine_env.update({"WINEDEBUG": "-all", "WINEPREFIX": "/home/wineuser/.wine", "DISPLAY": ":99"})
+            # Set up Wine environment, on the display of the current session
+            wine_env = XDOGame.Wine.env()
 
             try:
                 # Start WoW with Wine
@@ -8,6 +8,50 @@ class AgentMode(Enum):
     AUTO = "AUTO"
 
 
+class TextEntryMode(Enum):
+    TYPE = "TYPE"
+    PASTE = "PASTE"
+
+
+class SavedVariablesBackend(Enum):
+    STREAMING = "STREAMING"
+    LUPA = "LUPA"
+    LUPA_BULK = "LUPA_BULK"
+
+
+class ScanMode(Enum):
+    FULL = "FULL"  # the whole auction house is written to SavedVariables once the scan completes
+    INCREMENTAL = "INCREMENTAL"  # every item class is flushed and uploaded while the next one is scanned
+    MASS = "MASS"  # the whole auction house in one getAll query where the realm allows it, paged otherwise
+
+
+class PayloadVersion(Enum):
+    V1 = "V1"  # every auction embeds its item
+    V2 = "V2"  # items are sent once and referenced by ID
+
+
+class UploadCompression(Enum):
+    NONE = "NONE"
+    GZIP = "GZIP"
+    ZSTD = "ZSTD"  # requires the zstd extra (zstandard)
+
+
+class UploadMode(Enum):
+    STREAM = "STREAM"  # the whole scan in a single streamed request
+    CHUNKED = "CHUNKED"  # idempotent, resumable chunks sent in parallel
+
+
+class UploadSummary(Enum):
+    OFF = "OFF"  # only the listings
+    ALONGSIDE = "ALONGSIDE"  # the listings and per-item price statistics
+    ONLY = "ONLY"  # only per-item price statistics
+
+
+class InvalidAuctionRows(Enum):
+    FAIL = "FAIL"  # fail the scan on the first invalid row
+    DROP = "DROP"  # repair the nil fields the addon can produce, drop the rows that are still invalid
+
+
 class AppEnvironment(BaseSettings):
     """Application environment settings."""
 
@@ -20,10 +64,74 @@ class AppEnvironment(BaseSettings):
 
     # Run the agent in manual or auto mode
     AGENT_MODE: AgentMode = AgentMode.MANUAL
+    # Agents (accounts) that run at the same time, each on its own virtual display (:99, :100, …)
+    AGENT_CONCURRENCY: int = 1
+    # Plan the start minutes of the hourly agents by their recent run durations, so no more than AGENT_CONCURRENCY
+    # agents run at a time, planned again once an expected duration drifts by more than the given share
+    SCHEDULE_PACKING: bool = False
+    SCHEDULE_PACKING_DRIFT: float = 0.25
+    # Retries of failed runs every agent may take per day, on top of the retries of a single run
+    AGENT_RETRY_BUDGET: int = 6
+    # Retries continue at the first task that is not done yet: the game of the failed run is kept running, tasks
+    # the game is still past are skipped and a parsed scan that could not be handed over is not scanned again
+    TASK_CHECKPOINTS: bool = False
+
+    # Upload payload format, keep V1 for API servers that do not support the normalized format yet
+    UPLOAD_PAYLOAD_VERSION: PayloadVersion = PayloadVersion.V1
+    # Content-Encoding of the streamed upload body, the API server must support it
+    UPLOAD_COMPRESSION: UploadCompression = UploadCompression.NONE
+    UPLOAD_MODE: UploadMode = UploadMode.STREAM
+    # Chunked uploads: auctions per chunk, chunks in flight and retries per chunk
+    UPLOAD_CHUNK_SIZE: int = 25_000
+    UPLOAD_CONCURRENCY: int = 4
+    UPLOAD_CHUNK_RETRIES: int = 5
+    # Delta uploads: only send the listings that changed since the last uploaded scan (snapshot under /data),
+    # with a full upload when there is no usable snapshot, the churn is too high or the snapshot is too old
+    UPLOAD_DELTA: bool = False
+    UPLOAD_DELTA_MAX_CHURN: float = 0.5
+    UPLOAD_DELTA_MAX_AGE: int = 6 * 60 * 60
+    # Outbox: spool parsed scans to /data and upload them from a background job, retried with backoff (seconds)
+    UPLOAD_OUTBOX: bool = False
+    UPLOAD_OUTBOX_RETRY_DELAY: int = 60
+    UPLOAD_OUTBOX_MAX_AGE: int = 24 * 60 * 60
+    # Per-item price statistics, optionally broken down per seller
+    UPLOAD_SUMMARY: UploadSummary = UploadSummary.OFF
+    UPLOAD_SUMMARY_BY_OWNER: bool = False
 
     # --- WoW ---
     WOW_SERVER: str = ""
     WOW_EXE: str = "WoW.exe"
+    # Keep the game running and in the world between runs, restarted after a crash or the maximum uptime (seconds)
+    GAME_SESSION_PERSISTENT: bool = False
+    GAME_SESSION_MAX_UPTIME: int = 12 * 60 * 60
+    # Keep a wineserver running for the prefix and boot the prefix at start, optionally reading DLLs into the page
+    # cache (comma separated, e.g. "d3d9.dll,opengl32.dll,wined3d.dll")
+    WINE_PERSISTENT_SERVER: bool = False
+    WINE_PRELOAD_DLLS: str = ""
+
+    # INCREMENTAL requires OpenAuctionScanner 1.1.0 or later, MASS requires 1.4.0 or later
+    SCAN_MODE: ScanMode = ScanMode.FULL
+    # Item classes scanned every 15 minutes between the hourly scans, comma separated as named by the addon
+    # (e.g. "trade goods,consumable"), requires OpenAuctionScanner 1.6.0 or later
+    SCAN_HOT_CLASSES: str = ""
+    # Schedule the full scans of every realm by their churn instead of hourly: the next scan is due once the
+    # expected share of changed listings reaches the target, between the minimum and maximum interval (seconds)
+    SCAN_CADENCE_ADAPTIVE: bool = False
+    SCAN_CADENCE_TARGET_CHURN: float = 0.1
+    SCAN_CADENCE_MIN_INTERVAL: int = 20 * 60
+    SCAN_CADENCE_MAX_INTERVAL: int = 4 * 60 * 60
+
+    # STREAMING reads the SavedVariables line by line, LUPA executes the whole file in a Lua runtime,
+    # LUPA_BULK flattens the rows into columns inside a reused Lua runtime
+    SAVED_VARIABLES_BACKEND: SavedVariablesBackend = SavedVariablesBackend.STREAMING
+    # How rows that violate the auction model constraints are handled
+    INVALID_AUCTION_ROWS: InvalidAuctionRows = InvalidAuctionRows.DROP
+
+    # --- Input ---
+    # TYPE sends every character through xdotool, PASTE sets the X selection and pastes it (falls back to TYPE)
+    TEXT_ENTRY_MODE: TextEntryMode = TextEntryMode.TYPE
+    # Seconds to wait for the game to fetch the pasted text before falling back to typing
+    TEXT_ENTRY_PASTE_TIMEOUT: float = 2.0
 
     # --- Discord ---
     DISCORD_WEBHOOK_URL: str = ""
@@ -18,6 +18,7 @@ except Exception:
     _HAS_TESSEROCR = False
 
 from lotkeeper_agent.common.discord_logger import discord_logger
+from lotkeeper_agent.common.display_session import current_display
 
 
 # Game text constants
@@ -36,6 +37,7 @@ class GameTexts:
     # Addon related
     OAS_IDLE = "OAS IDLE"
     OAS_SCANNING = "OAS SCANNING"
+    OAS_CLASS_DONE = "OAS CLASS DONE"
     OAS_COMPLETED = "OAS COMPLETED"
 
 
@@ -70,7 +72,9 @@ class TextDetector:
             "height": height,
         }
         self.fps: int = fps
-        self.x11_display = display.Display()  # Initialize X11 display connection
+        # X11 display connection, opened on first use on the display of the current session
+        self._x11_display: display.Display | None = None
+        self._x11_display_name: str | None = None
 
         # PERF state
         self._prev_small_gray: numpy.ndarray | None = None
@@ -100,6 +104,17 @@ class TextDetector:
         except Exception:
             pass
 
+    @property
+    def x11_display(self) -> display.Display:
+        """Connection to the display of the current session, reopened when the agent runs on another display"""
+        name = current_display()
+        if self._x11_display is None or self._x11_display_name != name:
+            if self._x11_display is not None:
+                self._x11_display.close()
+            self._x11_display = display.Display(name)
+            self._x11_display_name = name
+        return self._x11_display
+
     def set_capture_box(self, left: int, top: int, width: int, height: int) -> None:
         logger.info(f"OCR: Setting capture box to {left}, {top}, {width}, {height}")
         self.capture_box["left"] = left
@@ -515,6 +530,26 @@ class TextDetector:
 
         return result.success
 
+    def probe(
+        self,
+        keywords: list[str],
+        timeout: float = 5.0,
+        min_conf: int = 70,
+        whitelist: str = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz ",
+    ) -> bool:
+        """
+        Look for a keyword for a short while without reporting to Discord, to check the current game state.
+
+        Args:
+            keywords: List of keywords to look for.
+            timeout: Maximum time to wait for a keyword to appear.
+            min_conf: Minimum confidence level for a keyword to be considered detected.
+            whitelist: Optional whitelist of characters to consider.
+        Returns:
+            True if any keyword is detected, False when the timeout is reached.
+        """
+        return self._detect(keywords, timeout, min_conf, whitelist).success
+
     def detect_absence(
         self,
         keywords: list[str],
@@ -39,6 +39,10 @@ if __name__ == "__main__":
 
     logger.info(f"Loaded {len(wow_config.accounts)} accounts from config")
 
+    # Warm up Wine before the first launch of the game
+    if ENV.WINE_PERSISTENT_SERVER:
+        XDOGame.Wine.prewarm([name.strip() for name in ENV.WINE_PRELOAD_DLLS.split(",") if name.strip()])
+
     # Set default WTF variables (UI scale)
     XDOGame.Paths.set_wtf_variable(XDOGame.Paths.WTFVariables.UI_SCALE, "1.0")
 
@@ -62,6 +66,7 @@ if __name__ == "__main__":
             scheduler = AgentScheduler()
 
             # Define agents
+            hot_classes = [name.strip().lower() for name in ENV.SCAN_HOT_CLASSES.split(",") if name.strip()]
             for account in wow_config.accounts:
                 auction_house_agent = (
                     AuctionHouseAgent(account)
@@ -72,6 +77,20 @@ if __name__ == "__main__":
                 # Add agent to scheduler
                 scheduler.add_agent(auction_house_agent)
 
+                # Refresh the hot item classes in between the full scans
+                if hot_classes:
+                    hot_classes_agent = (
+                        AuctionHouseAgent(account, hot_classes)
+                        .with_cron_expression(CronExpression.BETWEEN_HOURLY)
+                        .with_max_retries(0)
+                        .with_time_between_tasks(10.0)
+                    )
+                    scheduler.add_agent(hot_classes_agent)
+
+            # Upload spooled scans in the background
+            if ENV.UPLOAD_OUTBOX:
+                scheduler.add_outbox_drainer()
+
             # Start scheduler after all jobs are added
             logger.info("Starting agent scheduler...")
             scheduler.start()
@@ -1,7 +1,40 @@
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import BaseModel, Field
 
+# Fields of an OAAData row that are read into an AuctionBatch (Auction.from_lua_table reads all but owner)
+AUCTION_LUA_FIELDS = (
+    "itemId",
+    "name",
+    "link",
+    "texture",
+    "level",
+    "quality",
+    "maxStackSize",
+    "vendorPrice",
+    "classIndex",
+    "className",
+    "buyoutPrice",
+    "minBid",
+    "count",
+    "owner",
+)
+
+# The compact OAAData layout (see the STORAGE section of the addon): scan metadata, packed item info per itemId,
+# the distinct listed items (variants) and the auctions as packed strings referencing a variant
+AUCTION_LUA_COMPACT_FORMAT = 2
+AUCTION_LUA_COMPACT_KEYS = (
+    "format",
+    "realm",
+    "scannedAt",
+    "classes",
+    "items",
+    "variants",
+    "variantNames",
+    "variantLinks",
+    "auctions",
+)
+
 
 class Item(BaseModel):
     id: int = Field(description="The ID of the item", gt=0)
@@ -71,3 +104,92 @@ class AuctionData(BaseModel):
     server: str = Field(description="The server of the realm", min_length=3)
     realm: str = Field(description="The realm of the auctions", min_length=3)
     auctions: list[Auction] = Field(description="The auctions to insert")
+
+
+# --- Normalized payload (schema version 2) ---
+# Items are sent once in an `items` table keyed by item ID, auctions reference them by ID.
+
+
+class ItemListing(BaseModel):
+    model_config = {"json_schema_extra": {"description": "An auction listing referencing an item by ID"}}
+
+    item_id: int = Field(description="The ID of the item, key into the items table", gt=0)
+    unit_buyout_price: int = Field(description="The buyout price in copper", ge=0)
+    unit_starting_bid_price: int = Field(description="The starting bid price in copper", ge=0)
+    quantity: int = Field(description="The quantity being auctioned", gt=0)
+
+    # Items with random suffixes (e.g. "of the Bear") share an item ID, these are only set when they differ
+    name: str | None = Field(default=None, description="The name of the listed item, if it differs", min_length=1)
+    link: str | None = Field(default=None, description="The link of the listed item, if it differs")
+
+    # Only set in delta payloads, where the owner is part of the listing key
+    owner: str | None = Field(default=None, description="The seller of the listing")
+
+
+class NormalizedAuctionData(BaseModel):
+    schema_version: Literal[2] = Field(default=2, description="The payload schema version")
+    server: str = Field(description="The server of the realm", min_length=3)
+    realm: str = Field(description="The realm of the auctions", min_length=3)
+    items: dict[int, Item] = Field(description="The auctioned items, keyed by item ID")
+    auctions: list[ItemListing] = Field(description="The auctions to insert")
+
+
+# --- Delta payload (schema version 2) ---
+# Only the listings that were added or removed since the previous scan (the base snapshot) are sent. WoW does not
+# expose auction IDs, so listings are identified by their key fields and a changed listing is a removal plus an add.
+
+
+class ListingKey(BaseModel):
+    model_config = {"json_schema_extra": {"description": "The key fields identifying a listing across scans"}}
+
+    item_id: int = Field(description="The ID of the item", gt=0)
+    owner: str | None = Field(default=None, description="The seller of the listing")
+    unit_buyout_price: int = Field(description="The buyout price in copper", ge=0)
+    unit_starting_bid_price: int = Field(description="The starting bid price in copper", ge=0)
+    quantity: int = Field(description="The quantity being auctioned", gt=0)
+
+
+class AuctionDeltaData(BaseModel):
+    schema_version: Literal[2] = Field(default=2, description="The payload schema version")
+    server: str = Field(description="The server of the realm", min_length=3)
+    realm: str = Field(description="The realm of the auctions", min_length=3)
+    base_snapshot_id: str = Field(description="The snapshot the delta applies to, the previously uploaded scan")
+    snapshot_id: str = Field(description="The snapshot after applying the delta")
+    removed: list[ListingKey] = Field(description="The listings that are gone, one entry per listing")
+    items: dict[int, Item] = Field(description="The items of the added listings, keyed by item ID")
+    auctions: list[ItemListing] = Field(description="The added listings")
+
+
+# --- Summary payload ---
+# Per-item market statistics instead of (or next to) the raw listings. OAAData holds the buyout of the whole stack,
+# unit prices are that buyout divided by the quantity. Listings without a buyout (bid only) do not count towards
+# the price statistics, which are None when an item has no buyout listings at all.
+
+
+class OwnerPriceSummary(BaseModel):
+    owner: str | None = Field(description="The seller, None if the game did not know the seller yet")
+    listings: int = Field(description="The number of listings of the seller", gt=0)
+    quantity: int = Field(description="The total quantity listed by the seller", gt=0)
+    min_unit_buyout: int | None = Field(description="The lowest unit buyout price of the seller in copper")
+
+
+class ItemPriceSummary(BaseModel):
+    item_id: int = Field(description="The ID of the item, key into the items table", gt=0)
+    listings: int = Field(description="The number of listings", gt=0)
+    quantity: int = Field(description="The total quantity listed", gt=0)
+    buyout_listings: int = Field(description="The number of listings with a buyout price", ge=0)
+    min_unit_buyout: int | None = Field(description="The lowest unit buyout price in copper")
+    p25_unit_buyout: int | None = Field(description="The 25th percentile unit buyout price in copper")
+    median_unit_buyout: int | None = Field(description="The median unit buyout price in copper")
+    p75_unit_buyout: int | None = Field(description="The 75th percentile unit buyout price in copper")
+    max_unit_buyout: int | None = Field(description="The highest unit buyout price in copper")
+    mean_unit_buyout: int | None = Field(description="The quantity weighted mean unit buyout price in copper")
+    owners: list[OwnerPriceSummary] | None = Field(default=None, description="The breakdown per seller")
+
+
+class AuctionSummaryData(BaseModel):
+    schema_version: Literal[1] = Field(default=1, description="The summary schema version")
+    server: str = Field(description="The server of the realm", min_length=3)
+    realm: str = Field(description="The realm of the auctions", min_length=3)
+    items: dict[int, Item] = Field(description="The summarized items, keyed by item ID")
+    summaries: list[ItemPriceSummary] = Field(description="The price statistics per item")
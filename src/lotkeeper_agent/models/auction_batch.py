@@ -0,0 +1,671 @@
+import array
+import io
+import itertools
+import json
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, ClassVar
+
+import annotated_types
+import numpy
+from pydantic import BaseModel
+
+from lotkeeper_agent.models.auction import (
+    AUCTION_LUA_COMPACT_FORMAT,
+    Auction,
+    AuctionDeltaData,
+    Item,
+    NormalizedAuctionData,
+)
+
+# Sentinel for nil (or non-integral) numeric values and nil strings, every constrained field rejects it
+MISSING = -1
+
+
+class StringTable:
+    """Interned strings, every unique string is stored once and referenced by its index"""
+
+    def __init__(self) -> None:
+        self.values: list[str] = []
+        self._index: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index: int) -> str:
+        return self.values[index]
+
+    def intern(self, value: Any) -> int:
+        """Get the index of a string, adding it to the table if needed. Non-strings (nil) map to MISSING"""
+        if type(value) is not str:
+            return MISSING
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def lengths(self) -> numpy.ndarray:
+        """The length of every string in the table"""
+        return numpy.fromiter((len(v) for v in self.values), dtype=numpy.int64, count=len(self.values))
+
+    def encoded_json(self) -> list[str]:
+        """Every string encoded as a JSON string literal, so each unique string is escaped only once"""
+        return [json.dumps(v, ensure_ascii=False) for v in self.values]
+
+
+def _to_int(value: Any) -> int:
+    if type(value) is int:
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return MISSING
+
+
+def _parse_ints(values: Sequence[Any]) -> numpy.ndarray:
+    """Integers or decimal strings (as packed by the addon) to int64, empty strings (nil) become MISSING"""
+    try:
+        return numpy.array(values).astype(numpy.int64)
+    except ValueError:
+        return numpy.fromiter(
+            (_to_int(int(v) if type(v) is str and v.isdecimal() else v) for v in values),
+            dtype=numpy.int64,
+            count=len(values),
+        )
+
+
+def _lookup(table: numpy.ndarray, index: numpy.ndarray) -> numpy.ndarray:
+    """table[index], MISSING for indices that are MISSING or out of range"""
+    valid = (index >= 0) & (index < len(table))
+    values = numpy.full(len(index), MISSING, dtype=numpy.int64)
+    values[valid] = table[index[valid]]
+    return values
+
+
+@dataclass(frozen=True)
+class Constraint:
+    """A single field constraint of the pydantic models, applied to a column"""
+
+    column: str
+    kind: str  # "gt", "ge" or "min_length"
+    bound: int
+
+
+class AuctionBatchValidationError(ValueError):
+    """Exception raised when rows of an auction batch violate the model constraints"""
+
+    def __init__(self, violations: dict[Constraint, numpy.ndarray]) -> None:
+        self.violations = violations
+
+    def __str__(self) -> str:
+        details = [
+            f"{c.column} ({c.kind} {c.bound}): {len(rows)} rows, e.g. {rows[:5].tolist()}"
+            for c, rows in self.violations.items()
+        ]
+        return "Invalid auction rows: " + "; ".join(details)
+
+
+@dataclass
+class BatchRepairs:
+    """What AuctionBatch.repaired() changed: repaired values per column and the violations of the dropped rows"""
+
+    repaired: dict[str, int]
+    dropped: dict[Constraint, numpy.ndarray]
+    dropped_rows: int
+
+    def __str__(self) -> str:
+        repaired = ", ".join(f"{column}: {rows}" for column, rows in self.repaired.items() if rows) or "none"
+        dropped = "; ".join(f"{c.column} ({c.kind} {c.bound}): {len(rows)}" for c, rows in self.dropped.items())
+        return f"repaired rows ({repaired}), dropped {self.dropped_rows} rows" + (f" ({dropped})" if dropped else "")
+
+
+def _fill_from_same_key(keys: numpy.ndarray, values: numpy.ndarray) -> tuple[numpy.ndarray, int]:
+    """Fill nil values with the value of another row with the same key, returns the filled values and count"""
+    missing = (values == MISSING) & (keys != MISSING)
+    known = (values != MISSING) & (keys != MISSING)
+    if not missing.any() or not known.any():
+        return values, 0
+
+    known_keys, first = numpy.unique(keys[known], return_index=True)
+    known_values = values[known][first]
+    missing_rows = numpy.flatnonzero(missing)
+    position = numpy.minimum(numpy.searchsorted(known_keys, keys[missing_rows]), len(known_keys) - 1)
+    found = known_keys[position] == keys[missing_rows]
+
+    values = values.copy()
+    values[missing_rows[found]] = known_values[position[found]]
+    return values, int(numpy.count_nonzero(found))
+
+
+def _model_constraints(model: type[BaseModel], rename: dict[str, str]) -> list[Constraint]:
+    constraints = []
+    for name, info in model.model_fields.items():
+        column = rename.get(name, name)
+        for meta in info.metadata:
+            if isinstance(meta, annotated_types.Gt):
+                constraints.append(Constraint(column, "gt", int(meta.gt)))  # type: ignore[call-overload]
+            elif isinstance(meta, annotated_types.Ge):
+                constraints.append(Constraint(column, "ge", int(meta.ge)))  # type: ignore[call-overload]
+            elif isinstance(meta, annotated_types.MinLen):
+                constraints.append(Constraint(column, "min_length", int(meta.min_length)))
+    return constraints
+
+
+@dataclass
+class AuctionBatch:
+    """
+    Columnar representation of a scan: one NumPy array per numeric field and interned string tables.
+
+    Uses about 64 bytes per auction (plus the unique strings) instead of the three pydantic/dict object graphs
+    of the row path. The constraints of the Item and Auction models are checked vectorized by validate(), and
+    iter_json() encodes straight from the columns.
+    """
+
+    # Numeric columns, named after the Item/Auction model fields (MISSING for nil)
+    item_id: numpy.ndarray
+    level: numpy.ndarray
+    quality: numpy.ndarray
+    max_stack_size: numpy.ndarray
+    vendor_price: numpy.ndarray
+    class_index: numpy.ndarray
+    unit_buyout_price: numpy.ndarray
+    unit_starting_bid_price: numpy.ndarray
+    quantity: numpy.ndarray
+
+    # String columns, indices into the string tables (MISSING for nil)
+    name: numpy.ndarray
+    link: numpy.ndarray
+    icon: numpy.ndarray
+    class_name: numpy.ndarray
+    owner: numpy.ndarray
+
+    names: StringTable = field(default_factory=StringTable)
+    links: StringTable = field(default_factory=StringTable)
+    icons: StringTable = field(default_factory=StringTable)
+    class_names: StringTable = field(default_factory=StringTable)
+    owners: StringTable = field(default_factory=StringTable)
+
+    # Column -> (OAAData field, dtype)
+    NUMERIC_COLUMNS: ClassVar[dict[str, tuple[str, str]]] = {
+        "item_id": ("itemId", "i4"),
+        "level": ("level", "i4"),
+        "quality": ("quality", "i4"),
+        "max_stack_size": ("maxStackSize", "i4"),
+        "vendor_price": ("vendorPrice", "i8"),
+        "class_index": ("classIndex", "i4"),
+        "unit_buyout_price": ("buyoutPrice", "i8"),
+        "unit_starting_bid_price": ("minBid", "i8"),
+        "quantity": ("count", "i4"),
+    }
+
+    # Column -> (OAAData field, string table attribute)
+    STRING_COLUMNS: ClassVar[dict[str, tuple[str, str]]] = {
+        "name": ("name", "names"),
+        "link": ("link", "links"),
+        "icon": ("texture", "icons"),
+        "class_name": ("className", "class_names"),
+        "owner": ("owner", "owners"),
+    }
+
+    # Column order of the rows produced by _rows(), the item fields first
+    ROW_ORDER: ClassVar[tuple[str, ...]] = (
+        "item_id",
+        "name",
+        "link",
+        "icon",
+        "level",
+        "quality",
+        "max_stack_size",
+        "vendor_price",
+        "class_index",
+        "class_name",
+        "unit_buyout_price",
+        "unit_starting_bid_price",
+        "quantity",
+    )
+
+    CONSTRAINTS: ClassVar[list[Constraint]] = [
+        *_model_constraints(Item, {"id": "item_id"}),
+        *_model_constraints(Auction, {}),
+    ]
+
+    def __len__(self) -> int:
+        return len(self.item_id)
+
+    @classmethod
+    def from_lua_entries(cls, entries: Iterable[dict[str, Any]]) -> "AuctionBatch":
+        """Build a batch from OAAData rows, consuming them one at a time"""
+        tables = {attr: StringTable() for _, attr in cls.STRING_COLUMNS.values()}
+        numeric = {column: array.array("q") for column in cls.NUMERIC_COLUMNS}
+        strings = {column: array.array("q") for column in cls.STRING_COLUMNS}
+
+        numeric_fields = [(numeric[c], lua_field) for c, (lua_field, _) in cls.NUMERIC_COLUMNS.items()]
+        string_fields = [(strings[c], lua_field, tables[attr]) for c, (lua_field, attr) in cls.STRING_COLUMNS.items()]
+
+        for entry in entries:
+            for values, lua_field in numeric_fields:
+                values.append(_to_int(entry.get(lua_field)))
+            for values, lua_field, table in string_fields:
+                values.append(table.intern(entry.get(lua_field)))
+
+        return cls._from_arrays(numeric, strings, tables)
+
+    @classmethod
+    def from_lua_columns(cls, columns: dict[str, list[Any]]) -> "AuctionBatch":
+        """Build a batch from OAAData columns (see read_saved_variables_columns)"""
+        tables = {attr: StringTable() for _, attr in cls.STRING_COLUMNS.values()}
+        numeric = {column: array.array("q", map(_to_int, columns[f])) for column, (f, _) in cls.NUMERIC_COLUMNS.items()}
+        strings = {
+            column: array.array("q", map(tables[attr].intern, columns[f]))
+            for column, (f, attr) in cls.STRING_COLUMNS.items()
+        }
+        return cls._from_arrays(numeric, strings, tables)
+
+    @classmethod
+    def from_lua_items(cls, items: Iterable[tuple[Any, Any]]) -> "AuctionBatch":
+        """Build a batch from the (key, value) pairs of OAAData, either an array of rows or the compact layout"""
+        iterator = iter(items)
+        first = next(iterator, None)
+        if first is None:
+            return cls.from_lua_entries([])
+        if type(first[0]) is int:
+            return cls.from_lua_entries(itertools.chain([first[1]], (value for _, value in iterator)))
+        return cls.from_lua_compact(dict(itertools.chain([first], iterator)))
+
+    @classmethod
+    def from_lua_compact(cls, data: dict[str, Any]) -> "AuctionBatch":
+        """
+        Build a batch from compact OAAData (see AUCTION_LUA_COMPACT_KEYS), vectorized over the packed auctions.
+
+        Fields the addon left empty become MISSING, like nil fields of the row layout.
+        """
+        if data.get("format") != AUCTION_LUA_COMPACT_FORMAT:
+            raise ValueError(f"Unsupported OAAData format: {data.get('format')}")
+        tables: dict[str, Any] = {attr: StringTable() for _, attr in cls.STRING_COLUMNS.values()}
+
+        # Item info: "itemId,maxStackSize,vendorPrice"
+        items = data.get("items") or []
+        item_fields = ",".join(map(str, items)).split(",") if items else []
+        if len(item_fields) != 3 * len(items):
+            raise ValueError(f"Compact items have {len(item_fields)} fields, expected {3 * len(items)}")
+        item_ids, max_stack_size, vendor_price = (_parse_ints(item_fields[i::3]) for i in range(3))
+
+        # Variants, every distinct listed item: "itemId,quality,level,classIndex,texture", its name and link
+        variants = [str(entry).split(",", 4) for entry in data.get("variants") or []]
+        variant_fields: list[Sequence[str]] = list(zip(*variants, strict=True)) if variants else [()] * 5
+        variant_item_ids, quality, level, class_index = map(_parse_ints, variant_fields[:4])
+        variant_item_ids[variant_item_ids <= 0] = MISSING
+        icon = numpy.fromiter(map(tables["icons"].intern, variant_fields[4]), dtype=numpy.int64, count=len(variants))
+        names = numpy.fromiter(
+            map(tables["names"].intern, data.get("variantNames") or []), dtype=numpy.int64, count=len(variants)
+        )
+        links = numpy.fromiter(
+            (tables["links"].intern(link or None) for link in data.get("variantLinks") or []),
+            dtype=numpy.int64,
+            count=len(variants),
+        )
+        class_names = numpy.fromiter(map(tables["class_names"].intern, data.get("classes") or []), dtype=numpy.int64)
+
+        # Row of the item info of every variant, MISSING if the addon had no item info
+        variant_item_rows = numpy.full(len(variants), MISSING, dtype=numpy.int64)
+        if len(item_ids):
+            order = numpy.argsort(item_ids, kind="stable")
+            sorted_ids = item_ids[order]
+            position = numpy.minimum(numpy.searchsorted(sorted_ids, variant_item_ids), len(order) - 1)
+            found = (variant_item_ids != MISSING) & (sorted_ids[position] == variant_item_ids)
+            variant_item_rows[found] = order[position[found]]
+
+        # Auctions: "variant,count,minBid,buyoutPrice,owner"
+        auctions = data.get("auctions") or []
+        fields = ",".join(map(str, auctions)).split(",") if auctions else []
+        if len(fields) != 5 * len(auctions):
+            raise ValueError(f"Compact auctions have {len(fields)} fields, expected {5 * len(auctions)}")
+        variant = _parse_ints(fields[0::5]) - 1
+        item_rows = _lookup(variant_item_rows, variant)
+        row_class_index = _lookup(class_index, variant)
+
+        owners = tables["owners"]
+        columns: dict[str, numpy.ndarray] = {
+            "item_id": _lookup(variant_item_ids, variant),
+            "level": _lookup(level, variant),
+            "quality": _lookup(quality, variant),
+            "max_stack_size": _lookup(max_stack_size, item_rows),
+            "vendor_price": _lookup(vendor_price, item_rows),
+            "class_index": row_class_index,
+            "unit_buyout_price": _parse_ints(fields[3::5]),
+            "unit_starting_bid_price": _parse_ints(fields[2::5]),
+            "quantity": _parse_ints(fields[1::5]),
+            "name": _lookup(names, variant),
+            "link": _lookup(links, variant),
+            "icon": _lookup(icon, variant),
+            "class_name": _lookup(class_names, row_class_index - 1),
+            "owner": numpy.fromiter(
+                (owners.intern(owner) if owner else MISSING for owner in fields[4::5]),
+                dtype=numpy.int64,
+                count=len(auctions),
+            ),
+        }
+        dtypes = {column: dtype for column, (_, dtype) in cls.NUMERIC_COLUMNS.items()}
+        typed: dict[str, Any] = {
+            column: values.astype(dtypes.get(column, numpy.int32)) for column, values in columns.items()
+        }
+        return cls(**typed, **tables)
+
+    @classmethod
+    def _from_arrays(
+        cls,
+        numeric: dict[str, "array.array[int]"],
+        strings: dict[str, "array.array[int]"],
+        tables: dict[str, Any],
+    ) -> "AuctionBatch":
+        columns: dict[str, Any] = {
+            column: numpy.frombuffer(numeric[column], dtype=numpy.int64).astype(dtype)
+            for column, (_, dtype) in cls.NUMERIC_COLUMNS.items()
+        }
+        columns.update(
+            {column: numpy.frombuffer(strings[column], dtype=numpy.int64).astype(numpy.int32) for column in strings}
+        )
+        return cls(**columns, **tables)
+
+    def save(self, path: Path) -> None:
+        """Write the columns and string tables to a compressed .npz file, written to a temporary file first"""
+        arrays: dict[str, Any] = {
+            column: getattr(self, column) for column in (*self.NUMERIC_COLUMNS, *self.STRING_COLUMNS)
+        }
+        arrays.update(
+            {attr: numpy.array(getattr(self, attr).values, dtype=str) for _, attr in self.STRING_COLUMNS.values()}
+        )
+        tmp_path = path.with_suffix(".tmp.npz")
+        numpy.savez_compressed(tmp_path, **arrays)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "AuctionBatch":
+        """Read a batch written by save()"""
+        with numpy.load(path) as data:
+            tables: dict[str, Any] = {}
+            for _, attr in cls.STRING_COLUMNS.values():
+                table = tables[attr] = StringTable()
+                for value in data[attr].tolist():
+                    table.intern(value)
+            columns = {column: data[column] for column in (*cls.NUMERIC_COLUMNS, *cls.STRING_COLUMNS)}
+        return cls(**columns, **tables)
+
+    def take(self, index: slice | numpy.ndarray) -> "AuctionBatch":
+        """A batch of the selected rows, the string tables are shared (and slices of the columns are views)"""
+        columns = {column: getattr(self, column)[index] for column in (*self.NUMERIC_COLUMNS, *self.STRING_COLUMNS)}
+        return replace(self, **columns)
+
+    def _string_table(self, column: str) -> StringTable:
+        table: StringTable = getattr(self, self.STRING_COLUMNS[column][1])
+        return table
+
+    def validate(self) -> dict[Constraint, numpy.ndarray]:
+        """
+        Check every row against the Item/Auction model constraints, vectorized.
+
+        Returns:
+            The violated constraints, mapped to the offending row indices (empty if all rows are valid)
+        """
+        violations: dict[Constraint, numpy.ndarray] = {}
+        for constraint in self.CONSTRAINTS:
+            values = getattr(self, constraint.column)
+            if constraint.column in self.STRING_COLUMNS:
+                # Look up the length per unique string, nil strings are always invalid
+                lengths = numpy.append(self._string_table(constraint.column).lengths(), -1)
+                bad = lengths[values] < constraint.bound
+            elif constraint.kind == "gt":
+                bad = values <= constraint.bound
+            else:
+                bad = values < constraint.bound
+
+            # nil values are rejected by pydantic as well
+            if constraint.column in self.NUMERIC_COLUMNS:
+                bad |= values == MISSING
+
+            rows = numpy.flatnonzero(bad)
+            if len(rows):
+                violations[constraint] = rows
+        return violations
+
+    def raise_if_invalid(self) -> None:
+        """Raise an AuctionBatchValidationError listing the offending rows if any row is invalid"""
+        violations = self.validate()
+        if violations:
+            raise AuctionBatchValidationError(violations)
+
+    def repaired(self) -> tuple["AuctionBatch", "BatchRepairs"]:
+        """
+        Repair the nil fields the addon can produce, then drop the rows that are still invalid.
+
+        - max_stack_size, vendor_price: taken from another listing of the same item, they are nil when the addon
+          read them before the item info was cached by the game
+
+        A nil item_id is not repaired: the addon derives it from the item link, so the link is nil as well and the
+        row is dropped.
+
+        Returns:
+            The valid rows, and what was repaired and dropped
+        """
+        repaired: dict[str, int] = {}
+        columns: dict[str, Any] = {}
+        for column in ("max_stack_size", "vendor_price"):
+            columns[column], repaired[column] = _fill_from_same_key(self.item_id, getattr(self, column))
+
+        batch = replace(self, **columns)
+        violations = batch.validate()
+        invalid = numpy.zeros(len(batch), dtype=bool)
+        for rows in violations.values():
+            invalid[rows] = True
+
+        repairs = BatchRepairs(repaired, violations, int(numpy.count_nonzero(invalid)))
+        if repairs.dropped_rows:
+            batch = batch.take(numpy.flatnonzero(~invalid))
+        return batch, repairs
+
+    def to_auctions(self, trusted: bool = False) -> list[Auction]:
+        """
+        Materialize the batch as Auction models
+
+        Args:
+            trusted: Validate the whole batch once (vectorized, raises AuctionBatchValidationError listing the
+                offending rows) instead of validating every model. Every distinct item is then built once without
+                validation and shared by its listings.
+        """
+        if trusted:
+            return self._to_auctions_trusted()
+
+        return [
+            Auction(
+                item=Item(
+                    id=item_id,
+                    name=self.names[name],
+                    link=self.links[link],
+                    icon=self.icons[icon],
+                    level=level,
+                    quality=quality,
+                    max_stack_size=max_stack_size,
+                    vendor_price=vendor_price,
+                    class_index=class_index,
+                    class_name=self.class_names[class_name],
+                ),
+                unit_buyout_price=buyout,
+                unit_starting_bid_price=bid,
+                quantity=quantity,
+            )
+            for (
+                item_id,
+                name,
+                link,
+                icon,
+                level,
+                quality,
+                max_stack_size,
+                vendor_price,
+                class_index,
+                class_name,
+                buyout,
+                bid,
+                quantity,
+            ) in self._rows(slice(None))
+        ]
+
+    def _to_auctions_trusted(self) -> list[Auction]:
+        self.raise_if_invalid()
+
+        # Distinct items: rows with the same item columns share one Item model
+        item_columns = self.ROW_ORDER[:10]
+        item_rows = numpy.stack([getattr(self, column).astype(numpy.int64) for column in item_columns], axis=1)
+        item_keys = item_rows.view(numpy.dtype((numpy.void, item_rows.shape[1] * 8))).ravel()  # a row as one value
+        _, first_rows, item_index = numpy.unique(item_keys, return_index=True, return_inverse=True)
+        items = [
+            Item.model_construct(
+                id=item_id,
+                name=self.names[name],
+                link=self.links[link],
+                icon=self.icons[icon],
+                level=level,
+                quality=quality,
+                max_stack_size=max_stack_size,
+                vendor_price=vendor_price,
+                class_index=class_index,
+                class_name=self.class_names[class_name],
+            )
+            for item_id, name, link, icon, level, quality, max_stack_size, vendor_price, class_index, class_name, *_ in (
+                self._rows(first_rows)
+            )
+        ]
+
+        # Auctions are built by the compiled validator, with three integer fields and an existing Item instance
+        # (not revalidated) that is faster than model_construct, which sets the fields in Python
+        return [
+            Auction(item=items[index], unit_buyout_price=buyout, unit_starting_bid_price=bid, quantity=quantity)
+            for index, buyout, bid, quantity in zip(
+                item_index.reshape(-1).tolist(),
+                self.unit_buyout_price.tolist(),
+                self.unit_starting_bid_price.tolist(),
+                self.quantity.tolist(),
+                strict=True,
+            )
+        ]
+
+    def _rows(self, index: slice | numpy.ndarray) -> Iterator[tuple[int, ...]]:
+        """Rows of the selected index as Python ints, in ROW_ORDER"""
+        return zip(*(getattr(self, column)[index].tolist() for column in self.ROW_ORDER), strict=True)
+
+    def iter_json(self, envelope: BaseModel, rows_per_chunk: int = 10_000) -> Iterator[bytes]:
+        """
+        Encode the batch as the JSON body of the envelope model, with the batch as its "auctions" list.
+
+        The output matches `envelope.model_copy(update={"auctions": batch.to_auctions()}).model_dump()` encoded as
+        JSON, but is produced in chunks straight from the columns: unique strings are escaped once and only one
+        chunk of rows is converted to Python values at a time.
+
+        Args:
+            envelope: The payload model, its "auctions" field is replaced by the batch
+            rows_per_chunk: Number of rows to encode per yielded chunk
+        """
+        yield _json_head(envelope, exclude={"auctions"}) + b'"auctions":['
+
+        item_json = _ItemEncoder(self)
+        for start in range(0, len(self), rows_per_chunk):
+            rows = [
+                f'{{"item":{item_json(row)},"unit_buyout_price":{row[10]},'
+                f'"unit_starting_bid_price":{row[11]},"quantity":{row[12]}}}'
+                for row in self._rows(slice(start, start + rows_per_chunk))
+            ]
+            yield (b"," if start else b"") + ",".join(rows).encode()
+
+        yield b"]}"
+
+    def iter_normalized_json(
+        self, envelope: NormalizedAuctionData | AuctionDeltaData, rows_per_chunk: int = 10_000
+    ) -> Iterator[bytes]:
+        """
+        Encode the batch as a normalized (schema version 2) payload, see iter_json() for the encoding itself.
+
+        Every item ID is sent once in the "items" table, taken from its first listing. Listings only repeat the
+        name and link when they differ from that item, which happens for random suffix items. Delta payloads
+        also carry the owner, which is part of the listing key.
+
+        Args:
+            envelope: The payload model, its "items" and "auctions" fields are replaced by the batch
+            rows_per_chunk: Number of rows to encode per yielded chunk
+        """
+        yield _json_head(envelope, exclude={"items", "auctions"}) + b'"items":{'
+
+        # First listing of every item ID, and per listing the index of its item
+        _, first_rows, inverse = numpy.unique(self.item_id, return_index=True, return_inverse=True)
+        name_differs = self.name != self.name[first_rows][inverse]
+        link_differs = self.link != self.link[first_rows][inverse]
+
+        item_json = _ItemEncoder(self)
+        for start in range(0, len(first_rows), rows_per_chunk):
+            items = [f'"{row[0]}":{item_json(row)}' for row in self._rows(first_rows[start : start + rows_per_chunk])]
+            yield (b"," if start else b"") + ",".join(items).encode()
+
+        yield b'},"auctions":['
+
+        names, links = item_json.names, item_json.links
+        owners = [*self.owners.encoded_json(), "null"] if isinstance(envelope, AuctionDeltaData) else None
+        for start in range(0, len(self), rows_per_chunk):
+            window = slice(start, start + rows_per_chunk)
+            rows = []
+            for row, has_name, has_link, owner in zip(
+                self._rows(window),
+                name_differs[window].tolist(),
+                link_differs[window].tolist(),
+                self.owner[window].tolist(),
+                strict=True,
+            ):
+                listing = (
+                    f'{{"item_id":{row[0]},"unit_buyout_price":{row[10]},'
+                    f'"unit_starting_bid_price":{row[11]},"quantity":{row[12]}'
+                )
+                if has_name:
+                    listing += ',"name":' + names[row[1]]
+                if has_link:
+                    listing += ',"link":' + links[row[2]]
+                if owners is not None:
+                    listing += ',"owner":' + owners[owner]
+                rows.append(listing + "}")
+            yield (b"," if start else b"") + ",".join(rows).encode()
+
+        yield b"]}"
+
+    def to_json_bytes(self, envelope: BaseModel) -> bytes:
+        """Encode the batch as a single JSON body, normalized if the envelope is a NormalizedAuctionData (or delta)"""
+        if isinstance(envelope, NormalizedAuctionData | AuctionDeltaData):
+            chunks = self.iter_normalized_json(envelope)
+        else:
+            chunks = self.iter_json(envelope)
+
+        # Written into a single buffer, getvalue() hands out that buffer without copying it
+        buffer = io.BytesIO()
+        for chunk in chunks:
+            buffer.write(chunk)
+        return buffer.getvalue()
+
+
+class _ItemEncoder:
+    """Encodes the item part of a row as JSON, with every unique string escaped only once"""
+
+    def __init__(self, batch: AuctionBatch) -> None:
+        self.names = batch.names.encoded_json()
+        self.links = batch.links.encoded_json()
+        self.icons = batch.icons.encoded_json()
+        self.class_names = batch.class_names.encoded_json()
+
+    def __call__(self, row: tuple[int, ...]) -> str:
+        return (
+            f'{{"id":{row[0]},"name":{self.names[row[1]]},"link":{self.links[row[2]]},"icon":{self.icons[row[3]]},'
+            f'"level":{row[4]},"quality":{row[5]},"max_stack_size":{row[6]},"vendor_price":{row[7]},'
+            f'"class_index":{row[8]},"class_name":{self.class_names[row[9]]}}}'
+        )
+
+
+def _json_head(envelope: BaseModel, exclude: set[str]) -> bytes:
+    """The envelope as JSON without the excluded fields and without its closing brace, ready for more fields"""
+    head = envelope.model_dump_json(exclude=exclude)
+    return (head[:-1] + ("," if head != "{}" else "")).encode()
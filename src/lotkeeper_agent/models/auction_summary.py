@@ -0,0 +1,131 @@
+from typing import Any
+
+import numpy
+
+from lotkeeper_agent.models.auction import AuctionSummaryData, ItemPriceSummary, OwnerPriceSummary
+from lotkeeper_agent.models.auction_batch import MISSING, AuctionBatch
+
+# Percentiles of the unit buyout price per item, with the summary field they go to
+PERCENTILES = {
+    "min_unit_buyout": 0,
+    "p25_unit_buyout": 25,
+    "median_unit_buyout": 50,
+    "p75_unit_buyout": 75,
+    "max_unit_buyout": 100,
+}
+
+
+def _group_percentile(sorted_values: numpy.ndarray, starts: numpy.ndarray, counts: numpy.ndarray, q: float) -> Any:
+    """Linear interpolated percentile per group of sorted values (like numpy.percentile), NaN for empty groups"""
+    position = (numpy.maximum(counts, 1) - 1) * (q / 100)
+    low = numpy.floor(position).astype(numpy.int64)
+    high = numpy.minimum(low + 1, numpy.maximum(counts, 1) - 1)
+    fraction = position - low
+
+    values = sorted_values if len(sorted_values) else numpy.array([numpy.nan])
+    last = len(values) - 1
+    low_values = values[numpy.minimum(starts + low, last)]
+    high_values = values[numpy.minimum(starts + high, last)]
+    return numpy.where(counts > 0, low_values + (high_values - low_values) * fraction, numpy.nan)
+
+
+def _to_copper(values: numpy.ndarray) -> list[int | None]:
+    """Round unit prices to whole copper, NaN (no buyout listings) becomes None"""
+    return [None if numpy.isnan(v) else int(v) for v in numpy.rint(values).tolist()]
+
+
+def summarize_batch(batch: AuctionBatch, server: str, realm: str, by_owner: bool = False) -> AuctionSummaryData:
+    """
+    Aggregate the listings of a batch into per-item price statistics, vectorized over the columns.
+
+    Args:
+        batch: The (validated) auctions of a scan
+        server: The server of the realm
+        realm: The realm of the auctions
+        by_owner: Whether to add the breakdown per seller to every item
+
+    Returns:
+        The summary payload, with the items taken from their first listing
+    """
+    if not len(batch):
+        return AuctionSummaryData(server=server, realm=realm, items={}, summaries=[])
+
+    item_ids, first_rows, group, listings = numpy.unique(
+        batch.item_id, return_index=True, return_inverse=True, return_counts=True
+    )
+    item_count = len(item_ids)
+    quantity = numpy.bincount(group, weights=batch.quantity, minlength=item_count).astype(numpy.int64)
+
+    # Unit buyout prices of the listings with a buyout, sorted by item and price
+    buyout_rows = numpy.flatnonzero(batch.unit_buyout_price > 0)
+    buyout_group = group[buyout_rows]
+    unit_buyout = batch.unit_buyout_price[buyout_rows] / batch.quantity[buyout_rows]
+    order = numpy.lexsort((unit_buyout, buyout_group))
+    sorted_unit_buyout = unit_buyout[order]
+    buyout_listings = numpy.bincount(buyout_group, minlength=item_count)
+    starts = numpy.concatenate(([0], numpy.cumsum(buyout_listings)[:-1]))
+
+    stats: dict[str, list[Any]] = {
+        name: _to_copper(_group_percentile(sorted_unit_buyout, starts, buyout_listings, q))
+        for name, q in PERCENTILES.items()
+    }
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        buyout_total = numpy.bincount(buyout_group, weights=batch.unit_buyout_price[buyout_rows], minlength=item_count)
+        buyout_quantity = numpy.bincount(buyout_group, weights=batch.quantity[buyout_rows], minlength=item_count)
+        stats["mean_unit_buyout"] = _to_copper(buyout_total / buyout_quantity)
+
+    owners = _owner_breakdown(batch, group, item_count) if by_owner else [None] * item_count
+
+    items = {auction.item.id: auction.item for auction in batch.take(first_rows).to_auctions()}
+    summaries = [
+        ItemPriceSummary(
+            item_id=item_id,
+            listings=item_listings,
+            quantity=item_quantity,
+            buyout_listings=item_buyout_listings,
+            owners=item_owners,
+            **{name: values[i] for name, values in stats.items()},
+        )
+        for i, (item_id, item_listings, item_quantity, item_buyout_listings, item_owners) in enumerate(
+            zip(
+                item_ids.tolist(),
+                listings.tolist(),
+                quantity.tolist(),
+                buyout_listings.tolist(),
+                owners,
+                strict=True,
+            )
+        )
+    ]
+    return AuctionSummaryData(server=server, realm=realm, items=items, summaries=summaries)
+
+
+def _owner_breakdown(batch: AuctionBatch, group: numpy.ndarray, item_count: int) -> list[list[OwnerPriceSummary]]:
+    """Listings, quantity and lowest unit buyout per seller of every item, ordered by seller"""
+    # One key per (item, seller), nil sellers get their own key
+    owner_count = len(batch.owners) + 1
+    keys = group.astype(numpy.int64) * owner_count + (batch.owner + 1)
+    owner_keys, owner_group, owner_listings = numpy.unique(keys, return_inverse=True, return_counts=True)
+    owner_quantity = numpy.bincount(owner_group, weights=batch.quantity).astype(numpy.int64)
+
+    min_unit_buyout = numpy.full(len(owner_keys), numpy.inf)
+    has_buyout = batch.unit_buyout_price > 0
+    numpy.minimum.at(
+        min_unit_buyout, owner_group[has_buyout], batch.unit_buyout_price[has_buyout] / batch.quantity[has_buyout]
+    )
+    min_unit_buyout[numpy.isinf(min_unit_buyout)] = numpy.nan
+
+    breakdown: list[list[OwnerPriceSummary]] = [[] for _ in range(item_count)]
+    for key, listings, quantity, price in zip(
+        owner_keys.tolist(), owner_listings.tolist(), owner_quantity.tolist(), _to_copper(min_unit_buyout), strict=True
+    ):
+        item, owner = divmod(key, owner_count)
+        breakdown[item].append(
+            OwnerPriceSummary(
+                owner=batch.owners[owner - 1] if owner - 1 != MISSING else None,
+                listings=listings,
+                quantity=quantity,
+                min_unit_buyout=price,
+            )
+        )
+    return breakdown
@@ -1,18 +1,36 @@
 import os
+import threading
 import time
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta
 
 from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from loguru import logger
 
 from lotkeeper_agent.agents.base_agent import AgentError, BaseAgent
+from lotkeeper_agent.common.auction_outbox import get_outbox
 from lotkeeper_agent.common.discord_logger import discord_logger
+from lotkeeper_agent.common.display_session import DisplayPool
 from lotkeeper_agent.common.logging import propagate_logs
+from lotkeeper_agent.common.run_history import get_run_history
+from lotkeeper_agent.common.slot_planner import SlotPlan, SlotRequest, hourly_minutes
+from lotkeeper_agent.config import ENV
 from lotkeeper_agent.tasks.agent_task import TaskError
 
+# Expected duration of an agent that did not complete a run yet (seconds)
+DEFAULT_RUN_DURATION = 10 * 60
+# Upper bound of the backoff between the retries of a failed run (seconds)
+MAX_RETRY_DELAY = 3600
+# Period of the retry budget of an agent (seconds)
+RETRY_BUDGET_WINDOW = 24 * 60 * 60
+# Delay of a run while another agent of the same group (account) is running (seconds)
+GROUP_BUSY_DELAY = 60
+
 
 class AgentScheduler:
     """Manages the scheduling of agent tasks."""
@@ -20,11 +38,17 @@ class AgentScheduler:
     def __init__(self, time_between_retries: int = 300) -> None:
         """
         Args:
-            time_between_retries: Time to wait between retries in seconds
+            time_between_retries: Time to wait before the first retry of a failed run in seconds, doubled for
+                every further retry
         """
         self.time_between_retries = time_between_retries
         jobstores = {"default": MemoryJobStore()}
-        executors = {"default": ThreadPoolExecutor(max_workers=1)}
+        # Every running agent takes a display of its own, uploads from the outbox run next to them
+        self.displays = DisplayPool(ENV.AGENT_CONCURRENCY)
+        executors = {
+            "default": ThreadPoolExecutor(max_workers=len(self.displays.sessions)),
+            "outbox": ThreadPoolExecutor(max_workers=1),
+        }
 
         self.scheduler = BackgroundScheduler(
             jobstores=jobstores,
@@ -34,6 +58,16 @@ class AgentScheduler:
             max_instances=1,
             job_defaults={"misfire_grace_time": 3600},
         )
+        # SCHEDULE_PACKING: the agents, the start minutes planned for them and the agents that move their own runs,
+        # changed by the worker threads of the agents under the plan lock
+        self._agents: dict[str, BaseAgent] = {}
+        self._plan: SlotPlan | None = None
+        self._own_cadence: set[str] = set()
+        self._plan_lock = threading.RLock()
+        # Runs of every agent and of every group (account) are exclusive, retries taken within the budget window
+        self._agent_locks: dict[str, threading.Lock] = {}
+        self._group_locks: dict[str, threading.Lock] = {}
+        self._retries: dict[str, deque[float]] = {}
         propagate_logs()
 
     def start(self) -> None:
@@ -41,6 +75,8 @@ class AgentScheduler:
             logger.warning("Agent scheduler already running")
             return
 
+        if ENV.SCHEDULE_PACKING:
+            self._repack()
         self.scheduler.start()
 
         # Log jobs after starting
@@ -50,6 +86,7 @@ class AgentScheduler:
 
     def stop(self) -> None:
         self.scheduler.shutdown()
+        self.displays.stop()
         logger.info("Agent scheduler stopped")
 
     def is_running(self) -> bool:
@@ -58,13 +95,16 @@ class AgentScheduler:
     def add_agent(self, agent: BaseAgent) -> None:
         job_id = f"agent_{agent.name}"
         cron_expr = agent.cron_expression.value
+        self._agents[job_id] = agent
+        self._agent_locks[job_id] = threading.Lock()
+        self._group_locks.setdefault(self._group_of(job_id), threading.Lock())
         max_retries = agent.max_retries
 
         # create job trigger from cron expression
         trigger = CronTrigger.from_crontab(cron_expr)
 
         self.scheduler.add_job(
-            func=self._run_agent_with_retries,
+            func=self._run_agent,
             trigger=trigger,
             args=[job_id, agent, max_retries],
             id=job_id,
@@ -75,44 +115,206 @@ class AgentScheduler:
 
         logger.info(f"Added agent '{agent.name}' to scheduler ({cron_expr}, max {max_retries} retries)")
 
+    def add_outbox_drainer(self, interval: int = 60) -> None:
+        """Upload spooled scans from the outbox in the background, checked every interval seconds"""
+        self.scheduler.add_job(
+            func=get_outbox().drain,
+            trigger=IntervalTrigger(seconds=interval),
+            id="outbox_drainer",
+            name="Outbox Drainer",
+            executor="outbox",
+            replace_existing=True,
+            next_run_time=datetime.now(),  # drain scans left over from a previous run right away
+        )
+        logger.info(f"Added outbox drainer to scheduler (every {interval}s)")
+
     def get_job_next_run_time(self, job_id: str) -> datetime | None:
         job = self.scheduler.get_job(job_id)
         return job.next_run_time if job else None
 
-    def _run_agent_with_retries(self, job_id: str, agent: BaseAgent, max_retries: int) -> None:
-        for attempt in range(max_retries + 1):
+    def _apply_next_run_delay(self, job_id: str, agent: BaseAgent) -> None:
+        """Move the next run of an agent that sets its own cadence, its cron expression applies again after that"""
+        try:
+            delay = agent.next_run_delay()
+        except Exception as e:
+            logger.warning(f"Failed to get the next run of agent '{agent.name}', following its cron expression: {e}")
+            return
+        with self._plan_lock:
+            if delay is None:
+                self._own_cadence.discard(job_id)
+                return
+            # Start the moved run where it does not crowd the planned slots of the other agents
+            next_run_time = datetime.now().astimezone() + timedelta(seconds=delay)
+            if self._plan:
+                next_run_time = self._plan.next_free_start(job_id, next_run_time)
+            self._own_cadence.add(job_id)
+            self.scheduler.modify_job(job_id, next_run_time=next_run_time)
+        logger.info(f"Next run of agent '{agent.name}' at {next_run_time:%H:%M}")
+
+    def _record_run(self, job_id: str, duration: float) -> None:
+        """Record the duration of a successful run, the slots are repacked once the expected duration drifts"""
+        if not ENV.SCHEDULE_PACKING:
+            return
+        with self._plan_lock:
             try:
-                logger.info(f"Running agent '{agent.name}' (attempt {attempt + 1}/{max_retries + 1})")
-                discord_logger.agent_running(agent.name, agent.get_task_names())
-
-                # Set display to allow agents to interact with X11
-                if "DISPLAY" not in os.environ:
-                    os.environ["DISPLAY"] = ":99"
-
-                # track agent time
-                agent_start_time = time.time()
-                agent.start()
-
-                # log completion and send to discord
-                logger.info(f"Agent '{agent.name}' completed successfully")
-                agent_duration = round(time.time() - agent_start_time, 2)
-                next_run_time = self.get_job_next_run_time(job_id)
-                discord_logger.agent_all_tasks_completed(agent.name, agent_duration, next_run_time)
+                history = get_run_history()
+                history.record(job_id, duration)
+                expected = history.expected_duration(job_id) or DEFAULT_RUN_DURATION
+            except Exception as e:
+                logger.warning(f"Failed to record the run duration of {job_id}: {e}")
                 return
 
-            except (TaskError, AgentError, Exception) as e:
-                logger.exception(f"Agent '{agent.name}' failed on attempt {attempt + 1}: {e}")
-
-                # Log specific error types to Discord
-                if isinstance(e, TaskError):
-                    discord_logger.agent_task_error(agent.name, e.task_name, str(e))
-                elif isinstance(e, AgentError) or isinstance(e, Exception):
-                    discord_logger.agent_error(agent.name, str(e))
-
-                if attempt < max_retries:
-                    logger.info(f"Retrying agent '{agent.name}' in {self.time_between_retries} seconds...")
-                    discord_logger.agent_rescheduled(agent.name, self.time_between_retries)
-                    time.sleep(self.time_between_retries)
-                else:
-                    logger.error(f"Agent '{agent.name}' failed after {max_retries + 1} attempts")
-                    discord_logger.agent_error_max_retries(agent.name, str(e), max_retries)
+            planned = self._plan.duration_of(job_id) if self._plan else None
+            if planned is not None and abs(expected - planned) > ENV.SCHEDULE_PACKING_DRIFT * planned:
+                logger.info(f"Expected duration of {job_id} drifted from {planned:.0f}s to {expected:.0f}s, repacking")
+                self._repack()
+
+    def _repack(self) -> None:
+        """
+        Plan the start minutes of the agents that run every hour by their expected durations and apply them
+
+        Agents that move their own runs keep their next run, they are planned so the other agents leave room.
+        """
+        with self._plan_lock:
+            history = get_run_history()
+            requests = []
+            for job_id, agent in self._agents.items():
+                minutes = hourly_minutes(agent.cron_expression.value)
+                if minutes is None:
+                    continue  # e.g. daily agents, they keep their cron expression
+                duration = history.expected_duration(job_id) or DEFAULT_RUN_DURATION
+                requests.append(SlotRequest(job_id, agent.name, minutes, duration, agent.schedule_group()))
+
+            plan = self._plan = SlotPlan(len(self.displays.sessions), requests)
+            for job_id, slot in plan.slots.items():
+                if job_id not in self._own_cadence:
+                    self.scheduler.reschedule_job(job_id, trigger=CronTrigger(minute=slot.cron_minutes))
+        logger.info(plan.timeline())
+        if plan.peak > plan.capacity:
+            logger.warning("The agents do not fit next to each other within the hour, some runs will queue")
+
+    def _group_of(self, job_id: str) -> str:
+        """The group (account) whose agents run one at a time, an agent without a group is a group of its own"""
+        return self._agents[job_id].schedule_group() or job_id
+
+    def _run_agent(self, job_id: str, agent: BaseAgent, max_retries: int, attempt: int = 0) -> None:
+        """
+        Run an agent once, a failed run is retried by a one-shot job so other agents keep running in the meantime
+
+        Args:
+            job_id: The scheduled job of the agent
+            agent: The agent to run
+            max_retries: Retries of a failed scheduled run
+            attempt: 0 for the scheduled run, the number of the retry otherwise
+        """
+        # The scheduled job and a retry job of the agent must not run the agent at the same time
+        if not self._agent_locks[job_id].acquire(blocking=False):
+            logger.warning(f"Agent '{agent.name}' is still running, skipping this run")
+            return
+
+        # An account can only be logged in once, the run waits for the other agent of the account to finish
+        group_lock = self._group_locks[self._group_of(job_id)]
+        if not group_lock.acquire(blocking=False):
+            self._agent_locks[job_id].release()
+            self._schedule_delayed(job_id, agent, max_retries, attempt)
+            return
+
+        try:
+            # A scheduled run replaces the retry or delayed run of a previous run that is still pending
+            pending_ids = [f"{job_id}_retry", f"{job_id}_delayed"] if attempt == 0 else []
+            for pending_id in pending_ids:
+                if self.scheduler.get_job(pending_id):
+                    logger.info(f"Dropping the pending run {pending_id} of agent '{agent.name}', it runs as scheduled")
+                    self.scheduler.remove_job(pending_id)
+
+            logger.info(f"Running agent '{agent.name}' (attempt {attempt + 1}/{max_retries + 1})")
+            discord_logger.agent_running(agent.name, agent.get_task_names())
+
+            # Set display to allow agents to interact with X11
+            if "DISPLAY" not in os.environ:
+                os.environ["DISPLAY"] = ":99"
+
+            # track agent time
+            agent_start_time = time.time()
+            with self.displays.session(agent.preferred_display()) as session:
+                logger.info(f"Running agent '{agent.name}' on display {session.display}")
+                # Decided up front, the game of a failed run is only kept for a retry that will actually run
+                will_retry = attempt < max_retries and self._retry_available(job_id)
+                agent.start(resume=attempt > 0, will_retry=will_retry)
+
+            # log completion and send to discord
+            logger.info(f"Agent '{agent.name}' completed successfully")
+            agent_duration = round(time.time() - agent_start_time, 2)
+            self._record_run(job_id, agent_duration)
+            self._apply_next_run_delay(job_id, agent)
+            next_run_time = self.get_job_next_run_time(job_id)
+            discord_logger.agent_all_tasks_completed(agent.name, agent_duration, next_run_time)
+
+        except (TaskError, AgentError, Exception) as e:
+            logger.exception(f"Agent '{agent.name}' failed on attempt {attempt + 1}: {e}")
+
+            # Log specific error types to Discord
+            if isinstance(e, TaskError):
+                discord_logger.agent_task_error(agent.name, e.task_name, str(e))
+            elif isinstance(e, AgentError) or isinstance(e, Exception):
+                discord_logger.agent_error(agent.name, str(e))
+
+            if attempt >= max_retries:
+                logger.error(f"Agent '{agent.name}' failed after {max_retries + 1} attempts")
+                discord_logger.agent_error_max_retries(agent.name, str(e), max_retries)
+            elif not self._take_retry(job_id):
+                logger.error(f"Agent '{agent.name}' used its retry budget, waiting for the next scheduled run")
+                discord_logger.agent_error_max_retries(agent.name, str(e), ENV.AGENT_RETRY_BUDGET)
+            else:
+                self._schedule_retry(job_id, agent, max_retries, attempt + 1)
+
+        finally:
+            group_lock.release()
+            self._agent_locks[job_id].release()
+
+    def _schedule_delayed(self, job_id: str, agent: BaseAgent, max_retries: int, attempt: int) -> None:
+        """Register a one-shot job that runs the agent once the other agent of its group had time to finish"""
+        run_date = datetime.now().astimezone() + timedelta(seconds=GROUP_BUSY_DELAY)
+        self.scheduler.add_job(
+            func=self._run_agent,
+            trigger=DateTrigger(run_date=run_date),
+            args=[job_id, agent, max_retries, attempt],
+            id=f"{job_id}_delayed",
+            name=f"Delayed: {agent.name}",
+            replace_existing=True,
+        )
+        logger.info(f"Another agent of '{agent.name}' is running, delaying this run by {GROUP_BUSY_DELAY} seconds")
+
+    def _retry_available(self, job_id: str) -> bool:
+        """Whether the budget of the agent has a retry left, False if it used all retries of the last day"""
+        retries = self._retries.setdefault(job_id, deque())
+        while retries and retries[0] < time.time() - RETRY_BUDGET_WINDOW:
+            retries.popleft()
+        return len(retries) < ENV.AGENT_RETRY_BUDGET
+
+    def _take_retry(self, job_id: str) -> bool:
+        """Take a retry from the budget of the agent, False if it used all retries of the last day"""
+        if not self._retry_available(job_id):
+            return False
+        self._retries[job_id].append(time.time())
+        return True
+
+    def _schedule_retry(self, job_id: str, agent: BaseAgent, max_retries: int, attempt: int) -> None:
+        """Register a one-shot job for the retry, the delay doubles with every retry of the same run"""
+        delay = min(self.time_between_retries * 2 ** (attempt - 1), MAX_RETRY_DELAY)
+        run_date = datetime.now().astimezone() + timedelta(seconds=delay)
+        with self._plan_lock:
+            if self._plan:
+                run_date = self._plan.next_free_start(job_id, run_date)
+
+        self.scheduler.add_job(
+            func=self._run_agent,
+            trigger=DateTrigger(run_date=run_date),
+            args=[job_id, agent, max_retries, attempt],
+            id=f"{job_id}_retry",
+            name=f"Retry: {agent.name}",
+            replace_existing=True,
+        )
+        seconds = round((run_date - datetime.now().astimezone()).total_seconds())
+        logger.info(f"Retrying agent '{agent.name}' in {seconds} seconds...")
+        discord_logger.agent_rescheduled(agent.name, seconds)
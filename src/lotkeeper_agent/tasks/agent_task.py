@@ -26,6 +26,18 @@ class AgentTask(ABC):
         """Method to be implemented by the subclass to run the task"""
         pass
 
+    def probe(self) -> bool:
+        """Cheap check whether the game is still where this task leads (e.g. in the world), a retry skips it then"""
+        return False
+
+    def has_artifact(self) -> bool:
+        """Whether the failed run left the result of this task behind (e.g. a parsed scan), a retry resumes from it"""
+        return False
+
+    def discard_artifact(self) -> None:
+        """Drop the result of a failed run, a run that does not resume starts from scratch"""
+        return None
+
     def execute(self) -> bool:
         """Execute the task"""
         result = self.run()
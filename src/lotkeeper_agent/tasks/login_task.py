@@ -1,6 +1,7 @@
 from loguru import logger
 
 from lotkeeper_agent.common.xdo import XDO
+from lotkeeper_agent.config import ENV
 from lotkeeper_agent.dependencies import text_detector
 from lotkeeper_agent.detectors.text_detector import GameTexts
 from lotkeeper_agent.models.wow_config import WoWAccount
@@ -13,7 +14,25 @@ class LoginTask(AgentTask):
         self.text_detector = text_detector()
         self.account = account
 
+    def probe(self) -> bool:
+        # Already in the world
+        return self.text_detector.probe([GameTexts.OAS_IDLE])
+
     def run(self) -> bool:
+        # 0 A game kept running from the previous (or the failed) run may still be in the world, or at the character
+        # selection after an idle logout, or show a disconnect dialog
+        if ENV.GAME_SESSION_PERSISTENT or ENV.TASK_CHECKPOINTS:
+            logger.info("Step: Check the state of the game")
+            if self.text_detector.probe([GameTexts.OAS_IDLE]):
+                logger.info("Already in the world, skipping the login")
+                return True
+            if self.text_detector.probe([GameTexts.CREATE_NEW_CHARACTER]):
+                logger.info("Logged out to the character selection, entering the world again")
+                return self._enter_world()
+            if self.text_detector.probe([GameTexts.DISCONNECTED]):
+                logger.info("Disconnected from the server, logging in again")
+                XDO.Interact.press_key("Return")  # dismiss the dialog
+
         # 1 Wait for the login button to be detected
         logger.info("Step: Wait for login screen")
         if not self.text_detector.detect([GameTexts.LOGIN]):
@@ -25,7 +44,7 @@ class LoginTask(AgentTask):
         # 3 Clear any existing text and enter username
         logger.info("Step: Enter username")
         XDO.Interact.press_key("ctrl+a")
-        XDO.Interact.type_text(self.account.username)
+        XDO.Interact.enter_text(self.account.username)
 
         # 4 Tab to password field
         logger.info("Step: Tab to password field")
@@ -34,7 +53,7 @@ class LoginTask(AgentTask):
         # 5 Clear and enter password
         logger.info("Step: Enter password")
         XDO.Interact.press_key("ctrl+a")
-        XDO.Interact.type_text(self.account.password)
+        XDO.Interact.enter_text(self.account.password)
 
         # 6 Press Enter to login
         logger.info("Step: Submit details")
@@ -45,6 +64,10 @@ class LoginTask(AgentTask):
         if not self.text_detector.detect([GameTexts.CREATE_NEW_CHARACTER]):
             raise TaskError(self.name, "Failed to detect whether we are on the character selection screen")
 
+        return self._enter_world()
+
+    def _enter_world(self) -> bool:
+        """Enter the world from the character selection screen"""
         # 8 Press Enter to enter the world
         logger.info("Step: Enter world")
         XDO.Interact.press_key("Return")
@@ -1,45 +1,93 @@
-import httpx
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy
 from loguru import logger
 
+from lotkeeper_agent.common.auction_outbox import get_outbox
+from lotkeeper_agent.common.auction_uploader import make_scan_id
 from lotkeeper_agent.common.discord_logger import discord_logger
+from lotkeeper_agent.common.scan_cadence import ScanCadence, get_scan_cadence
+from lotkeeper_agent.common.scan_sender import ScanPart, send_scan
 from lotkeeper_agent.common.sleep_util import SleepUtil
 from lotkeeper_agent.common.xdo_game import XDOGame
-from lotkeeper_agent.config import ENV
+from lotkeeper_agent.config import ENV, InvalidAuctionRows, SavedVariablesBackend, ScanMode
 from lotkeeper_agent.dependencies import text_detector
 from lotkeeper_agent.detectors.text_detector import GameTexts
-from lotkeeper_agent.models.auction import Auction, AuctionData
+from lotkeeper_agent.models.auction import AUCTION_LUA_COMPACT_KEYS, AUCTION_LUA_FIELDS
+from lotkeeper_agent.models.auction_batch import AuctionBatch
 from lotkeeper_agent.models.wow_config import WoWAccount
 from lotkeeper_agent.tasks.agent_task import AgentTask, TaskError
+from lotkeeper_agent.tasks.target_interact_creature_task import TargetInteractCreatureTask
+
+# Timeout of a full scan, and of a single item class of an incremental scan
+SCAN_TIMEOUT = 1800
+
+
+@dataclass(frozen=True)
+class ParsedScan:
+    """A parsed scan (or item class of an incremental scan) that still has to be handed over"""
+
+    batch: AuctionBatch
+    realm: str
+    scan_id: str
+    part: ScanPart | None = None
 
 
 class ScanAuctionsTask(AgentTask):
-    def __init__(self, account: WoWAccount) -> None:
+    def __init__(self, account: WoWAccount, auctioneer: str | None = None, classes: list[str] | None = None) -> None:
         super().__init__(
             name="Scan Auction House",
             description="Scan the auction house for items",
         )
         self.text_detector = text_detector()
         self.account = account
+        # Incremental scans reload after every item class, which closes the auction house
+        self.interact_task = TargetInteractCreatureTask(auctioneer) if auctioneer else None
+        # Targeted scans only cover these item classes (as named by the addon, e.g. "trade goods")
+        self.classes = classes
+        # Parsed scans the last run could not hand over, the completion artifact a retry resumes from
+        self._unsent: list[ParsedScan] = []
+
+    def has_artifact(self) -> bool:
+        return bool(self._unsent)
+
+    def discard_artifact(self) -> None:
+        self._unsent = []
 
     def run(self) -> bool:
+        # 0 A retry of a run that parsed its scan but could not hand it over only hands it over
+        if self._unsent:
+            logger.info(f"Step: Handing over {len(self._unsent)} scan(s) parsed by the failed run")
+            self._hand_over_unsent()
+            return True
+
         # 1 Wait for OAS Addon to be detected, meaning we are able to start scanning
         logger.info("Step: Detect OAS Addon")
         if not self.text_detector.detect([GameTexts.OAS_IDLE]):
             raise TaskError(self.name, "Failed to detect whether the OAS Addon is loaded")
 
-        # 2 Run /oas scan
-        logger.info("Step: Running /oas scan")
-        XDOGame.Game.enter_chat_command("/oas scan")
+        if ENV.SCAN_MODE == ScanMode.INCREMENTAL and not self.classes:
+            return self._run_incremental()
 
-        # 3 Wait for the OAS Addon to indicate we are scanning
+        # 2 Run /oas scan (or /oas scan mass, the addon pages instead if the realm does not allow a mass query)
+        if self.classes:
+            command = f"/oas scan {','.join(self.classes)}"
+        else:
+            command = "/oas scan mass" if ENV.SCAN_MODE == ScanMode.MASS else "/oas scan"
+        logger.info(f"Step: Running {command}")
+        XDOGame.Game.enter_chat_command(command)
+
+        # 3 Wait for the OAS Addon to indicate we are scanning (a targeted scan can already be done)
         logger.info("Step: Waiting for OAS Addon to indicate we are scanning")
-        if not self.text_detector.detect([GameTexts.OAS_SCANNING]):
+        if not self.text_detector.detect([GameTexts.OAS_SCANNING, GameTexts.OAS_COMPLETED]):
             raise TaskError(self.name, "Failed to detect whether the OAS Addon is scanning")
 
         # 4 Wait for scan to complete
-        scan_timeout = 1800  # timeout of 30 minutes
         logger.info("Step: Waiting for scan to complete")
-        if not self.text_detector.detect([GameTexts.OAS_COMPLETED], timeout=scan_timeout):
+        if not self.text_detector.detect([GameTexts.OAS_COMPLETED], timeout=SCAN_TIMEOUT):
             raise TaskError(self.name, "Failed to detect whether the scan is complete")
 
         # 5 Reload game window to ensure saved variables are stored
@@ -61,43 +109,209 @@ class ScanAuctionsTask(AgentTask):
             )
             raise TaskError(self.name, "Could not find the saved variables file")
 
-        # 8 Parse the saved variables file to JSON / Python dict
+        # 8 Parse the saved variables file into a columnar auction batch
+        batch = self._parse(saved_variables_path)
+        discord_logger.info(f"Parsed and mapped a total of {len(batch)} auctions", "Scan Auction House Update")
+
+        # 9 Record the size and churn of a full scan, they set the time of the next scan of the realm
+        realm = self.account.get_realm_name_with_faction()
+        if ENV.SCAN_CADENCE_ADAPTIVE and not self.classes:
+            try:
+                get_scan_cadence().record(realm, ScanCadence.listing_keys(batch))
+            except Exception as e:
+                logger.warning(f"Failed to record the scan in the cadence history: {e}")
+
+        # 10 Spool the scan to the outbox or send it to the Lotkeeper API, a targeted scan as the only part of its
+        # group so the API only replaces the listings of its item classes. The scan is kept until it is handed over.
+        scan_id = make_scan_id(saved_variables_path, realm)
+        part = ScanPart(group=scan_id, index=1, total=1, class_name=",".join(self.classes)) if self.classes else None
+        self._unsent = [ParsedScan(batch, realm, scan_id, part)]
+        self._hand_over_unsent()
+
+        # 11 Return success
+        return True
+
+    def _run_incremental(self) -> bool:
+        """
+        Scan one item class at a time: the addon commits every class it completes, the agent reloads to write it
+        to disk and hands the data to a background worker, then resumes the scan with the next class. Parsing
+        and uploading a class overlaps with scanning the next one.
+        """
+        if self.interact_task is None:
+            raise TaskError(self.name, "Incremental scans need the auctioneer to reopen the auction house")
+
+        # 2 Run /oas scan incremental
+        logger.info("Step: Running /oas scan incremental")
+        XDOGame.Game.enter_chat_command("/oas scan incremental")
+
+        # 3 Wait for the OAS Addon to indicate we are scanning
+        logger.info("Step: Waiting for OAS Addon to indicate we are scanning")
+        if not self.text_detector.detect([GameTexts.OAS_SCANNING]):
+            raise TaskError(self.name, "Failed to detect whether the OAS Addon is scanning")
+
+        realm = self.account.get_realm_name_with_faction()
+        parts_dir = XDOGame.Paths.get_data_dir() / "parts"
+        parts_dir.mkdir(parents=True, exist_ok=True)
+
+        parts: list[tuple[ScanPart, Future[numpy.ndarray]]] = []
+        unsent: list[ParsedScan] = []
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="scan-part") as executor:
+            while True:
+                # 4 Wait for the current item class (or the whole scan) to complete
+                logger.info("Step: Waiting for the item class to complete")
+                if not self.text_detector.detect(
+                    [GameTexts.OAS_CLASS_DONE, GameTexts.OAS_COMPLETED], timeout=SCAN_TIMEOUT
+                ):
+                    raise TaskError(self.name, "Failed to detect whether the item class is complete")
+
+                # 5 Reload to write the item class to the saved variables
+                logger.info("Step: Reloading game window to store the item class")
+                XDOGame.Game.reload()
+                SleepUtil.sleep_fixed(10)
+                if not self.text_detector.detect([GameTexts.OAS_IDLE]):
+                    raise TaskError(self.name, "Failed to detect whether the game is ready after reload")
+
+                saved_variables_path = XDOGame.Paths.get_saved_variables_path(self.account.username)
+                if not saved_variables_path:
+                    raise TaskError(self.name, "Could not find the saved variables file")
+                try:
+                    # Only the small scan state table is read, the scanned data is parsed in the background
+                    state = dict(XDOGame.Paths.iter_saved_variables_lua_items(saved_variables_path, "OAAScanState"))
+                    part = ScanPart(
+                        group=str(state["startedAt"]),
+                        index=state["classIndex"],
+                        total=state["totalClasses"],
+                        class_name=state["className"],
+                    )
+                except Exception as e:
+                    raise TaskError(self.name, f"Failed to read the incremental scan state: {e}") from e
+
+                # 6 Parse and upload the item class in the background, from a copy as the next reload overwrites it
+                logger.info(f"Step: Handing over item class {part}")
+                part_path = parts_dir / f"{saved_variables_path.stem}-{part.group}-{part.index}.lua"
+                shutil.copyfile(saved_variables_path, part_path)
+                scan_id = make_scan_id(saved_variables_path, realm)
+                parts.append((part, executor.submit(self._process_part, part_path, realm, scan_id, part, unsent)))
+
+                if state["isComplete"]:
+                    break
+
+                # Stop scanning once an item class failed to be handed over, the scan can not be completed anyway
+                failed = [part for part, future in parts if future.done() and future.exception() is not None]
+                if failed:
+                    raise TaskError(self.name, f"Failed to hand over item classes: {', '.join(map(str, failed))}")
+
+                # 7 Reopen the auction house and resume with the next item class
+                logger.info("Step: Resuming the scan with the next item class")
+                self.interact_task.execute()
+                XDOGame.Game.enter_chat_command("/oas resume")
+                if not self.text_detector.detect(
+                    [GameTexts.OAS_SCANNING, GameTexts.OAS_CLASS_DONE, GameTexts.OAS_COMPLETED]
+                ):
+                    raise TaskError(self.name, "Failed to detect whether the OAS Addon resumed scanning")
+
+        # 8 Wait for the item classes that are still being handed over, the parsed classes that could not be
+        # handed over are kept for a retry now that the whole scan is done
+        failed = [part for part, future in parts if future.exception() is not None]
+        if failed:
+            self._unsent = unsent
+            raise TaskError(self.name, f"Failed to hand over item classes: {', '.join(map(str, failed))}")
+
+        # 9 Record the size and churn of the scan, only if this run scanned every item class
+        if ENV.SCAN_CADENCE_ADAPTIVE and parts and len(parts) == parts[-1][0].total:
+            try:
+                get_scan_cadence().record(realm, numpy.concatenate([future.result() for _part, future in parts]))
+            except Exception as e:
+                logger.warning(f"Failed to record the scan in the cadence history: {e}")
+
+        # 10 Return success
+        return True
+
+    def _process_part(
+        self, part_path: Path, realm: str, scan_id: str, part: ScanPart, unsent: list[ParsedScan]
+    ) -> numpy.ndarray:
+        """
+        Parse and hand over a single item class of an incremental scan, returns its listing keys
+
+        A parsed item class that could not be handed over is added to unsent.
+        """
+        try:
+            batch = self._parse(part_path)
+            discord_logger.info(f"Parsed and mapped {len(batch)} auctions of {part}", "Scan Auction House Update")
+            try:
+                self._hand_over(batch, realm, scan_id, part)
+            except TaskError:
+                unsent.append(ParsedScan(batch, realm, scan_id, part))
+                raise
+            return ScanCadence.listing_keys(batch) if ENV.SCAN_CADENCE_ADAPTIVE else numpy.empty(0, dtype=numpy.uint64)
+        finally:
+            part_path.unlink(missing_ok=True)
+
+    def _parse(self, saved_variables_path: Path) -> AuctionBatch:
+        """Parse the saved variables file into a columnar auction batch"""
         logger.info("Step: Parsing saved variables file")
         try:
-            table_entries = XDOGame.Paths.parse_saved_variables_lua(saved_variables_path, "OAAData")
-            logger.info(f"Parsed auction data with {len(table_entries)} entries")
-            auctions = [Auction.from_lua_table(entry) for entry in table_entries]
-            logger.info(f"Mapped {len(auctions)} auctions")
+            match ENV.SAVED_VARIABLES_BACKEND:
+                # OAAData is either an array of rows or the compact layout of the addon
+                case SavedVariablesBackend.STREAMING:
+                    table_items = XDOGame.Paths.iter_saved_variables_lua_items(saved_variables_path, "OAAData")
+                    batch = AuctionBatch.from_lua_items(table_items)
+                case SavedVariablesBackend.LUPA:
+                    table = XDOGame.Paths.parse_saved_variables_lua(saved_variables_path, "OAAData")
+                    if isinstance(table, dict):
+                        batch = AuctionBatch.from_lua_compact(table)
+                    else:
+                        batch = AuctionBatch.from_lua_entries(table)
+                case SavedVariablesBackend.LUPA_BULK:
+                    compact = XDOGame.Paths.parse_saved_variables_lua_arrays(
+                        saved_variables_path, "OAAData", AUCTION_LUA_COMPACT_KEYS
+                    )
+                    if compact is not None:
+                        batch = AuctionBatch.from_lua_compact(compact)
+                    else:
+                        columns = XDOGame.Paths.parse_saved_variables_lua_columns(
+                            saved_variables_path, "OAAData", AUCTION_LUA_FIELDS
+                        )
+                        batch = AuctionBatch.from_lua_columns(columns)
+            match ENV.INVALID_AUCTION_ROWS:
+                case InvalidAuctionRows.FAIL:
+                    batch.raise_if_invalid()
+                case InvalidAuctionRows.DROP:
+                    batch, repairs = batch.repaired()
+                    if repairs.dropped_rows or any(repairs.repaired.values()):
+                        logger.warning(f"Invalid auction rows: {repairs}")
+                    if repairs.dropped_rows:
+                        discord_logger.warning(f"Invalid auction rows: {repairs}", "Scan Auction House Update")
+            logger.info(f"Parsed and mapped {len(batch)} auctions ({ENV.SAVED_VARIABLES_BACKEND.value})")
         except Exception as e:
             logger.exception(f"Failed to parse saved variables file: {e}")
             raise TaskError(self.name, f"Failed to parse saved variables file: {e}") from e
+        return batch
 
-        discord_logger.info(f"Parsed and mapped a total of {len(auctions)} auctions", "Scan Auction House Update")
+    def _hand_over_unsent(self) -> None:
+        """Hand over the kept scans one by one, each is dropped once it was handed over"""
+        while self._unsent:
+            scan = self._unsent[0]
+            self._hand_over(scan.batch, scan.realm, scan.scan_id, scan.part)
+            self._unsent.pop(0)
 
-        # 9 Constructing auction data payload
-        logger.info("Step: Constructing auction data payload")
-        auction_data = AuctionData(
-            server=ENV.WOW_SERVER,
-            realm=self.account.get_realm_name_with_faction(),
-            auctions=auctions,
-        )
+    def _hand_over(self, batch: AuctionBatch, realm: str, scan_id: str, part: ScanPart | None = None) -> None:
+        """Spool the scan to the outbox (uploaded in the background) or send it to the Lotkeeper API right away"""
+        if ENV.UPLOAD_OUTBOX:
+            logger.info("Step: Spooling auction data to the outbox")
+            try:
+                get_outbox().put(scan_id, realm, batch, part)
+            except Exception as e:
+                logger.exception(f"Failed to spool auction data to the outbox: {e}")
+                raise TaskError(self.name, f"Failed to spool auction data to the outbox: {e}") from e
+            return
 
-        # 10 Send auction data to Lotkeeper API
-        logger.info("Step: Sending auction data to Lotkeeper API")
+        # As a delta against the previous scan or as a full upload
+        logger.info(f"Step: Sending auction data to Lotkeeper API ({ENV.UPLOAD_MODE.value})")
         try:
-            endpoint = f"{ENV.LOT_HOST}/api/v1/agent/auctions"
-            headers = {
-                "X-Agent-Access-Token": f"{ENV.LOT_AGENT_TOKEN}",
-                "Content-Type": "application/json",
-            }
-            response = httpx.post(endpoint, json=auction_data.model_dump(), headers=headers, timeout=60)
-            response.raise_for_status()
+            send_scan(batch, realm, scan_id, part)
             logger.info("Sent auction data to the Lotkeeper API")
-            discord_logger.info(f"Sent {len(auctions)} auctions to the Lotkeeper API", "Scan Auction House Update")
 
         except Exception as e:
             logger.exception(f"Failed to send auction data to the Lotkeeper API: {e}")
             raise TaskError(self.name, f"Failed to send auction data to the Lotkeeper API: {e}") from e
-
-        # 11 Return success
-        return True
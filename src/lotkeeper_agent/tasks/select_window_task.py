@@ -11,6 +11,10 @@ class SelectWindowTask(AgentTask):
         )
         self.window_patterns = window_patterns
 
+    def probe(self) -> bool:
+        # The window of a game kept running only needs the focus
+        return XDO.Window.focus(self.window_patterns)
+
     def run(self) -> bool:
         # 1 Wait for the window to be available
         logger.info("Step: Waiting for the World of Warcraft window")
@@ -18,6 +18,10 @@ class TargetInteractCreatureTask(AgentTask):
         self.interact_key = interact_key
         self.text_detector = text_detector()
 
+    def probe(self) -> bool:
+        # The auction house window is still open
+        return self.text_detector.probe([GameTexts.CHOOSE_SEARCH_CRITERIA])
+
     def run(self) -> bool:
         # 1 Press the target key
         logger.info(f"Step: Target {self.creature_name}")